@@ -0,0 +1,155 @@
+"""Benchmark for validating a block of TRANSFERs with the sdk validator.
+
+Commits N CREATE transactions to an in-memory stub of the validator's
+backend, then validates a block of N TRANSFERs spending them, one at a
+time against the transactions accepted before it, the way blocks are
+validated. With --utxo-store it also applies every transaction to an
+in-memory UTXOStore and times the owner lookups answered from it.
+
+    python benchmarks/bench_block_validation.py --transfers 10000
+    python benchmarks/bench_block_validation.py --transfers 1000 --utxo-store
+"""
+import argparse
+import os
+import sys
+import time
+import types
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "service", "sdk_validator"))
+
+from resdb_driver.crypto import generate_keypair  # noqa: E402
+from resdb_driver.offchain import fulfill_transaction, prepare_transaction  # noqa: E402
+from resdb_validator import lib  # noqa: E402
+from resdb_validator.models import Transaction  # noqa: E402
+from resdb_validator.utxo import UTXOStore  # noqa: E402
+
+
+class StubQuery:
+    """The backend queries block validation makes, answered from a dict."""
+
+    def __init__(self, committed):
+        self.committed = committed
+        self.calls = 0
+
+    def get_transaction(self, connection, txid):
+        self.calls += 1
+        transaction = self.committed.get(txid)
+        return dict(transaction) if transaction else None
+
+    def get_transactions(self, connection, txids):
+        self.calls += 1
+        return [dict(self.committed[txid]) for txid in txids if txid in self.committed]
+
+    def get_asset(self, connection, txid):
+        return None
+
+    def get_assets(self, connection, txids):
+        return []
+
+    def get_metadata(self, connection, txids):
+        return []
+
+    def get_spent(self, connection, txid, output):
+        self.calls += 1
+        return []
+
+    def get_spending_transactions(self, connection, links):
+        self.calls += 1
+        return []
+
+
+def make_transactions(count, alice, bob):
+    """`count` CREATEs owned by alice and the TRANSFERs giving them to bob."""
+    creates, transfers = [], []
+    for i in range(count):
+        create = fulfill_transaction(
+            prepare_transaction(
+                operation="CREATE",
+                signers=alice.public_key,
+                recipients=[([alice.public_key], 1)],
+                asset={"data": {"i": i}},
+            ),
+            private_keys=alice.private_key,
+        )
+        output = create["outputs"][0]
+        transfer = fulfill_transaction(
+            prepare_transaction(
+                operation="TRANSFER",
+                recipients=[([bob.public_key], 1)],
+                asset={"id": create["id"]},
+                inputs=[
+                    {
+                        "fulfillment": output["condition"]["details"],
+                        "fulfills": {"output_index": 0, "transaction_id": create["id"]},
+                        "owners_before": output["public_keys"],
+                    }
+                ],
+            ),
+            private_keys=alice.private_key,
+        )
+        creates.append(create)
+        transfers.append(transfer)
+    return creates, transfers
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def validate_block(resdb, transfers):
+    resdb.begin_block()
+    block = []
+    for transfer in transfers:
+        transfer.validate(resdb, block)
+        block.append(transfer)
+    return block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transfers", type=int, default=10_000)
+    parser.add_argument(
+        "--utxo-store", action="store_true", help="also time an in-memory UTXOStore"
+    )
+    args = parser.parse_args()
+
+    alice, bob = generate_keypair(), generate_keypair()
+    (creates, transfer_dicts), elapsed = timed(
+        lambda: make_transactions(args.transfers, alice, bob)
+    )
+    print(f"prepared {args.transfers} CREATE/TRANSFER pairs in {elapsed:.1f}s")
+
+    committed = {create["id"]: create for create in creates}
+    query = StubQuery(committed)
+    lib.backend = types.SimpleNamespace(query=query)
+    transfers = [Transaction.from_dict(transfer) for transfer in transfer_dicts]
+
+    resdb = lib.ResDB()
+    resdb.connection = None  # never used by the stub
+    resdb.is_committed = lambda txid: txid in committed
+    _, elapsed = timed(lambda: validate_block(resdb, transfers))
+    print(
+        f"validated a block of {args.transfers} transfers in {elapsed:.2f}s "
+        f"({elapsed / args.transfers * 1e3:.2f}ms each, {query.calls} backend queries)"
+    )
+
+    if args.utxo_store:
+        store = lib.ResDB(utxo_store=UTXOStore())
+        creates = [Transaction.from_dict(create) for create in creates]
+        _, elapsed = timed(
+            lambda: [store.update_utxoset(tx) for tx in creates + transfers]
+        )
+        print(f"applied {2 * args.transfers} transactions to the store in {elapsed:.2f}s")
+        for owner, name in ((alice, "alice"), (bob, "bob")):
+            outputs, elapsed = timed(
+                lambda: store.get_outputs_filtered(owner.public_key, spent=False)
+            )
+            print(f"unspent outputs of {name}: {len(outputs)} in {elapsed * 1e3:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Stress benchmark for sharing one Resdb driver between many threads.
+
+Every worker thread commits small transactions and reads them back through
+the same driver, the way FastAPI's threadpool uses the module-level `db` in
+main_server_local.py. The run fails if any request errors, returns the wrong
+transaction, or leaves the driver's bookkeeping inconsistent.
+
+By default the requests go to in-process stub nodes speaking the crow
+/v1/transactions API. They share the interpreter with the client, so use the
+numbers to compare modes and pickers rather than as absolute throughput.
+Point it at real nodes with --node.
+
+    python benchmarks/bench_driver_threads.py --threads 64 --ops 200
+    python benchmarks/bench_driver_threads.py --mode per-request
+    python benchmarks/bench_driver_threads.py --node http://127.0.0.1:18000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resdb_driver import Resdb  # noqa: E402
+from resdb_driver.pool import EWMALatencyPicker, LeastOutstandingPicker, RoundRobinPicker  # noqa: E402
+
+PICKERS = {
+    "round-robin": RoundRobinPicker,
+    "least-outstanding": LeastOutstandingPicker,
+    "ewma": EWMALatencyPicker,
+}
+
+
+class StubNode(BaseHTTPRequestHandler):
+    """Minimal stand-in for the crow HTTP service of a ResilientDB node."""
+
+    protocol_version = "HTTP/1.1"
+    store = {}
+    store_lock = threading.Lock()
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body, content_type="application/json"):
+        data = body.encode()
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        txid = json.loads(body).get("id")
+        if self.path != "/v1/transactions/commit" or not txid:
+            return self._send(400, "Invalid transaction format", "text/plain")
+        with self.store_lock:
+            self.store[txid] = body.decode()
+        self._send(201, f"id: {txid}", "text/plain")
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        txid = self.path.rsplit("/", 1)[-1]
+        with self.store_lock:
+            value = self.store.get(txid)
+        if value is None:
+            return self._send(500, "get value fail", "text/plain")
+        self._send(200, value)
+
+
+def start_stub_nodes(count, delay):
+    StubNode.delay = delay
+    ThreadingHTTPServer.request_queue_size = 1024
+    urls = []
+    for _ in range(count):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubNode)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls.append(f"http://127.0.0.1:{server.server_address[1]}")
+    return urls
+
+
+def run(args, urls):
+    driver_options = dict(
+        picker_class=PICKERS[args.picker],
+        pool_maxsize=args.pool_maxsize,
+        pool_block=args.pool_block,
+    )
+    shared = Resdb(*urls, **driver_options) if args.mode == "shared" else None
+    latencies = []
+    errors = []
+    mismatches = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        local_latencies = []
+        for i in range(args.ops):
+            db = shared or Resdb(*urls, **driver_options)
+            tx = {"id": uuid.uuid4().hex, "worker": worker_id, "seq": i}
+            start = time.perf_counter()
+            try:
+                db.transactions.send_commit(tx)
+                fetched = db.transactions.retrieve(tx["id"])
+            except Exception as err:
+                with lock:
+                    errors.append(repr(err))
+                continue
+            local_latencies.append(time.perf_counter() - start)
+            if fetched != tx:
+                with lock:
+                    mismatches.append(tx["id"])
+        with lock:
+            latencies.extend(local_latencies)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ops = len(latencies)
+    print(f"mode={args.mode} picker={args.picker} threads={args.threads} nodes={len(urls)}")
+    print(f"{ops} round-trips in {elapsed:.2f}s: {ops / elapsed:.0f} ops/s")
+    if latencies:
+        print(
+            f"latency ms: p50={1000 * statistics.median(latencies):.2f} "
+            f"p99={1000 * latencies[int(0.99 * (ops - 1))]:.2f} "
+            f"max={1000 * latencies[-1]:.2f}"
+        )
+    print(f"errors={len(errors)} mismatches={len(mismatches)}")
+    for error in errors[:5]:
+        print(f"  {error}")
+
+    consistent = True
+    if shared is not None:
+        for connection in shared.transport.connection_pool.connections:
+            print(f"{connection.node_url}: in_flight={connection.in_flight} {connection.pool_stats()}")
+            consistent &= connection.in_flight == 0
+    return not errors and not mismatches and consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--ops", type=int, default=100, help="commit+retrieve round-trips per thread")
+    parser.add_argument("--mode", choices=("shared", "per-request"), default="shared")
+    parser.add_argument("--picker", choices=sorted(PICKERS), default="round-robin")
+    parser.add_argument("--pool-maxsize", type=int, default=None)
+    parser.add_argument("--pool-block", action="store_true")
+    parser.add_argument("--nodes", type=int, default=3, help="number of stub nodes")
+    parser.add_argument("--delay", type=float, default=0.0, help="stub node response delay in seconds")
+    parser.add_argument("--node", action="append", help="use a real node instead of stubs (repeatable)")
+    args = parser.parse_args()
+
+    urls = args.node or start_stub_nodes(args.nodes, args.delay)
+    sys.exit(0 if run(args, urls) else 1)
+
+
+if __name__ == "__main__":
+    main()
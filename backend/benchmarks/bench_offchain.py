@@ -0,0 +1,218 @@
+"""Benchmarks for the offchain transaction path of resdb_driver.
+
+Covers everything an upload does before it touches the network: preparing
+and fulfilling CREATE and TRANSFER transactions, Transaction.from_dict,
+to_dict, serialize and signature validation, at several asset sizes and
+input/output counts. Each case reports operations per second and the peak
+memory allocated while running one operation (tracemalloc).
+
+Results can be saved as a baseline and later runs compared against it:
+
+    python benchmarks/bench_offchain.py --save baseline.json
+    python benchmarks/bench_offchain.py --compare baseline.json
+    python benchmarks/bench_offchain.py --filter transfer --quick
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resdb_driver.crypto import generate_keypair  # noqa: E402
+from resdb_driver.offchain import fulfill_transaction, prepare_transaction  # noqa: E402
+from resdb_driver.transaction import Transaction  # noqa: E402
+from resdb_driver.utils import serialize  # noqa: E402
+
+ASSET_SIZES = {"small": 64, "1k": 1024, "64k": 64 * 1024}
+IO_COUNTS = (1, 8)
+
+
+def make_asset(size):
+    """A file-info style asset whose blob is `size` characters long."""
+    rng = random.Random(size)
+    blob = "".join(rng.choice(string.ascii_letters) for _ in range(size))
+    return {
+        "data": {
+            "file_info": {
+                "cid": "Qm" + "a" * 44,
+                "file_name": "benchmark.bin",
+                "file_type": "bin",
+                "owner_name": "bench",
+                "blob": blob,
+            },
+            "description": "benchmark asset",
+        }
+    }
+
+
+def transfer_inputs(create_tx):
+    return [
+        {
+            "fulfillment": output["condition"]["details"],
+            "fulfills": {"output_index": index, "transaction_id": create_tx["id"]},
+            "owners_before": output["public_keys"],
+        }
+        for index, output in enumerate(create_tx["outputs"])
+    ]
+
+
+def build_cases():
+    """Returns {name: zero-argument callable} for every benchmark case."""
+    alice, bob = generate_keypair(), generate_keypair()
+    cases = {}
+    for size_name, size in ASSET_SIZES.items():
+        asset = make_asset(size)
+        for count in IO_COUNTS:
+            suffix = f"[asset={size_name},io={count}]"
+            recipients = [([alice.public_key], 1)] * count
+
+            def prepare_create(asset=asset, recipients=recipients):
+                return prepare_transaction(
+                    operation="CREATE", signers=alice.public_key, recipients=recipients, asset=asset
+                )
+
+            prepared = prepare_create()
+            create_tx = fulfill_transaction(prepared, private_keys=alice.private_key)
+            inputs = transfer_inputs(create_tx)
+
+            def prepare_transfer(inputs=inputs, create_tx=create_tx, count=count):
+                return prepare_transaction(
+                    operation="TRANSFER",
+                    recipients=[([bob.public_key], count)],
+                    asset={"id": create_tx["id"]},
+                    inputs=inputs,
+                )
+
+            prepared_transfer = prepare_transfer()
+            transfer_tx = fulfill_transaction(prepared_transfer, private_keys=alice.private_key)
+            create_obj = Transaction.from_dict(create_tx)
+
+            cases["prepare_create" + suffix] = prepare_create
+            cases["fulfill_create" + suffix] = (
+                lambda prepared=prepared: fulfill_transaction(prepared, private_keys=alice.private_key)
+            )
+            cases["prepare_transfer" + suffix] = prepare_transfer
+            cases["fulfill_transfer" + suffix] = (
+                lambda prepared=prepared_transfer: fulfill_transaction(prepared, private_keys=alice.private_key)
+            )
+            # CREATE transactions carry the asset, so these scale with its size
+            cases["from_dict" + suffix] = lambda tx=create_tx: Transaction.from_dict(tx)
+            cases["to_dict" + suffix] = lambda tx=create_obj: tx.to_dict()
+            cases["serialize" + suffix] = lambda tx=create_tx: serialize(tx)
+            cases["validate_create" + suffix] = (
+                lambda tx=create_tx: Transaction.from_dict(tx, skip_schema_validation=False).inputs_valid()
+            )
+            cases["validate_transfer" + suffix] = (
+                lambda tx=transfer_tx, outputs=create_obj.outputs: Transaction.from_dict(
+                    tx, skip_schema_validation=False
+                ).inputs_valid(outputs)
+            )
+    return cases
+
+
+def measure(func, min_time, repeats):
+    """Returns (best ops/sec, median ops/sec, peak bytes allocated by one call)."""
+    # Calibrate the number of calls per repeat
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        func()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return 1 / min(timings), 1 / statistics.median(timings), peak - baseline
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change against `baseline` and returns the regressed cases."""
+    regressions = []
+    print(f"\n{'case':<48} {'ops/s':>10} {'base':>10} {'change':>8} {'peak KiB':>9} {'base':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<48} {result['ops_per_sec']:>10.0f} {'-':>10}")
+            continue
+        change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        print(
+            f"{name:<48} {result['ops_per_sec']:>10.0f} {base['ops_per_sec']:>10.0f} {change:>+8.1%} "
+            f"{result['peak_bytes'] / 1024:>9.1f} {base['peak_bytes'] / 1024:>9.1f}"
+        )
+        if change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="shorter runs, noisier numbers")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.10, help="allowed slowdown before --compare fails (default 10%%)"
+    )
+    args = parser.parse_args()
+
+    min_time, repeats = (0.05, 3) if args.quick else (0.2, 5)
+    results = {}
+    print(f"{'case':<48} {'best ops/s':>11} {'median':>10} {'peak KiB':>9}")
+    for name, func in build_cases().items():
+        if args.filter not in name:
+            continue
+        best, median, peak = measure(func, min_time, repeats)
+        results[name] = {"ops_per_sec": best, "median_ops_per_sec": median, "peak_bytes": peak}
+        print(f"{name:<48} {best:>11.0f} {median:>10.0f} {peak / 1024:>9.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}:")
+            for name in regressions:
+                print(f"  {name}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
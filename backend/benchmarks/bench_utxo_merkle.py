@@ -0,0 +1,113 @@
+"""Benchmark for the incremental UTXO-set Merkle tree of the sdk validator.
+
+Builds a UTXOMerkleTree over N random unspent outputs, then measures single
+and batched updates, reading the root, and a save/load round-trip. With
+--naive it also times what ResDB.get_utxoset_merkle_root used to do on every
+call: sort every leaf hash and rebuild the whole tree.
+
+    python benchmarks/bench_utxo_merkle.py --utxos 10000000
+    python benchmarks/bench_utxo_merkle.py --utxos 1000000 --naive
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service.sdk_validator.resdb_validator.merkle import (  # noqa: E402
+    HASH_SIZE,
+    UTXOMerkleTree,
+    sha3_256,
+)
+
+
+def random_hashes(count, rng):
+    """Random leaves; hashing real (txid, index) pairs only costs setup time."""
+    hashes = []
+    while len(hashes) < count:
+        blob = rng.randbytes(min(count - len(hashes), 1 << 20) * HASH_SIZE)
+        hashes.extend(blob[i : i + HASH_SIZE] for i in range(0, len(blob), HASH_SIZE))
+    return hashes
+
+
+def naive_merkleroot(hashes):
+    """The full recomputation the old get_utxoset_merkle_root performed."""
+    if not hashes:
+        return sha3_256(b"").hexdigest()
+    while len(hashes) > 1:
+        if len(hashes) % 2 == 1:
+            hashes.append(hashes[-1])
+        hashes = [
+            sha3_256(hashes[i] + hashes[i + 1]).digest()
+            for i in range(0, len(hashes), 2)
+        ]
+    return hashes[0].hex()
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--utxos", type=int, default=10_000_000)
+    parser.add_argument("--depth", type=int, default=16)
+    parser.add_argument("--updates", type=int, default=10_000, help="single updates to time")
+    parser.add_argument("--block", type=int, default=1_000, help="outputs added and removed per batch")
+    parser.add_argument("--naive", action="store_true", help="also time the full recomputation")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    leaves, elapsed = timed(lambda: random_hashes(args.utxos, rng))
+    print(f"generated {args.utxos} leaves in {elapsed:.1f}s")
+
+    tree, elapsed = timed(lambda: UTXOMerkleTree.from_hashes(leaves, args.depth))
+    print(f"build: {elapsed:.1f}s, depth={args.depth}, ~{args.utxos >> args.depth} utxos per bucket")
+
+    if args.naive:
+        root, elapsed = timed(lambda: naive_merkleroot(sorted(leaves)))
+        print(f"naive recomputation (sort + full tree): {elapsed:.1f}s per root")
+
+    _, elapsed = timed(lambda: [tree.root for _ in range(100_000)])
+    print(f"root read: {elapsed / 100_000 * 1e9:.0f}ns")
+
+    added = random_hashes(args.updates, rng)
+    add_times, remove_times = [], []
+    for leaf in added:
+        start = time.perf_counter()
+        tree.update(added=[leaf])
+        add_times.append(time.perf_counter() - start)
+    for leaf in added:
+        start = time.perf_counter()
+        tree.update(removed=[leaf])
+        remove_times.append(time.perf_counter() - start)
+    for name, times in (("add", add_times), ("remove", remove_times)):
+        times.sort()
+        print(
+            f"single {name}: median={statistics.median(times) * 1e6:.1f}us "
+            f"p99={times[int(0.99 * (len(times) - 1))] * 1e6:.1f}us"
+        )
+
+    spent = rng.sample(leaves, args.block)
+    created = random_hashes(args.block, rng)
+    _, elapsed = timed(lambda: tree.update(added=created, removed=spent))
+    print(f"batch of {args.block} adds + {args.block} removes: {elapsed * 1e3:.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "utxo.merkle")
+        _, save_time = timed(lambda: tree.save(path))
+        loaded, load_time = timed(lambda: UTXOMerkleTree.load(path))
+        size = os.path.getsize(path)
+    print(f"save: {save_time:.1f}s, load: {load_time:.1f}s, file: {size / 2**20:.0f}MiB")
+    if loaded.root != tree.root or len(loaded) != len(tree):
+        sys.exit("loaded tree does not match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Disk-backed cache of IPFS objects keyed by CID.
+
+CIDs are content addresses, so a cached object can never go stale as long
+as it is checked against its CID before it is cached. The cache keeps one
+file per CID in a single directory and evicts the least recently used
+objects once the configured byte budget is exceeded.
+"""
+import base64
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import base58
+
+# CIDv0 is base58btc and CIDv1 defaults to base32, both strictly alphanumeric.
+# Anything else is refused so that a CID read from the ledger can never be
+# used to escape the cache directory.
+_CID_PATTERN = re.compile(r"^[A-Za-z0-9]{1,128}$")
+_PARTIAL_SUFFIX = ".part"
+
+# The CIDs that can be recomputed from the downloaded bytes: sha2-256 raw
+# blocks, and files imported into UnixFS the way IPFS does by default
+# (256KiB chunks in a balanced DAG of up to 174 links per node)
+_SHA2_256 = 0x12
+_DAG_PB = 0x70
+_RAW = 0x55
+_CHUNK_SIZE = 256 * 1024
+_MAX_LINKS = 174
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated varint")
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _parse_cid(cid: str):
+    """Returns (version, codec, sha2-256 digest) of `cid`, or None if it
+    cannot be checked."""
+    try:
+        if cid.startswith("Qm"):
+            version, codec, multihash = 0, _DAG_PB, base58.b58decode(cid)
+        elif cid.startswith("b"):
+            encoded = cid[1:].upper()
+            data = base64.b32decode(encoded + "=" * (-len(encoded) % 8))
+            version, pos = _read_varint(data, 0)
+            codec, pos = _read_varint(data, pos)
+            multihash = data[pos:]
+            if version != 1:
+                return None
+        else:
+            return None
+        code, pos = _read_varint(multihash, 0)
+        length, pos = _read_varint(multihash, pos)
+    except ValueError:
+        return None
+    digest = multihash[pos:]
+    if code != _SHA2_256 or length != 32 or len(digest) != 32:
+        return None
+    return version, codec, digest
+
+
+def _cid_prefix(version: int, codec: int) -> bytes:
+    """The bytes of a binary sha2-256 CID that precede the digest."""
+    multihash_prefix = bytes([_SHA2_256, 32])
+    if version == 0:
+        return multihash_prefix
+    return _varint(1) + _varint(codec) + multihash_prefix
+
+
+def _cid_bytes(version: int, codec: int, block: bytes) -> bytes:
+    return _cid_prefix(version, codec) + hashlib.sha256(block).digest()
+
+
+def _unixfs_file(data: bytes, filesize: int, blocksizes=()) -> bytes:
+    """Encodes a UnixFS File message in dag-pb's field order."""
+    message = b"\x08\x02"
+    if data:
+        message += b"\x12" + _varint(len(data)) + data
+    message += b"\x18" + _varint(filesize)
+    for blocksize in blocksizes:
+        message += b"\x20" + _varint(blocksize)
+    return message
+
+
+def _dag_pb_node(data: bytes, links=()) -> bytes:
+    """Encodes a dag-pb node, whose links come before its data."""
+    node = b""
+    for cid, tsize in links:
+        link = b"\x0a" + _varint(len(cid)) + cid + b"\x12\x00" + b"\x18" + _varint(tsize)
+        node += b"\x12" + _varint(len(link)) + link
+    return node + b"\x0a" + _varint(len(data)) + data
+
+
+def _unixfs_root(path: str, version: int, raw_leaves: bool) -> bytes:
+    """Returns the CID bytes IPFS gives the file at `path` when importing it
+    with the default chunker and the balanced layout."""
+    # (cid, cumulative block size, file size) of each node of the level
+    level = []
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk and level:
+                break
+            if raw_leaves:
+                level.append((_cid_bytes(version, _RAW, chunk), len(chunk), len(chunk)))
+            else:
+                block = _dag_pb_node(_unixfs_file(chunk, len(chunk)))
+                level.append((_cid_bytes(version, _DAG_PB, block), len(block), len(chunk)))
+            if len(chunk) < _CHUNK_SIZE:
+                break
+    while len(level) > 1:
+        parents = []
+        for start in range(0, len(level), _MAX_LINKS):
+            children = level[start:start + _MAX_LINKS]
+            filesize = sum(child[2] for child in children)
+            block = _dag_pb_node(
+                _unixfs_file(b"", filesize, [child[2] for child in children]),
+                [(cid, tsize) for cid, tsize, _ in children],
+            )
+            tsize = len(block) + sum(child[1] for child in children)
+            parents.append((_cid_bytes(version, _DAG_PB, block), tsize, filesize))
+        level = parents
+    return level[0][0]
+
+
+def matches_cid(cid: str, path: str) -> bool:
+    """Whether the file at `path` is the content addressed by `cid`.
+
+    False as well for CIDs that cannot be recomputed here, such as other
+    hash functions or files imported with non-default options.
+    """
+    parsed = _parse_cid(cid)
+    if parsed is None:
+        return False
+    version, codec, digest = parsed
+    if codec == _RAW:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        return sha256.digest() == digest
+    if codec != _DAG_PB:
+        return False
+    # CIDv1 imports use raw leaves by default, CIDv0 ones cannot
+    expected = _cid_prefix(version, codec) + digest
+    layouts = (True, False) if version == 1 else (False,)
+    return any(_unixfs_root(path, version, raw_leaves) == expected for raw_leaves in layouts)
+
+
+class CIDCache:
+    """LRU cache of IPFS objects stored as files under `directory`."""
+
+    @classmethod
+    def from_env(cls) -> "CIDCache":
+        """Builds a cache from `CID_CACHE_DIR` and `CID_CACHE_MAX_BYTES`."""
+        return cls(
+            os.getenv("CID_CACHE_DIR", "cid_cache"),
+            int(os.getenv("CID_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))),
+        )
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # cid -> size, least recently used first
+        self._size = 0
+        self._pins = {}  # cid -> number of readers still using the object
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Rebuilds the index from the cache directory, oldest files first."""
+        # Held throughout, so a concurrent commit cannot be counted twice or
+        # dropped by the rebuild
+        with self._lock:
+            found = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(_PARTIAL_SUFFIX):
+                    # Left behind by an interrupted download
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.remove(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+            self._entries.clear()
+            self._size = 0
+            for _, cid, size in sorted(found):
+                self._entries[cid] = size
+                self._size += size
+            self._evict()
+
+    @staticmethod
+    def is_cacheable(cid: str) -> bool:
+        return bool(cid) and _CID_PATTERN.match(cid) is not None
+
+    def path(self, cid: str) -> str:
+        return os.path.join(self.directory, cid)
+
+    @property
+    def size(self) -> int:
+        """Bytes currently held by the cache."""
+        with self._lock:
+            return self._size
+
+    def pin(self, cid: str) -> Optional[str]:
+        """Returns the path of the cached object for `cid`, or None on a miss.
+
+        The object is not evicted until a matching `unpin`, so it can still
+        be read after the call returns.
+        """
+        with self._lock:
+            if cid not in self._entries:
+                return None
+            self._entries.move_to_end(cid)
+            self._pins[cid] = self._pins.get(cid, 0) + 1
+        path = self.path(cid)
+        try:
+            # Keeps the LRU order across restarts
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._entries.pop(cid, 0)
+            self.unpin(cid)
+            return None
+        return path
+
+    def unpin(self, cid: str):
+        """Releases a `pin`, evicting the object if the cache is over budget."""
+        with self._lock:
+            pins = self._pins.pop(cid, 0) - 1
+            if pins > 0:
+                self._pins[cid] = pins
+            self._evict()
+
+    def temp_path(self) -> str:
+        """Returns a fresh path to download an object into before `commit`."""
+        return os.path.join(self.directory, uuid.uuid4().hex + _PARTIAL_SUFFIX)
+
+    def temp_dir(self) -> str:
+        """Creates a fresh directory for tools that download into a folder."""
+        path = self.temp_path()
+        os.makedirs(path)
+        return path
+
+    def commit(self, cid: str, temp_path: str, pin: bool = False) -> Optional[str]:
+        """Moves a fully downloaded object into the cache.
+
+        Returns the cached path, or None if the object was not cached because
+        its CID is not cacheable, its content does not match the CID or it
+        does not fit in the byte budget. In that case `temp_path` is left
+        untouched for the caller to clean up. With `pin` the object is pinned
+        as by `pin` before it can be evicted.
+
+        Hashes the whole object, so call it off the event loop.
+        """
+        if not self.is_cacheable(cid):
+            return None
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            return None
+        if not matches_cid(cid, temp_path):
+            return None
+        path = self.path(cid)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._size -= self._entries.pop(cid, 0)
+            self._entries[cid] = size
+            self._size += size
+            if pin:
+                self._pins[cid] = self._pins.get(cid, 0) + 1
+            self._evict()
+        return path
+
+    @staticmethod
+    def discard(temp_path: str):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Drops least recently used objects until the budget is met.
+
+        Pinned objects are skipped, so the cache may stay over budget until
+        they are unpinned. Must be called with the lock held.
+        """
+        if self._size <= self.max_bytes:
+            return
+        for cid in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if cid in self._pins:
+                continue
+            self._size -= self._entries.pop(cid)
+            try:
+                os.remove(self.path(cid))
+            except FileNotFoundError:
+                pass
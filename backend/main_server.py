@@ -1,21 +1,60 @@
 import os
+import asyncio
+import logging
 import time
+import uuid
+import mimetypes
 import aiofiles
-import requests
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+import httpx
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header
 from pydantic import BaseModel
-from resdb_driver import Resdb
+from resdb_driver import AsyncResdb, TransactionCache
 from resdb_driver.crypto import generate_keypair
-from typing import Optional
+from resdb_driver.replica import LocalReplica, asset_id, file_info
+from typing import List, Optional
 from dotenv import load_dotenv
 from tempfile import NamedTemporaryFile
 from fastapi.middleware.cors import CORSMiddleware
 import shutil
 from fastapi.responses import FileResponse
 from fastapi.responses import StreamingResponse
-from io import BytesIO
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from cid_cache import CIDCache
 
-app = FastAPI()
+load_dotenv()  # Load environment variables from .env file
+
+logger = logging.getLogger(__name__)
+
+# Local cache of files fetched from the IPFS gateway, keyed by CID
+cid_cache = CIDCache.from_env()
+
+# Shared async HTTP client used to talk to Pinata and its IPFS gateway
+http_client: Optional[httpx.AsyncClient] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = httpx.AsyncClient(timeout=httpx.Timeout(PINATA_TIMEOUT, connect=10.0))
+    replica_sync = None
+    if replica is not None:
+        replica_sync = asyncio.create_task(replica.sync(db))
+        replica_sync.add_done_callback(_replica_sync_stopped)
+    try:
+        yield
+    finally:
+        if replica_sync is not None:
+            replica_sync.cancel()
+            await asyncio.gather(replica_sync, return_exceptions=True)
+            replica.close()
+        await http_client.aclose()
+        await db.close()
+        tx_cache.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -32,15 +71,49 @@ app.add_middleware(
 
 # ResilientDB setup
 db_root_url = "https://crow.resilientdb.com"
-db = Resdb(db_root_url)
+# Committed transactions never change, so lookups are served from this cache when possible
+tx_cache = TransactionCache(
+    maxsize=int(os.getenv("TX_CACHE_SIZE", "4096")), path=os.getenv("TX_CACHE_PATH")
+)
+db = AsyncResdb(db_root_url, tx_cache=tx_cache)
+# Local indexed copy of the ledger, kept up to date from the node's block
+# feed. Reads are served from it and only go to the node on a miss
+replica_path = os.getenv("LOCAL_REPLICA_PATH")
+replica = LocalReplica(replica_path) if replica_path else None
+# Why the replica stopped following the ledger, if it did. Its data is
+# stale from then on, so catalog queries are refused
+replica_error: Optional[BaseException] = None
 
 
+def _replica_sync_stopped(task: asyncio.Task):
+    global replica_error
+    if task.cancelled():
+        return
+    replica_error = task.exception() or RuntimeError("the block feed ended")
+    logger.error(
+        "Local replica stopped syncing at block %d, catalog queries are disabled",
+        replica.height,
+        exc_info=replica_error,
+    )
+
 
-load_dotenv()  # Load environment variables from .env file
 
 PINATA_API_KEY = os.getenv("PINATA_API_KEY")
 PINATA_API_SECRET = os.getenv("PINATA_API_SECRET")
 PINATA_URL = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+PINATA_TIMEOUT = 300  # seconds, generous because uploads are streamed
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+BATCH_PIN_CONCURRENCY = 8  # files pinned to Pinata at once by /upload_batch/
+BATCH_COMMIT_CONCURRENCY = 16  # transactions in flight to ResilientDB at once
+
+# Gateway response headers forwarded to clients of /retrieve_file/
+GATEWAY_PASSTHROUGH_HEADERS = (
+    "content-length",
+    "content-range",
+    "accept-ranges",
+    "etag",
+    "last-modified",
+)
 
 if not PINATA_API_KEY or not PINATA_API_SECRET:
     raise HTTPException(status_code=500, detail="Missing Pinata API keys in environment variables")
@@ -53,6 +126,105 @@ class TransferRequest(BaseModel):
     new_owner_name: str
     current_owner_private_key: str
 
+
+async def _multipart_file_body(file: UploadFile, file_name: str, boundary: str, stats: dict):
+    """Yields a multipart/form-data body holding `file`, one chunk at a time."""
+    quoted_name = file_name.replace("\\", "\\\\").replace('"', '\\"')
+    content_type = file.content_type or "application/octet-stream"
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{quoted_name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        stats["file_size"] += len(chunk)
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+async def pin_file_to_ipfs(file: UploadFile, file_name: str):
+    """Streams `file` to Pinata and returns its (CID, size in bytes)."""
+    boundary = uuid.uuid4().hex
+    stats = {"file_size": 0}
+    headers = {
+        "pinata_api_key": PINATA_API_KEY,
+        "pinata_secret_api_key": PINATA_API_SECRET,
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+    }
+    response = await http_client.post(
+        PINATA_URL,
+        headers=headers,
+        content=_multipart_file_body(file, file_name, boundary, stats),
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Error uploading to Pinata: {response.text}")
+    return response.json()["IpfsHash"], stats["file_size"]
+
+
+def _upload_file_name(file: UploadFile) -> str:
+    return os.path.basename(file.filename or "") or "upload"
+
+
+def _file_asset(file_name: str, file_cid: str, owner_name: str, owner_public_key: str, upload_time: str) -> dict:
+    """Builds the ResilientDB asset describing a file pinned to IPFS."""
+    file_extension = os.path.splitext(file_name)[1].lstrip(".")
+    file_type = file_extension or "unknown"
+    return {
+        "data": {
+            "file_info": {
+                "cid": file_cid,
+                "file_name": file_name,
+                "file_type": file_type,
+                "creation_time": upload_time,
+                "modification_time": upload_time,
+                "owner_key": owner_public_key,
+                "owner_name": owner_name,
+            },
+            "description": f"File '{file_name}' uploaded by {owner_name}",
+        },
+    }
+
+
+def _create_asset_tx(asset_metadata: dict, owner_public_key: str, owner_private_key: str) -> dict:
+    """Prepares and signs the CREATE transaction for an asset."""
+    prepared_tx = db.transactions.prepare(
+        operation="CREATE",
+        signers=owner_public_key,
+        recipients=[([owner_public_key], 1)],
+        asset=asset_metadata,
+    )
+    return db.transactions.fulfill(prepared_tx, private_keys=owner_private_key)
+
+
+def _transfer_asset_tx(
+    asset_tx_id: str, transfer_input: dict, metadata: dict, new_owner_public_key: str, owner_private_key: str
+) -> dict:
+    """Prepares and signs the TRANSFER transaction handing an asset to a new owner."""
+    prepared_tx = db.transactions.prepare(
+        operation="TRANSFER",
+        asset={"id": asset_tx_id},  # Original asset ID
+        metadata=metadata,  # Updated metadata
+        inputs=transfer_input,
+        recipients=[([new_owner_public_key], 1)],  # New owner's public key
+    )
+    return db.transactions.fulfill(prepared_tx, private_keys=owner_private_key)
+
+
+async def _get_transaction(tx_id: str) -> dict:
+    """Reads a transaction from the local replica, or from ResilientDB on a miss."""
+    tx = replica.get(tx_id) if replica is not None else None
+    if tx is None:
+        tx = await db.transactions.retrieve(txid=tx_id)
+    return tx
+
+
+def _require_replica():
+    if replica is None:
+        raise HTTPException(status_code=503, detail="Set LOCAL_REPLICA_PATH to enable catalog queries")
+    if replica_error is not None:
+        raise HTTPException(status_code=503, detail="The local replica is out of sync with the ledger")
+
+
 # Endpoint to upload the file and store metadata
 @app.post("/upload_and_store/")
 async def upload_and_store(
@@ -62,72 +234,18 @@ async def upload_and_store(
     owner_private_key: str = Form(...),
 ):
     try:
-        # Save the uploaded file temporarily using aiofiles for async file handling
-        temp_file_path = file.filename
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            while contents := await file.read(1024 * 1024):
-                await f.write(contents)
-
-        # Get file extension and metadata
-        file_extension = os.path.splitext(temp_file_path)[1].lstrip(".")
-        file_type = file_extension or "unknown"
-        file_metadata = {
-            "file_name": os.path.basename(temp_file_path),
-            "file_size": os.path.getsize(temp_file_path),
-            "file_type": file_type,
-            "creation_time": time.ctime(os.path.getctime(temp_file_path)),
-            "modification_time": time.ctime(os.path.getmtime(temp_file_path)),
-            "is_file": os.path.isfile(temp_file_path),
-        }
+        file_name = _upload_file_name(file)
+        upload_time = time.ctime()
 
-        # Upload file to Pinata
-        with open(temp_file_path, "rb") as file_to_upload:
-            files = {
-                "file": file_to_upload,
-            }
-            headers = {
-                "pinata_api_key": PINATA_API_KEY,
-                "pinata_secret_api_key": PINATA_API_SECRET,
-            }
-
-            # Sending request to Pinata
-            response = requests.post(PINATA_URL, headers=headers, files=files)
-            if response.status_code == 200:
-                pinata_res = response.json()
-                file_cid = pinata_res["IpfsHash"]
-            else:
-                raise HTTPException(status_code=500, detail=f"Error uploading to Pinata: {response.text}")
+        # Stream the upload straight to Pinata, without a temporary file
+        file_cid, _ = await pin_file_to_ipfs(file, file_name)
 
         # Create digital asset metadata for ResilientDB
-        asset_metadata = {
-            "data": {
-                "file_info": {
-                    "cid": file_cid,
-                    "file_name": file_metadata["file_name"],
-                    "file_type": file_metadata["file_type"],
-                    "creation_time": file_metadata["creation_time"],
-                    "modification_time": file_metadata["modification_time"],
-                    "owner_key": owner_public_key,
-                    "owner_name": owner_name,
-                },
-                "description": f"File '{file_metadata['file_name']}' uploaded by {owner_name}",
-            },
-        }
+        asset_metadata = _file_asset(file_name, file_cid, owner_name, owner_public_key, upload_time)
 
-        # Clean up the temporary file
-        os.remove(temp_file_path)
-
-        # Create a transaction in ResilientDB
-        prepared_tx = db.transactions.prepare(
-            operation="CREATE",
-            signers=owner_public_key,
-            recipients=[([owner_public_key], 1)],
-            asset=asset_metadata,
-        )
-
-        # Fulfill and send the transaction to ResilientDB
-        fulfilled_tx = db.transactions.fulfill(prepared_tx, private_keys=owner_private_key)
-        db.transactions.send_commit(fulfilled_tx)
+        # Create, fulfill and send the transaction to ResilientDB
+        fulfilled_tx = await run_in_threadpool(_create_asset_tx, asset_metadata, owner_public_key, owner_private_key)
+        await db.transactions.send_commit(fulfilled_tx)
 
         return {
             "message": f"Asset created and committed with transaction ID: {fulfilled_tx['id']}",
@@ -136,43 +254,211 @@ async def upload_and_store(
         }
 
     except Exception as e:
-        # Handle errors and clean up temp files in case of failure
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
         raise HTTPException(status_code=500, detail=f"Error processing the file: {e}")
 
+
+# Endpoint to upload many files and store their metadata in one request
+@app.post("/upload_batch/")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    owner_name: str = Form(...),
+    owner_public_key: str = Form(...),
+    owner_private_key: str = Form(...),
+):
+    upload_time = time.ctime()
+    file_names = [_upload_file_name(file) for file in files]
+    results = [{"file_name": file_name} for file_name in file_names]
+
+    def fail(index: int, error: Exception):
+        detail = error.detail if isinstance(error, HTTPException) else error
+        results[index].update(status="failed", error=str(detail))
+
+    # Pin every file to IPFS, a bounded number at a time
+    pin_slots = asyncio.Semaphore(BATCH_PIN_CONCURRENCY)
+
+    async def pin(file: UploadFile, file_name: str):
+        async with pin_slots:
+            return await pin_file_to_ipfs(file, file_name)
+
+    pinned = await asyncio.gather(
+        *(pin(file, file_name) for file, file_name in zip(files, file_names)), return_exceptions=True
+    )
+
+    # Build and sign the CREATE transactions off the event loop
+    async def create(index: int, file_cid: str):
+        asset_metadata = _file_asset(file_names[index], file_cid, owner_name, owner_public_key, upload_time)
+        fulfilled_tx = await run_in_threadpool(_create_asset_tx, asset_metadata, owner_public_key, owner_private_key)
+        return asset_metadata, fulfilled_tx
+
+    pending = []
+    for index, pin_result in enumerate(pinned):
+        if isinstance(pin_result, Exception):
+            fail(index, pin_result)
+        else:
+            pending.append(index)
+    created = await asyncio.gather(*(create(index, pinned[index][0]) for index in pending), return_exceptions=True)
+
+    # Commit the transactions to ResilientDB, a bounded number at a time
+    to_commit = []
+    for index, create_result in zip(pending, created):
+        if isinstance(create_result, Exception):
+            fail(index, create_result)
+        else:
+            to_commit.append((index, *create_result))
+    committed = await db.transactions.send_commit_many(
+        [fulfilled_tx for _, _, fulfilled_tx in to_commit], concurrency=BATCH_COMMIT_CONCURRENCY
+    )
+
+    for (index, asset_metadata, fulfilled_tx), commit_result in zip(to_commit, committed):
+        if isinstance(commit_result, Exception):
+            fail(index, commit_result)
+        else:
+            results[index].update(
+                status="committed",
+                file_hash=fulfilled_tx["id"],
+                file_metadata=asset_metadata,
+            )
+
+    num_committed = sum(result["status"] == "committed" for result in results)
+    return {
+        "message": f"{num_committed} of {len(results)} files committed",
+        "results": results,
+    }
+
+class _CachedFileResponse(FileResponse):
+    """Serves an object pinned in the CID cache and unpins it once sent."""
+
+    def __init__(self, cid: str, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self.cid = cid
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            cid_cache.unpin(self.cid)
+
+
+async def _stream_into_cache(res: httpx.Response, cid: str):
+    """Passes a gateway response through while copying it into the CID cache."""
+    temp_path = cid_cache.temp_path()
+    complete = False
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            async for chunk in res.aiter_raw():
+                await f.write(chunk)
+                yield chunk
+        complete = True
+    finally:
+        await res.aclose()
+        expected_size = res.headers.get("content-length")
+        if complete and (expected_size is None or int(expected_size) == os.path.getsize(temp_path)):
+            # Checked against the CID first, a bad gateway response would
+            # otherwise be served from the cache for good
+            if await run_in_threadpool(cid_cache.commit, cid, temp_path) is None:
+                cid_cache.discard(temp_path)
+        else:
+            cid_cache.discard(temp_path)
+
+
 # Endpoint to retrieve file from IPFS using ResilientDB transaction hash
+@app.get("/retrieve_file/")
 @app.post("/retrieve_file/")
-def retrieve_file(tx_id: str):
+async def retrieve_file(tx_id: str, range_header: Optional[str] = Header(None, alias="Range")):
     try:
         # Retrieve metadata from ResilientDB
-        tx = db.transactions.retrieve(txid=tx_id)
+        tx = await _get_transaction(tx_id)
         updated_asset_metadata = tx["asset"]["data"]["file_info"]
         file_cid = updated_asset_metadata["cid"]
 
-        # Fetch the file from Pinata's IPFS gateway
+        # Serve hot files straight from the local CID cache
+        cached_path = cid_cache.pin(file_cid)
+        if cached_path is not None:
+            media_type = mimetypes.guess_type(updated_asset_metadata.get("file_name", ""))[0]
+            return _CachedFileResponse(
+                file_cid, cached_path, media_type=media_type or "application/octet-stream"
+            )
+
+        # Stream the file from Pinata's IPFS gateway, chunk by chunk
         ipfs_url = f"https://gateway.pinata.cloud/ipfs/{file_cid}"
-        res = requests.get(ipfs_url)
+        request_headers = {"Accept-Encoding": "identity"}
+        if range_header:
+            request_headers["Range"] = range_header
+        res = await http_client.send(
+            http_client.build_request("GET", ipfs_url, headers=request_headers), stream=True
+        )
 
-        if res.status_code == 200:
-            # Save file temporarily
-            file_like_object = BytesIO(res.content)
-            # Return file as a response
-            return StreamingResponse(file_like_object, media_type="application/octet-stream")
+        if res.status_code not in (200, 206):
+            await res.aread()
+            await res.aclose()
+            status_code = 416 if res.status_code == 416 else 500
+            raise HTTPException(status_code=status_code, detail=f"Error retrieving file from Pinata: {res.text}")
 
+        headers = {name: res.headers[name] for name in GATEWAY_PASSTHROUGH_HEADERS if name in res.headers}
+        if res.status_code == 200 and cid_cache.is_cacheable(file_cid):
+            # Full responses are copied into the cache while they are streamed
+            body, background = _stream_into_cache(res, file_cid), None
         else:
-            raise HTTPException(status_code=500, detail=f"Error retrieving file from Pinata: {res.text}")
+            body, background = res.aiter_raw(), BackgroundTask(res.aclose)
+        return StreamingResponse(
+            body,
+            status_code=res.status_code,
+            headers=headers,
+            media_type=res.headers.get("content-type", "application/octet-stream"),
+            background=background,
+        )
+    except HTTPException:
+        raise
     except KeyError as e:
         raise HTTPException(status_code=404, detail=f"Error retrieving file metadata: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving file from IPFS: {e}")
 
+# Endpoint to list files by owner, CID or name, answered by the local replica
+@app.get("/files/")
+async def list_files(
+    owner_public_key: Optional[str] = None,
+    cid: Optional[str] = None,
+    file_name: Optional[str] = None,
+):
+    _require_replica()
+    if owner_public_key:
+        txs = replica.owned_by(owner_public_key)
+    elif cid:
+        txs = replica.find_by_cid(cid)
+    elif file_name:
+        txs = replica.find_by_file_name(file_name)
+    else:
+        raise HTTPException(status_code=400, detail="Pass owner_public_key, cid or file_name")
+
+    # Transactions come in ledger order, so the latest one of each asset wins
+    files = {}
+    for tx in txs:
+        info = file_info(tx)
+        if info is None or (cid and info.get("cid") != cid) or (file_name and info.get("file_name") != file_name):
+            continue
+        files[asset_id(tx)] = {"asset_id": asset_id(tx), "tx_id": tx["id"], "file_info": info}
+    for file in files.values():
+        file["owners"] = replica.owners(file["asset_id"])
+    return list(files.values())
+
+
+# Endpoint to list the transactions of an asset, answered by the local replica
+@app.get("/asset_history/")
+async def asset_history(asset_id: str):
+    _require_replica()
+    history = replica.asset_history(asset_id)
+    if not history:
+        raise HTTPException(status_code=404, detail=f"Unknown asset {asset_id}")
+    return {"asset_id": asset_id, "owners": replica.owners(asset_id), "transactions": history}
+
+
 # Endpoint to transfer ownership of the asset (not currently in use in this example)
 @app.post("/transfer_ownership/")
-def transfer_ownership(request: TransferRequest):
+async def transfer_ownership(request: TransferRequest):
     try:
         # Retrieve the existing asset
-        asset = db.transactions.retrieve(txid=request.asset_tx_id)
+        asset = await _get_transaction(request.asset_tx_id)
         if not asset:
             raise ValueError(f"Asset with transaction ID {request.asset_tx_id} not found.")
 
@@ -191,19 +477,16 @@ def transfer_ownership(request: TransferRequest):
             "owners_before": asset["outputs"][0]["public_keys"],
         }
 
-        prepared_transfer_tx = db.transactions.prepare(
-            operation="TRANSFER",
-            asset={"id": request.asset_tx_id},  # Original asset ID
-            metadata=updated_metadata,  # Updated metadata
-            inputs=transfer_input,
-            recipients=[([request.new_owner_public_key], 1)],  # New owner's public key
-        )
-
-        # Fulfill and commit the transfer transaction
-        fulfilled_transfer_tx = db.transactions.fulfill(
-            prepared_transfer_tx, private_keys=request.current_owner_private_key
+        # Prepare and fulfill off the event loop, then commit the transfer transaction
+        fulfilled_transfer_tx = await run_in_threadpool(
+            _transfer_asset_tx,
+            request.asset_tx_id,
+            transfer_input,
+            updated_metadata,
+            request.new_owner_public_key,
+            request.current_owner_private_key,
         )
-        db.transactions.send_commit(fulfilled_transfer_tx)
+        await db.transactions.send_commit(fulfilled_transfer_tx)
 
         print(f"Ownership successfully transferred to {request.new_owner_name} ({request.new_owner_public_key})")
         print(f"New Transaction ID: {fulfilled_transfer_tx['id']}")
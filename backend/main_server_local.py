@@ -3,15 +3,15 @@ import time
 import aiofiles
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form
 from pydantic import BaseModel
-from resdb_driver import Resdb
+from resdb_driver import Resdb, TransactionCache
 from resdb_driver.crypto import generate_keypair
 from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from io import BytesIO
-from tempfile import NamedTemporaryFile
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 import shutil
 import ipfshttpclient
+from cid_cache import CIDCache
 
 app = FastAPI()
 
@@ -30,8 +30,12 @@ app.add_middleware(
 )
 
 # ResilientDB setup
-db = Resdb("http://127.0.0.1:18000")  # Local ResilientDB
+tx_cache = TransactionCache(
+    maxsize=int(os.getenv("TX_CACHE_SIZE", "4096")), path=os.getenv("TX_CACHE_PATH")
+)  # Committed transactions never change, so lookups are cached
+db = Resdb("http://127.0.0.1:18000", tx_cache=tx_cache)  # Local ResilientDB
 ipfs_client = ipfshttpclient.connect("/ip4/127.0.0.1/tcp/5001/http")  # Local IPFS node
+cid_cache = CIDCache.from_env()  # Local cache of files fetched from IPFS, keyed by CID
 
 # Models for API
 class TransferRequest(BaseModel):
@@ -116,36 +120,60 @@ async def upload_and_store(
         raise HTTPException(status_code=500, detail=f"Error processing the file: {e}")
 
 
+class _CachedFileResponse(FileResponse):
+    """Serves an object pinned in the CID cache and unpins it once sent."""
+
+    def __init__(self, cid: str, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self.cid = cid
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            cid_cache.unpin(self.cid)
+
+
 # Endpoint to retrieve file from IPFS using ResilientDB transaction hash
 @app.post("/retrieve_file/")
 def retrieve_file(tx_id: str):
+    download_dir = None
     try:
         # Retrieve metadata from ResilientDB
         tx = db.transactions.retrieve(txid=tx_id)
         updated_asset_metadata = tx["asset"]["data"]["file_info"]
         file_cid = updated_asset_metadata["cid"]
-
-        # Fetch the file from local IPFS
-        temp_file = NamedTemporaryFile(delete=False)
-        ipfs_client.get(file_cid, target=temp_file.name)
-
-        # Stream the file as response
-        temp_file.close()
-        with open(temp_file.name, "rb") as f:
-            return StreamingResponse(
-                BytesIO(f.read()),
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": f"attachment; filename={updated_asset_metadata['file_name']}"},
-            )
+        headers = {"Content-Disposition": f"attachment; filename={updated_asset_metadata['file_name']}"}
+
+        # Serve hot files straight from the local CID cache
+        cached_path = cid_cache.pin(file_cid)
+        if cached_path is not None:
+            return _CachedFileResponse(file_cid, cached_path, media_type="application/octet-stream", headers=headers)
+
+        # Fetch the file from local IPFS next to the cache, then move it in
+        download_dir = cid_cache.temp_dir()
+        ipfs_client.get(file_cid, target=download_dir)
+        downloaded_path = os.path.join(download_dir, file_cid)
+        cached_path = cid_cache.commit(file_cid, downloaded_path, pin=True)
+        if cached_path is not None:
+            shutil.rmtree(download_dir, ignore_errors=True)
+            return _CachedFileResponse(file_cid, cached_path, media_type="application/octet-stream", headers=headers)
+
+        # Too large for the cache: serve it once and clean up afterwards
+        cleanup = BackgroundTask(shutil.rmtree, download_dir, ignore_errors=True)
+        download_dir = None
+        return FileResponse(
+            downloaded_path, media_type="application/octet-stream", headers=headers, background=cleanup
+        )
 
     except KeyError as e:
         raise HTTPException(status_code=404, detail=f"Error retrieving file metadata: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving file from IPFS: {e}")
     finally:
-        # Clean up temp file
-        if temp_file and os.path.exists(temp_file.name):
-            os.remove(temp_file.name)
+        # Clean up a download that did not make it into a response
+        if download_dir is not None and os.path.exists(download_dir):
+            shutil.rmtree(download_dir, ignore_errors=True)
 
 
 # Endpoint to transfer ownership of the asset
@@ -1 +1,5 @@
-from .driver import Resdb
+from .cache import TransactionCache
+from .driver import AsyncResdb, Resdb
+from .feed import BlockFeed
+from .replica import LocalReplica
+from .tracker import CommitTracker
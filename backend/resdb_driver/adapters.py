@@ -0,0 +1,185 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import threading
+import time
+
+from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+
+class PoolStats:
+    """! Counters describing how well HTTP connections to a node are reused.
+
+    Attributes:
+        requests (int): Connections checked out of the pool, one per request.
+        reused (int): Checkouts that got an already open connection.
+        new_connections (int): TCP connections opened, each one costing a
+            handshake (and a TLS handshake for ``https`` nodes).
+        waits (int): Checkouts that found every pooled connection busy. The
+            request then waited for one (``pool_block``) or opened an extra
+            connection that is closed afterwards.
+        recycled (int): Connections closed because they sat idle for longer
+            than the idle timeout.
+    """
+
+    FIELDS = ("requests", "reused", "new_connections", "waits", "recycled")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def count(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    @property
+    def reuse_rate(self) -> float:
+        """! Share of the requests served over an already open connection."""
+        return self.reused / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            stats = {field: getattr(self, field) for field in self.FIELDS}
+        stats["reuse_rate"] = stats["reused"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+
+class _CountingConnectionMixin:
+    """! Counts the connects of a urllib3 connection in its pool's stats."""
+
+    _resdb_stats = None
+
+    def connect(self):
+        super().connect()
+        if self._resdb_stats is not None:
+            self._resdb_stats.count("new_connections")
+
+
+class CountingHTTPConnection(_CountingConnectionMixin, HTTPConnection):
+    pass
+
+
+class CountingHTTPSConnection(_CountingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _InstrumentedPoolMixin:
+    """! Keeps :class:`PoolStats` for a urllib3 connection pool and closes
+    connections that have been idle for longer than ``idle_timeout``.
+    """
+
+    stats = None
+    idle_timeout = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn._resdb_stats = self.stats
+        return conn
+
+    def _get_conn(self, timeout=None):
+        exhausted = self.pool is not None and self.pool.empty()
+        conn = super()._get_conn(timeout=timeout)
+        self.stats.count("requests")
+        if exhausted:
+            self.stats.count("waits")
+        idle_since = getattr(conn, "_resdb_idle_since", None)
+        if (
+            conn.sock is not None
+            and self.idle_timeout is not None
+            and idle_since is not None
+            and time.monotonic() - idle_since > self.idle_timeout
+        ):
+            # The node has probably dropped it already, better reconnect now
+            conn.close()
+            self.stats.count("recycled")
+        if conn.sock is not None:
+            self.stats.count("reused")
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._resdb_idle_since = time.monotonic()
+        super()._put_conn(conn)
+
+
+class InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+
+class InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+
+class InstrumentedPoolManager(PoolManager):
+    """! A :class:`urllib3.PoolManager` whose pools share one
+    :class:`PoolStats` and honour an idle timeout.
+    """
+
+    def __init__(self, *args, stats: PoolStats, idle_timeout: float = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+        self.idle_timeout = idle_timeout
+        self.pool_classes_by_scheme = {
+            "http": InstrumentedHTTPConnectionPool,
+            "https": InstrumentedHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool.stats = self.stats
+        pool.idle_timeout = self.idle_timeout
+        return pool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """! A :class:`requests.adapters.HTTPAdapter` that keeps
+    :class:`PoolStats` and recycles idle keep-alive connections.
+    """
+
+    def __init__(self, *, idle_timeout: float = None, **kwargs):
+        """! Initializes a :class:`~resdb_driver.adapters.PooledHTTPAdapter`.
+
+        @param idle_timeout (float): Optional number of seconds after which
+                an idle connection is closed instead of reused. Should be
+                lower than the keep-alive timeout of the node.
+        @param kwargs: Passed on to :class:`requests.adapters.HTTPAdapter`,
+                e.g. ``pool_maxsize``, ``pool_block`` or ``max_retries``.
+
+        @return An instance of the PooledHTTPAdapter class
+        """
+        # Needed by init_poolmanager, which the parent constructor calls
+        self.idle_timeout = idle_timeout
+        self.stats = PoolStats()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = InstrumentedPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            stats=self.stats,
+            idle_timeout=self.idle_timeout,
+            **pool_kwargs,
+        )
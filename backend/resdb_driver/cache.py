@@ -0,0 +1,151 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import rapidjson
+
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class TransactionCache:
+    """! A size-bounded cache of committed transactions, keyed by id.
+
+    Committed transactions are immutable, so entries never expire; the
+    least recently used ones are dropped once ``maxsize`` is reached.
+    Transactions are kept serialized and every lookup returns a fresh
+    dict, so callers are free to modify what they get back.
+
+    If ``path`` is given, transactions are also written to a SQLite file
+    which acts as a second tier shared by every process that opens it
+    (e.g. several server workers) and survives restarts.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, path: str = None):
+        """! Initializes a :class:`~resdb_driver.cache.TransactionCache`.
+
+        @param maxsize (int): Maximal number of transactions kept in memory.
+        @param path (str): Optional path of the SQLite file backing the
+                on-disk tier. The in-memory tier is used alone if omitted.
+
+        @return An instance of the TransactionCache class
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = OrderedDict()  # txid -> serialized transaction
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS transactions "
+                "(id TEXT PRIMARY KEY, body TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, txid: str) -> bool:
+        return self._get_serialized(txid) is not None
+
+    def get(self, txid: str) -> Optional[dict]:
+        """! Looks up a transaction.
+
+        @param txid (str): Id of the transaction.
+
+        @return A copy of the cached transaction, or ``None`` on a miss.
+        """
+        body = self._get_serialized(txid)
+        return rapidjson.loads(body) if body is not None else None
+
+    def put(self, transaction: dict):
+        """! Adds a committed transaction to the cache.
+
+        Anything that does not look like a transaction (no ``id``) is
+        ignored, so node responses can be passed in unchecked.
+
+        @param transaction (dict): The committed transaction.
+        """
+        self.put_many((transaction,))
+
+    def put_many(self, transactions):
+        """! Adds several committed transactions to the cache, writing them
+        to the on-disk tier in a single SQLite transaction.
+
+        Like :meth:`put`, anything without an ``id`` is ignored.
+
+        @param transactions (iterable): The committed transactions.
+        """
+        rows = [
+            (transaction["id"], rapidjson.dumps(transaction))
+            for transaction in transactions
+            if isinstance(transaction, dict)
+            and isinstance(transaction.get("id"), str)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            for txid, body in rows:
+                self._remember(txid, body)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO transactions (id, body) VALUES (?, ?)",
+                    rows,
+                )
+                self._db.commit()
+
+    def clear(self):
+        """! Empties the in-memory tier. The on-disk tier is left untouched."""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        """! Closes the on-disk tier, if any."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _get_serialized(self, txid: str) -> Optional[str]:
+        with self._lock:
+            body = self._entries.get(txid)
+            if body is not None:
+                self._entries.move_to_end(txid)
+                return body
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT body FROM transactions WHERE id = ?", (txid,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._remember(txid, row[0])
+            return row[0]
+
+    def _remember(self, txid: str, body: str):
+        """! Stores ``body`` in memory. Must be called with the lock held."""
+        self._entries[txid] = body
+        self._entries.move_to_end(txid)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
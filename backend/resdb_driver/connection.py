@@ -16,41 +16,94 @@
 # under the License.
 
 
+import asyncio
+import threading
 import time
 
 from collections import namedtuple
-from datetime import datetime, timedelta
 
+import httpx
 from requests import Session
 from requests.exceptions import ConnectionError
 
+from .adapters import PooledHTTPAdapter, PoolStats
 from .exceptions import HTTP_EXCEPTIONS, TransportError
 
 
 BACKOFF_DELAY = 0.5  # seconds
+LATENCY_EWMA_ALPHA = 0.2  # weight of the latest sample in the latency average
 
 HttpResponse = namedtuple("HttpResponse", ("status_code", "headers", "data"))
 
+# httpx errors that mean the node could not be reached, the async
+# counterpart of :class:`requests.exceptions.ConnectionError`
+ASYNC_CONNECTION_ERRORS = (httpx.NetworkError, httpx.ConnectTimeout)
+
 
 class Connection:
     """! A Connection object to make HTTP requests to a particular node."""
 
-    def __init__(self, *, node_url: str, headers: dict = None):
+    def __init__(
+        self,
+        *,
+        node_url: str,
+        headers: dict = None,
+        pool_maxsize: int = None,
+        pool_block: bool = False,
+        max_retries: int = 0,
+        idle_timeout: float = None,
+    ):
         """! Initializes a :class:`~resdb_driver.connection.Connection`
         instance.
 
             @param node_url (str): Url of the node to connect to.
             @param headers (dict): Optional headers to send with each request.
+            @param pool_maxsize (int): Maximal number of keep-alive
+                connections kept open to the node. Defaults to the
+                requests default of 10. Size it to the number of threads
+                sharing the driver.
+            @param pool_block (bool): Whether a request waits for a free
+                pooled connection instead of opening a throwaway one when
+                all of them are busy.
+            @param max_retries (int): Number of times a failed connection
+                attempt is retried on the same node before the transport
+                moves on to the next one.
+            @param idle_timeout (float): Optional number of seconds after
+                which an idle connection is closed instead of reused.
 
             @return An instance of the Connection class
         """
         self.node_url = node_url
-        self.session = Session()
-        if headers:
-            self.session.headers.update(headers)
+        self._open_session(
+            headers=headers,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+            idle_timeout=idle_timeout,
+        )
 
+        # Guards the backoff and load bookkeeping, the connection is shared
+        # by every thread using the driver
+        self._lock = threading.Lock()
         self._retries = 0
         self.backoff_time = None
+        self.in_flight = 0  # requests currently being made to the node
+        self.latency = None  # moving average of the response time, in seconds
+
+    def _open_session(
+        self, *, headers, pool_maxsize, pool_block, max_retries, idle_timeout
+    ):
+        self.session = Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter_options = dict(
+            pool_block=pool_block, max_retries=max_retries, idle_timeout=idle_timeout
+        )
+        if pool_maxsize is not None:
+            adapter_options["pool_maxsize"] = pool_maxsize
+        self.adapter = PooledHTTPAdapter(**adapter_options)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
 
     def request(
         self,
@@ -66,10 +119,12 @@ class Connection:
     ) -> HttpResponse:
         """! Performs an HTTP request with the given parameters. Implements exponential backoff.
 
-        If `ConnectionError` occurs, a timestamp equal to now +
+        If `ConnectionError` occurs, a deadline equal to now +
         the default delay (`BACKOFF_DELAY`) is assigned to the object.
-        The timestamp is in UTC. Next time the function is called, it either
-        waits till the timestamp is passed or raises `TimeoutError`.
+        The deadline is read from :func:`time.monotonic`. The connection does
+        not wait for it by itself: callers are expected to check
+        :meth:`get_backoff_timedelta` and use another node in the meantime,
+        which is what :class:`~resdb_driver.transport.Transport` does.
 
         If `ConnectionError` occurs two or more times in a row,
         the retry count is incremented and the new timestamp is calculated
@@ -91,16 +146,9 @@ class Connection:
         @return Response of the HTTP request.
         """
 
-        backoff_timedelta = self.get_backoff_timedelta()
-
-        if timeout is not None and timeout < backoff_timedelta:
-            raise TimeoutError
-
-        if backoff_timedelta > 0:
-            time.sleep(backoff_timedelta)
-
         connExc = None
-        timeout = timeout if timeout is None else timeout - backoff_timedelta
+        self._request_started()
+        start = time.monotonic()
         try:
             response = self._request(
                 method=method,
@@ -115,26 +163,56 @@ class Connection:
             connExc = err
             raise err
         finally:
+            self._request_finished(time.monotonic() - start, success=connExc is None)
             self.update_backoff_time(success=connExc is None, backoff_cap=backoff_cap)
         return response
 
     def get_backoff_timedelta(self) -> float:
-        if self.backoff_time is None:
+        backoff_time = self.backoff_time
+        if backoff_time is None:
             return 0
 
-        return (self.backoff_time - datetime.utcnow()).total_seconds()
+        return backoff_time - time.monotonic()
 
     def update_backoff_time(self, success, backoff_cap=None):
-        if success:
-            self._retries = 0
-            self.backoff_time = None
-        else:
-            utcnow = datetime.utcnow()
-            backoff_delta = BACKOFF_DELAY * 2**self._retries
-            if backoff_cap is not None:
-                backoff_delta = min(backoff_delta, backoff_cap)
-            self.backoff_time = utcnow + timedelta(seconds=backoff_delta)
-            self._retries += 1
+        with self._lock:
+            if success:
+                self._retries = 0
+                self.backoff_time = None
+            else:
+                backoff_delta = BACKOFF_DELAY * 2**self._retries
+                if backoff_cap is not None:
+                    backoff_delta = min(backoff_delta, backoff_cap)
+                self.backoff_time = time.monotonic() + backoff_delta
+                self._retries += 1
+
+    def pool_stats(self) -> dict:
+        """! Statistics of the HTTP connection pool to the node, see
+        :class:`~resdb_driver.adapters.PoolStats`.
+        """
+        return self.adapter.stats.as_dict()
+
+    def close(self):
+        """! Closes the underlying HTTP session."""
+        self.session.close()
+
+    def _request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def _request_finished(self, elapsed: float, success: bool):
+        """! Updates the load statistics used by the pool's picker.
+        Connection errors do not count towards the latency, they put the
+        node in backoff instead.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if not success:
+                return
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += LATENCY_EWMA_ALPHA * (elapsed - self.latency)
 
     def _request(self, **kwargs) -> HttpResponse:
         response = self.session.request(**kwargs)
@@ -148,3 +226,164 @@ class Connection:
             raise exc_cls(response.status_code, text, json, kwargs["url"])
         data = json if json is not None else text
         return HttpResponse(response.status_code, response.headers, data)
+
+
+class AsyncConnection(Connection):
+    """! An asynchronous Connection object to make HTTP requests to a
+    particular node. Shares the backoff bookkeeping of
+    :class:`~resdb_driver.connection.Connection`.
+    """
+
+    def __init__(
+        self,
+        *,
+        node_url: str,
+        headers: dict = None,
+        pool_maxsize: int = None,
+        pool_block: bool = False,
+        max_retries: int = 0,
+        idle_timeout: float = None,
+    ):
+        """! Initializes a :class:`~resdb_driver.connection.AsyncConnection`
+        instance.
+
+            @param node_url (str): Url of the node to connect to.
+            @param headers (dict): Optional headers to send with each request.
+            @param pool_maxsize (int): Maximal number of connections to the
+                node. Defaults to the httpx default of 100.
+            @param pool_block (bool): Ignored, httpx always queues requests
+                until a connection is free.
+            @param max_retries (int): Number of times a failed connection
+                attempt is retried on the same node.
+            @param idle_timeout (float): Optional number of seconds after
+                which an idle connection is closed. Defaults to the httpx
+                default of 5 seconds.
+
+            @return An instance of the AsyncConnection class
+        """
+        super().__init__(
+            node_url=node_url,
+            headers=headers,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+            idle_timeout=idle_timeout,
+        )
+
+    def _open_session(
+        self, *, headers, pool_maxsize, pool_block, max_retries, idle_timeout
+    ):
+        default_limits = httpx.Limits()
+        limits = httpx.Limits(
+            max_connections=pool_maxsize or default_limits.max_connections,
+            max_keepalive_connections=pool_maxsize
+            or default_limits.max_keepalive_connections,
+            keepalive_expiry=idle_timeout
+            if idle_timeout is not None
+            else default_limits.keepalive_expiry,
+        )
+        self.session = httpx.AsyncClient(
+            headers=headers,
+            transport=httpx.AsyncHTTPTransport(limits=limits, retries=max_retries),
+        )
+        self.stats = PoolStats()
+
+    async def request(
+        self,
+        method: str,
+        *,
+        path: str = None,
+        json: dict = None,
+        params: dict = None,
+        headers: dict = None,
+        timeout: int = None,
+        backoff_cap: int = None,
+        **kwargs
+    ) -> HttpResponse:
+        """! Performs an HTTP request with the given parameters without
+        blocking the event loop. Backoff is handled exactly like in
+        :meth:`Connection.request`. A request cancelled by the caller, e.g.
+        the losing half of a hedged request, affects neither the backoff nor
+        the latency.
+
+        @param method (str): HTTP method (e.g.: ``'GET'``).
+        @param path (str): API endpoint path (e.g.: ``'/transactions'``).
+        @param json (dict): JSON data to send along with the request.
+        @param params (dict): Dictionary of URL (query) parameters.
+        @param headers (dict): Optional headers to pass to the request.
+        @param timeout (int): Optional timeout in seconds.
+        @param backoff_cap (int): The maximal allowed backoff delay in seconds to be assigned to a node.
+        @param kwargs: Optional keyword arguments.
+
+        @return Response of the HTTP request.
+        """
+        connExc = None
+        cancelled = False
+        self._request_started()
+        start = time.monotonic()
+        try:
+            response = await self._request(
+                method=method,
+                timeout=timeout,
+                url=self.node_url + path if path else self.node_url,
+                json=json,
+                params=params,
+                headers=headers,
+                **kwargs,
+            )
+        except ASYNC_CONNECTION_ERRORS as err:
+            connExc = err
+            raise err
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # A cancelled request, e.g. the losing half of a hedged one, says
+            # nothing about the latency of the node
+            self._request_finished(
+                time.monotonic() - start, success=connExc is None and not cancelled
+            )
+            if not cancelled:
+                self.update_backoff_time(
+                    success=connExc is None, backoff_cap=backoff_cap
+                )
+        return response
+
+    async def _request(self, **kwargs) -> HttpResponse:
+        # NOTE: requests silently drops ``None`` query parameters, httpx
+        #       would send them as empty strings.
+        if kwargs.get("params"):
+            kwargs["params"] = {
+                key: value for key, value in kwargs["params"].items() if value is not None
+            }
+        connected = False
+
+        async def trace(event_name, info):
+            nonlocal connected
+            if event_name == "connection.connect_tcp.complete":
+                connected = True
+
+        response = await self.session.request(**kwargs, extensions={"trace": trace})
+        self.stats.count("requests")
+        self.stats.count("new_connections" if connected else "reused")
+        text = response.text
+        try:
+            json = response.json()
+        except ValueError:
+            json = None
+        if not (200 <= response.status_code < 300):
+            exc_cls = HTTP_EXCEPTIONS.get(response.status_code, TransportError)
+            raise exc_cls(response.status_code, text, json, kwargs["url"])
+        data = json if json is not None else text
+        return HttpResponse(response.status_code, response.headers, data)
+
+    def pool_stats(self) -> dict:
+        """! Statistics of the HTTP connections to the node, see
+        :class:`~resdb_driver.adapters.PoolStats`. ``waits`` and
+        ``recycled`` are not tracked, httpx handles both internally.
+        """
+        return self.stats.as_dict()
+
+    async def close(self):
+        """! Closes the underlying HTTP client."""
+        await self.session.aclose()
@@ -16,21 +16,35 @@
 # under the License.
 
 
+import asyncio
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
 from crypt import methods
 from curses import meta
-from .transport import Transport
+from .cache import TransactionCache
+from .feed import BlockFeed
+from .transport import AsyncTransport, Transport
 from .offchain import prepare_transaction, fulfill_transaction
+from .tracker import CommitTracker, wait_committed
 from .utils import normalize_nodes
-from typing import Any, Union
+from typing import Any, Iterable, Union
 
 
+# Matches the default size of the connection pool of a requests session, so
+# that every worker of a bulk commit keeps reusing a keep-alive connection
+DEFAULT_COMMIT_CONCURRENCY = 10
+
+# Blocks fetched per request when iterating over a range, as many as the
+# node returns for a plain GET /v1/blocks
+DEFAULT_BLOCK_PAGE_SIZE = 100
+
 class Resdb:
     """! A :class:`~resdb_driver.Resdb` driver is able to create, sign,
     and submit transactions to one or more nodes in a Federation.
 
     If initialized with ``>1`` nodes, the driver will send successive
-    requests to different nodes in a round-robin fashion (this will be
-    customizable in the future).
+    requests to different nodes in a round-robin fashion. Pass another
+    ``picker_class`` from :mod:`resdb_driver.pool` to change that.
 
     """
 
@@ -39,7 +53,9 @@ class Resdb:
         *nodes: list[Union[str, dict]],
         transport_class: Transport = Transport,
         headers=None,
-        timeout=20
+        timeout=20,
+        tx_cache: TransactionCache = None,
+        **transport_options
     ):
         """! Initialize a :class:`~resdb_driver.Resdb` driver instance.
 
@@ -57,18 +73,37 @@ class Resdb:
                 <.TransactionsEndpoint.send_commit>`).
         @param timeout (int): Optional timeout in seconds that will be passed
                 to each request.
+        @param tx_cache (:class:`~resdb_driver.cache.TransactionCache`):
+                Optional cache of committed transactions. When given,
+                :meth:`TransactionsEndpoint.retrieve` is served from it
+                whenever possible and successful commits are added to it.
+        @param **transport_options: Optional keyword arguments passed on to
+                ``transport_class``, e.g. ``picker_class`` to choose how
+                requests are spread over the nodes.
 
         @return An instance of the Resdb class
         """
         self._nodes = normalize_nodes(*nodes, headers=headers)
-        self._transport = transport_class(*self._nodes, timeout=timeout)
+        self._tx_cache = tx_cache
+        self._transport = transport_class(
+            *self._nodes, timeout=timeout, **transport_options
+        )
         self._transactions = TransactionsEndpoint(self)
+        # The cache already holds every transaction sent, only the ledger
+        # can confirm that it was committed
+        self._tracker = CommitTracker(
+            partial(self._transactions.retrieve, use_cache=False)
+        )
         self._outputs = OutputsEndpoint(self)
         self._blocks = BlocksEndpoint(self)
         self._assets = AssetsEndpoint(self)
         self._metadata = MetadataEndpoint(self)
         self.api_prefix = "/v1"
 
+    def close(self):
+        """! Closes the connections to all nodes."""
+        self.transport.close()
+
     @property
     def nodes(self):
         """! :obj:`tuple` of :obj:`str`: URLs of connected nodes."""
@@ -82,6 +117,21 @@ class Resdb:
         """
         return self._transport
 
+    @property
+    def tx_cache(self):
+        """! :class:`~resdb_driver.cache.TransactionCache`: Cache of
+        committed transactions, or ``None`` if caching is disabled.
+        """
+        return self._tx_cache
+
+    @property
+    def tracker(self):
+        """! :class:`~resdb_driver.tracker.CommitTracker`: Confirms
+        transactions submitted with :meth:`TransactionsEndpoint.send_async`
+        and :meth:`TransactionsEndpoint.send_sync`.
+        """
+        return self._tracker
+
     @property
     def transactions(self):
         """! :class:`~resdb_driver.driver.TransactionsEndpoint`:
@@ -154,11 +204,49 @@ class Resdb:
             headers=headers,
         )
 
-    def get_transaction(self, txid):
-        # TODO
-        # use transactions.retieve() instead
-        # return self._transactions.retrieve(txid=txid)
-        raise NotImplementedError
+    def get_transaction(self, txid: str) -> dict:
+        """! Shortcut for :meth:`TransactionsEndpoint.retrieve`."""
+        return self._transactions.retrieve(txid=txid)
+
+    def get_transactions(self, txids: Iterable[str]) -> list:
+        """! Shortcut for :meth:`TransactionsEndpoint.retrieve_many`."""
+        return self._transactions.retrieve_many(txids)
+
+    def subscribe_blocks(
+        self,
+        from_height: int = 1,
+        page_size: int = DEFAULT_BLOCK_PAGE_SIZE,
+        **feed_options
+    ) -> BlockFeed:
+        """! Subscribes to the blocks committed to the ledger.
+
+        Returns an async iterator that yields every block from
+        ``from_height`` on, then waits for the nodes to announce new ones
+        on their ``/blockupdatelistener`` websocket instead of polling. It
+        reconnects (to the next node) on failure and resumes where it
+        stopped. Committed transactions are added to :attr:`tx_cache`, if
+        any. Needs the ``websockets`` package.
+
+            >>> async for block in resdb.subscribe_blocks(from_height=42):
+            ...     print(block["id"], len(block["transactions"]))
+
+        @param from_height (int): Sequence number of the first block.
+        @param page_size (int): Number of blocks fetched per request.
+        @param **feed_options: Optional keyword arguments passed on to
+                :class:`~resdb_driver.feed.BlockFeed`, e.g.
+                ``reconnect_delay``.
+
+        @return A :class:`~resdb_driver.feed.BlockFeed`, use it with
+            ``async for``.
+        """
+        return BlockFeed(
+            self.blocks.get_range,
+            [node["endpoint"] for node in self.nodes],
+            from_height=from_height,
+            page_size=page_size,
+            tx_cache=self.tx_cache,
+            **feed_options,
+        )
 
 
 class NamespacedDriver:
@@ -191,6 +279,10 @@ class NamespacedDriver:
     def path(self) -> str:
         return self.api_prefix + self.PATH
 
+    @property
+    def tx_cache(self) -> TransactionCache:
+        return self.driver.tx_cache
+
 
 class TransactionsEndpoint(NamespacedDriver):
     """! Exposes functionality of the ``'/transactions/'`` endpoint.
@@ -335,48 +427,45 @@ class TransactionsEndpoint(NamespacedDriver):
             headers=headers,
         )
 
-    def send_async(self, transaction, headers=None):
-        """!
-        Note:
-            Not used in resdb
-        Submit a transaction to the Federation with the mode `async`.
+    def send_async(self, transaction: dict, headers: dict = None, callback=None) -> Future:
+        """! Submit a transaction to the Federation without waiting for it.
 
-            @param transaction (dict): The transaction to be sent
-                to the Federation node(s).
-            @param headers (dict): Optional headers to pass to the request.
+        The transaction is sent from a background thread and the returned
+        future resolves once the transaction can be retrieved from the
+        ledger (see :class:`~resdb_driver.tracker.CommitTracker`).
 
-            @return The transaction sent to the Federation node(s).
+        @param transaction (dict): The transaction to be sent
+            to the Federation node(s).
+        @param headers (dict): Optional headers to pass to the request.
+        @param callback (callable): Optional function called with the
+            future once it is resolved.
 
+        @return A :class:`concurrent.futures.Future` resolved with the
+            committed transaction, or failed with the submission error or
+            :class:`~.exceptions.CommitTimeoutError`.
         """
-        # return self.transport.forward_request(
-        #     method="POST",
-        #     path=self.path,
-        #     json=transaction,
-        #     params={"mode": "async"},
-        #     headers=headers,
-        # )
-        raise NotImplementedError
+        return self.driver.tracker.submit(
+            lambda tx: self.send_commit(tx, headers=headers), transaction, callback
+        )
 
-    def send_sync(self, transaction, headers=None):
-        """! Note:
-        Not used in resdb
-        Submit a transaction to the Federation with the mode `sync`.
+    def send_sync(self, transaction: dict, headers: dict = None, callback=None) -> Future:
+        """! Submit a transaction to the Federation and wait until a node
+        accepted it, but not for the commit confirmation.
 
         @param transaction (dict): The transaction to be sent
             to the Federation node(s).
         @param headers (dict): Optional headers to pass to the request.
+        @param callback (callable): Optional function called with the
+            future once it is resolved.
 
-        @return The transaction sent to the Federation node(s).
+        @return A :class:`concurrent.futures.Future` resolved with the
+            committed transaction once it can be retrieved from the ledger.
 
+        @exception :class:`~.exceptions.TransportError`: If the node
+            rejects the transaction.
         """
-        # return self.transport.forward_request(
-        #     method="POST",
-        #     path=self.path,
-        #     json=transaction,
-        #     params={"mode": "sync"},
-        #     headers=headers,
-        # )
-        raise NotImplementedError
+        self.send_commit(transaction, headers=headers)
+        return self.driver.tracker.track(transaction["id"], callback)
 
     def send_commit(self, transaction: dict, headers: dict = None) -> dict:
         """! Submit a transaction to the Federation with the mode `commit`.
@@ -395,20 +484,135 @@ class TransactionsEndpoint(NamespacedDriver):
         #     headers=headers)
         function = "commit"
         path = self.path + function
-        return self.transport.forward_request(
+        response = self.transport.forward_request(
             method="POST", path=path, json=transaction, headers=headers
         )
+        if self.tx_cache is not None:
+            self.tx_cache.put(transaction)
+        return response
+
+    def send_commit_many(
+        self,
+        transactions: Iterable[dict],
+        concurrency: int = DEFAULT_COMMIT_CONCURRENCY,
+        headers: dict = None,
+    ) -> list:
+        """! Submits many transactions with the mode `commit`, keeping up to
+        ``concurrency`` of them in flight at once.
+
+        A failing transaction does not abort the others: its slot in the
+        result holds the exception that was raised instead of the node's
+        response.
+
+        @param transactions (iterable of dict): The transactions to be sent
+            to the Federation node(s).
+        @param concurrency (int): Maximal number of commits in flight.
+        @param headers (dict): Optional headers to pass to the requests.
+
+        @return The responses (or exceptions), in the order of ``transactions``.
+        """
+        transactions = list(transactions)
+        if not transactions:
+            return []
+
+        def commit(transaction):
+            try:
+                return self.send_commit(transaction, headers=headers)
+            except Exception as err:
+                return err
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(transactions))) as executor:
+            return list(executor.map(commit, transactions))
 
-    def retrieve(self, txid: str, headers: dict = None) -> dict:
+    def retrieve(
+        self, txid: str, headers: dict = None, use_cache: bool = True
+    ) -> dict:
         """! Retrieves the transaction with the given id.
 
         @param txid (str): Id of the transaction to retrieve.
         @param headers (dict): Optional headers to pass to the request.
+        @param use_cache (bool): Whether the transaction may be served from
+                :attr:`tx_cache`. Pass ``False`` to ask the ledger, e.g.
+                to confirm that a transaction sent was committed.
 
         @return The transaction with the given id.
         """
+        if use_cache and self.tx_cache is not None:
+            transaction = self.tx_cache.get(txid)
+            if transaction is not None:
+                return transaction
         path = self.path + txid
-        return self.transport.forward_request(method="GET", path=path, headers=None)
+        transaction = self.transport.forward_request(
+            method="GET", path=path, headers=None
+        )
+        self._remember(txid, transaction)
+        return transaction
+
+    def retrieve_many(
+        self,
+        txids: Iterable[str],
+        concurrency: int = DEFAULT_COMMIT_CONCURRENCY,
+        headers: dict = None,
+    ) -> list:
+        """! Retrieves many transactions, keeping up to ``concurrency``
+        requests in flight at once. Transactions in the cache are not
+        requested again.
+
+        A transaction that cannot be retrieved does not abort the others:
+        its slot in the result holds the exception that was raised instead.
+
+        @param txids (iterable of str): Ids of the transactions to retrieve.
+        @param concurrency (int): Maximal number of requests in flight.
+        @param headers (dict): Optional headers to pass to the requests.
+
+        @return The transactions (or exceptions), in the order of ``txids``.
+        """
+        txids = list(txids)
+        if not txids:
+            return []
+
+        def fetch(txid):
+            try:
+                return self.retrieve(txid, headers=headers)
+            except Exception as err:
+                return err
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(txids))) as executor:
+            return list(executor.map(fetch, txids))
+
+    def retrieve_range(self, min_id: str, max_id: str, headers: dict = None) -> list:
+        """! Retrieves every transaction whose id lies between ``min_id``
+        and ``max_id`` (both included, compared as strings) with a single
+        request to ``'/transactions/<min_id>/<max_id>'``.
+
+        @param min_id (str): Lowest transaction id of the range.
+        @param max_id (str): Highest transaction id of the range.
+        @param headers (dict): Optional headers to pass to the request.
+
+        @return List of transactions
+        """
+        path = "{}{}/{}".format(self.path, min_id, max_id)
+        transactions = self.transport.forward_request(
+            method="GET", path=path, headers=headers
+        )
+        self._remember_all(transactions)
+        return transactions
+
+    def _remember_all(self, transactions):
+        for transaction in transactions or ():
+            if isinstance(transaction, dict):
+                self._remember(transaction.get("id"), transaction)
+
+    def _remember(self, txid: str, transaction):
+        """! Caches a transaction fetched from a node, as long as it really
+        is the transaction that was asked for.
+        """
+        if (
+            self.tx_cache is not None
+            and isinstance(transaction, dict)
+            and transaction.get("id") == txid
+        ):
+            self.tx_cache.put(transaction)
 
 
 class OutputsEndpoint(NamespacedDriver):
@@ -484,6 +688,60 @@ class BlocksEndpoint(NamespacedDriver):
         )
         return block_list[0] if len(block_list) else None
 
+    def get_range(self, min_seq: int, max_seq: int, headers=None) -> list[dict]:
+        """! Retrieves the blocks with sequence numbers from ``min_seq`` to
+        ``max_seq`` (both included) with a single request.
+
+        @param min_seq (int): Sequence number of the first block.
+        @param max_seq (int): Sequence number of the last block.
+        @param headers (dict): Optional headers to pass to the request.
+
+        @return List of blocks, each with its ``id``, ``transactions``,
+            ``size`` and ``createdAt``.
+        """
+        return self.transport.forward_request(
+            method="GET",
+            path="{}{}/{}".format(self.path, min_seq, max_seq),
+            headers=headers,
+        )
+
+    def iter_range(
+        self,
+        min_seq: int = 1,
+        max_seq: int = None,
+        page_size: int = DEFAULT_BLOCK_PAGE_SIZE,
+        headers=None,
+    ):
+        """! Iterates over the blocks from ``min_seq`` to ``max_seq``,
+        fetching ``page_size`` of them per request, so that a long range
+        never has to be held in memory at once.
+
+        @param min_seq (int): Sequence number of the first block.
+        @param max_seq (int): Sequence number of the last block. If
+            ``None``, iterates until a page comes back empty, i.e. up to
+            the end of the chain.
+        @param page_size (int): Number of blocks per request.
+        @param headers (dict): Optional headers to pass to the requests.
+
+        @return A generator of blocks.
+        """
+        for start, end in _block_pages(min_seq, max_seq, page_size):
+            blocks = self.get_range(start, end, headers=headers)
+            if not blocks and max_seq is None:
+                return
+            yield from blocks
+
+
+def _block_pages(min_seq: int, max_seq: int, page_size: int):
+    """! Yields the (first, last) sequence numbers of every page of a range."""
+    if page_size < 1:
+        raise ValueError("`page_size` must be at least 1")
+    start = min_seq
+    while max_seq is None or start <= max_seq:
+        end = start + page_size - 1
+        yield start, end if max_seq is None else min(end, max_seq)
+        start = end + 1
+
 
 class AssetsEndpoint(NamespacedDriver):
     """! Exposes functionality of the ``'/assets'`` endpoint.
@@ -540,3 +798,244 @@ class MetadataEndpoint(NamespacedDriver):
             params={"search": search, "limit": limit},
             headers=headers,
         )
+
+
+class AsyncResdb(Resdb):
+    """! An asynchronous :class:`~resdb_driver.Resdb` driver.
+
+    Exposes the same endpoint namespaces as :class:`~resdb_driver.Resdb`,
+    but every method that talks to a node is a coroutine and must be
+    awaited, so that commits do not block the event loop::
+
+        >>> resdb = AsyncResdb("http://127.0.0.1:18000")
+        >>> await resdb.transactions.send_commit(fulfilled_tx)
+
+    Preparing and fulfilling transactions does not involve the network and
+    stays synchronous.
+    """
+
+    def __init__(
+        self,
+        *nodes: list[Union[str, dict]],
+        transport_class: Transport = AsyncTransport,
+        headers=None,
+        timeout=20,
+        tx_cache: TransactionCache = None,
+        **transport_options
+    ):
+        """! Initialize a :class:`~resdb_driver.AsyncResdb` driver instance.
+
+        @param *nodes (list of (str or dict)): Resdb nodes to connect to.
+        @param transport_class Optional transport class to use.
+                Defaults to :class:`~resdb_driver.transport.AsyncTransport`.
+        @param headers (dict): Optional headers that will be passed with
+                each request.
+        @param timeout (int): Optional timeout in seconds that will be passed
+                to each request.
+        @param tx_cache (:class:`~resdb_driver.cache.TransactionCache`):
+                Optional cache of committed transactions.
+        @param **transport_options: Optional keyword arguments passed on to
+                ``transport_class``.
+
+        @return An instance of the AsyncResdb class
+        """
+        super().__init__(
+            *nodes,
+            transport_class=transport_class,
+            headers=headers,
+            timeout=timeout,
+            tx_cache=tx_cache,
+            **transport_options,
+        )
+        self._transactions = AsyncTransactionsEndpoint(self)
+        self._tracker = None  # commits are confirmed by asyncio tasks instead
+        self._blocks = AsyncBlocksEndpoint(self)
+
+    async def close(self):
+        """! Closes the connections to all nodes."""
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncTransactionsEndpoint(TransactionsEndpoint):
+    """! Asynchronous counterpart of
+    :class:`~resdb_driver.driver.TransactionsEndpoint`.
+    """
+
+    async def get(self, *, asset_id, operation=None, headers=None) -> list:
+        """! See :meth:`TransactionsEndpoint.get`."""
+        return await self.transport.forward_request(
+            method="GET",
+            path=self.path,
+            params={"asset_id": asset_id, "operation": operation},
+            headers=headers,
+        )
+
+    async def send_commit(self, transaction: dict, headers: dict = None) -> dict:
+        """! See :meth:`TransactionsEndpoint.send_commit`."""
+        path = self.path + "commit"
+        response = await self.transport.forward_request(
+            method="POST", path=path, json=transaction, headers=headers
+        )
+        if self.tx_cache is not None:
+            self.tx_cache.put(transaction)
+        return response
+
+    def send_async(
+        self, transaction: dict, headers: dict = None, callback=None
+    ) -> asyncio.Task:
+        """! Submit a transaction to the Federation without waiting for it.
+
+        @param transaction (dict): The transaction to be sent
+            to the Federation node(s).
+        @param headers (dict): Optional headers to pass to the request.
+        @param callback (callable): Optional function called with the
+            task once it is done.
+
+        @return An :class:`asyncio.Task` that sends the transaction and
+            resolves with it once it can be retrieved from the ledger. Keep
+            a reference to it until it is done.
+        """
+
+        async def send_and_confirm():
+            await self.send_commit(transaction, headers=headers)
+            return await wait_committed(self._retrieve_committed, transaction["id"])
+
+        return self._schedule(send_and_confirm(), callback)
+
+    async def send_sync(
+        self, transaction: dict, headers: dict = None, callback=None
+    ) -> asyncio.Task:
+        """! Submit a transaction to the Federation and wait until a node
+        accepted it, but not for the commit confirmation.
+
+        @param transaction (dict): The transaction to be sent
+            to the Federation node(s).
+        @param headers (dict): Optional headers to pass to the request.
+        @param callback (callable): Optional function called with the
+            task once it is done.
+
+        @return An :class:`asyncio.Task` resolving with the committed
+            transaction once it can be retrieved from the ledger.
+        """
+        await self.send_commit(transaction, headers=headers)
+        return self._schedule(wait_committed(self._retrieve_committed, transaction["id"]), callback)
+
+    async def _retrieve_committed(self, txid: str) -> dict:
+        """! Asks the ledger, never the cache, whether ``txid`` was committed."""
+        return await self.retrieve(txid, use_cache=False)
+
+    @staticmethod
+    def _schedule(coroutine, callback) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        if callback is not None:
+            task.add_done_callback(callback)
+        return task
+
+    async def send_commit_many(
+        self,
+        transactions: Iterable[dict],
+        concurrency: int = DEFAULT_COMMIT_CONCURRENCY,
+        headers: dict = None,
+    ) -> list:
+        """! See :meth:`TransactionsEndpoint.send_commit_many`."""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def commit(transaction):
+            async with slots:
+                return await self.send_commit(transaction, headers=headers)
+
+        return list(
+            await asyncio.gather(
+                *(commit(transaction) for transaction in transactions),
+                return_exceptions=True,
+            )
+        )
+
+    async def retrieve(
+        self, txid: str, headers: dict = None, use_cache: bool = True
+    ) -> dict:
+        """! See :meth:`TransactionsEndpoint.retrieve`."""
+        if use_cache and self.tx_cache is not None:
+            transaction = self.tx_cache.get(txid)
+            if transaction is not None:
+                return transaction
+        path = self.path + txid
+        transaction = await self.transport.forward_request(
+            method="GET", path=path, headers=None
+        )
+        self._remember(txid, transaction)
+        return transaction
+
+    async def retrieve_many(
+        self,
+        txids: Iterable[str],
+        concurrency: int = DEFAULT_COMMIT_CONCURRENCY,
+        headers: dict = None,
+    ) -> list:
+        """! See :meth:`TransactionsEndpoint.retrieve_many`."""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def fetch(txid):
+            async with slots:
+                return await self.retrieve(txid, headers=headers)
+
+        return list(
+            await asyncio.gather(
+                *(fetch(txid) for txid in txids),
+                return_exceptions=True,
+            )
+        )
+
+    async def retrieve_range(
+        self, min_id: str, max_id: str, headers: dict = None
+    ) -> list:
+        """! See :meth:`TransactionsEndpoint.retrieve_range`."""
+        path = "{}{}/{}".format(self.path, min_id, max_id)
+        transactions = await self.transport.forward_request(
+            method="GET", path=path, headers=headers
+        )
+        self._remember_all(transactions)
+        return transactions
+
+
+class AsyncBlocksEndpoint(BlocksEndpoint):
+    """! Asynchronous counterpart of :class:`~resdb_driver.driver.BlocksEndpoint`."""
+
+    async def get(self, *, txid, headers=None) -> list[dict]:
+        """! See :meth:`BlocksEndpoint.get`."""
+        block_list = await self.transport.forward_request(
+            method="GET",
+            path=self.path,
+            params={"transaction_id": txid},
+            headers=headers,
+        )
+        return block_list[0] if len(block_list) else None
+
+    async def get_range(self, min_seq: int, max_seq: int, headers=None) -> list[dict]:
+        """! See :meth:`BlocksEndpoint.get_range`."""
+        return await self.transport.forward_request(
+            method="GET",
+            path="{}{}/{}".format(self.path, min_seq, max_seq),
+            headers=headers,
+        )
+
+    async def iter_range(
+        self,
+        min_seq: int = 1,
+        max_seq: int = None,
+        page_size: int = DEFAULT_BLOCK_PAGE_SIZE,
+        headers=None,
+    ):
+        """! See :meth:`BlocksEndpoint.iter_range`. Use with ``async for``."""
+        for start, end in _block_pages(min_seq, max_seq, page_size):
+            blocks = await self.get_range(start, end, headers=headers)
+            if not blocks and max_seq is None:
+                return
+            for block in blocks:
+                yield block
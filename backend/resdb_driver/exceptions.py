@@ -78,6 +78,15 @@ class TimeoutError(ResdbException):
         return self.args[0]
 
 
+class CommitTimeoutError(ResdbException):
+    """Raised if a submitted transaction does not show up on the ledger
+    before the commit tracker gives up on it."""
+
+    @property
+    def txid(self):
+        return self.args[0]
+
+
 HTTP_EXCEPTIONS = {
     400: BadRequest,
     404: NotFoundError,
@@ -0,0 +1,251 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import asyncio
+import inspect
+import logging
+import sys
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import rapidjson
+
+from .cache import TransactionCache
+from .exceptions import TransportError
+
+
+logger = logging.getLogger(__name__)
+
+LISTENER_PATH = "/blockupdatelistener"
+DEFAULT_PAGE_SIZE = 100  # blocks per catch-up request
+DEFAULT_RECONNECT_DELAY = 0.5  # seconds, doubled after every failed attempt
+MAX_RECONNECT_DELAY = 30  # seconds
+
+# Errors after which the feed reconnects instead of giving up, on top of
+# those of the websockets package
+FEED_ERRORS = (OSError, EOFError, asyncio.TimeoutError, TransportError)
+
+
+def listener_url(node_url: str) -> str:
+    """! Turns the http(s) url of a node into the ws(s) url of its block
+    update listener.
+    """
+    parts = urlsplit(node_url)
+    scheme = {"http": "ws", "https": "wss"}.get(parts.scheme, parts.scheme)
+    return urlunsplit((scheme, parts.netloc, LISTENER_PATH, "", ""))
+
+
+def committed_transactions(block: dict) -> Iterator[dict]:
+    """! Yields the transactions a block committed, i.e. the JSON values of
+    its ``SET`` requests. Values that are not JSON objects are skipped.
+
+    @param block (dict): A block as returned by
+        :meth:`BlocksEndpoint.get_range`.
+    """
+    for request in block.get("transactions") or ():
+        if not isinstance(request, dict) or request.get("cmd") != "SET":
+            continue
+        try:
+            value = rapidjson.loads(request.get("value", ""))
+        except (TypeError, ValueError):
+            continue
+        if isinstance(value, dict):
+            yield value
+
+
+def _websocket_connect(url: str):
+    """! Opens a websocket with the optional ``websockets`` package."""
+    try:
+        import websockets
+    except ImportError:
+        raise ImportError(
+            "subscribing to blocks needs the `websockets` package, "
+            "install it with `pip install websockets`"
+        )
+    return websockets.connect(url)
+
+
+def _interrupted(err: Exception) -> bool:
+    """! Tells whether the feed should reconnect after ``err``."""
+    if isinstance(err, FEED_ERRORS):
+        return True
+    # Only imported once the first websocket is opened
+    websockets = sys.modules.get("websockets")
+    return websockets is not None and isinstance(
+        err, websockets.exceptions.WebSocketException
+    )
+
+
+class BlockFeed:
+    """! An async iterator over the blocks committed to the ledger, pushed
+    by the nodes instead of polled for.
+
+    Every node announces new blocks on its ``/blockupdatelistener``
+    websocket. The announcements carry no data, so each one (or burst of
+    them) makes the feed fetch the blocks it has not seen yet with
+    :meth:`BlocksEndpoint.get_range`, ``page_size`` at a time. The blocks
+    committed before the feed connected are fetched the same way, starting
+    at ``from_height``.
+
+    When the websocket or a node fails, the feed waits, moves on to the next
+    node and resumes after the last block it yielded, so no block is
+    skipped or repeated. :attr:`height` tells where to resume from after a
+    restart::
+
+        >>> async for block in resdb.subscribe_blocks(from_height=saved):
+        ...     index(block)
+        ...     saved = block["id"] + 1
+    """
+
+    def __init__(
+        self,
+        get_range: Callable[[int, int], list],
+        node_urls: list,
+        from_height: int = 1,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        tx_cache: TransactionCache = None,
+        reconnect_delay: float = DEFAULT_RECONNECT_DELAY,
+        max_reconnect_delay: float = MAX_RECONNECT_DELAY,
+        connect: Callable = None,
+    ):
+        """! Initializes a :class:`~resdb_driver.feed.BlockFeed`.
+
+        @param get_range (callable): Fetches the blocks between two sequence
+                numbers, usually :meth:`BlocksEndpoint.get_range`. May be a
+                coroutine function; otherwise it runs in a thread.
+        @param node_urls (list of str): Urls of the nodes to listen to, in
+                the order they are tried.
+        @param from_height (int): Sequence number of the first block to
+                yield.
+        @param page_size (int): Number of blocks fetched per request.
+        @param tx_cache (:class:`~resdb_driver.cache.TransactionCache`):
+                Optional cache that every committed transaction is added to.
+        @param reconnect_delay (float): Seconds to wait before the first
+                reconnection attempt.
+        @param max_reconnect_delay (float): Cap of the delay, which doubles
+                after every failed attempt.
+        @param connect (callable): Opens a websocket given its url, as an
+                async context manager iterating over the received messages.
+                Defaults to :func:`websockets.connect`.
+
+        @return An instance of the BlockFeed class
+        """
+        if not node_urls:
+            raise ValueError("`node_urls` cannot be empty")
+        if page_size < 1:
+            raise ValueError("`page_size` must be at least 1")
+        self._get_range = get_range
+        self.node_urls = list(node_urls)
+        self.height = from_height
+        self.page_size = page_size
+        self.tx_cache = tx_cache
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._connect = connect or _websocket_connect
+
+    def __aiter__(self):
+        return self._blocks()
+
+    async def _blocks(self):
+        delay = self.reconnect_delay
+        node = 0
+        while True:
+            url = listener_url(self.node_urls[node])
+            try:
+                async with self._connect(url) as websocket:
+                    announced = asyncio.Event()
+                    announced.set()  # catch up on what was missed first
+                    listener = asyncio.ensure_future(self._listen(websocket, announced))
+                    try:
+                        while True:
+                            await self._wait(announced, listener)
+                            announced.clear()
+                            async for block in self._catch_up():
+                                yield block
+                            delay = self.reconnect_delay
+                    finally:
+                        listener.cancel()
+                        if listener.done() and not listener.cancelled():
+                            listener.exception()  # already reported, if any
+            except Exception as err:
+                if not _interrupted(err):
+                    raise
+                logger.warning(
+                    "Block feed from %s interrupted (%r), resuming at block %d in %.1fs",
+                    url,
+                    err,
+                    self.height,
+                    delay,
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+            node = (node + 1) % len(self.node_urls)
+
+    @staticmethod
+    async def _listen(websocket, announced: asyncio.Event):
+        """! Flags every announcement of the node; bursts of them collapse
+        into a single catch-up.
+        """
+        async for _ in websocket:
+            announced.set()
+        raise EOFError("the node closed the websocket")
+
+    @staticmethod
+    async def _wait(announced: asyncio.Event, listener: asyncio.Future):
+        """! Waits for an announcement, or raises why the listener stopped."""
+        waiter = asyncio.ensure_future(announced.wait())
+        try:
+            await asyncio.wait(
+                (waiter, listener), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            waiter.cancel()
+        if not announced.is_set():
+            listener.result()
+
+    async def _catch_up(self):
+        """! Yields the blocks from :attr:`height` up to the end of the chain."""
+        while True:
+            blocks = await self._fetch(self.height, self.height + self.page_size - 1)
+            for block in blocks or ():
+                seq = block.get("id", self.height)
+                if seq < self.height:
+                    continue
+                await self._remember(block)
+                self.height = seq + 1
+                yield block
+            if not blocks or len(blocks) < self.page_size:
+                return
+
+    async def _fetch(self, min_seq: int, max_seq: int) -> Optional[list]:
+        if inspect.iscoroutinefunction(self._get_range):
+            return await self._get_range(min_seq, max_seq)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._get_range, min_seq, max_seq
+        )
+
+    async def _remember(self, block: dict):
+        """! Adds the transactions of a block to :attr:`tx_cache`, in one
+        write from a worker thread."""
+        if self.tx_cache is None:
+            return
+        transactions = list(committed_transactions(block))
+        if transactions:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.tx_cache.put_many, transactions
+            )
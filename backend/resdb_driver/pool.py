@@ -16,9 +16,10 @@
 # under the License.
 
 
+import random
+import threading
 from abc import ABCMeta, abstractmethod
 from .connection import Connection
-from datetime import datetime
 
 
 class AbstractPicker(metaclass=ABCMeta):
@@ -35,28 +36,109 @@ class AbstractPicker(metaclass=ABCMeta):
         pass
 
 
-class RoundRobinPicker(AbstractPicker):
+def available_connections(connections: list[Connection]) -> list[Connection]:
+    """! Filters out the connections whose node is backing off.
+
+    @param connections (:obj:list): List of :class:`~resdb_driver.connection.Connection` instances.
+
+    @return The connections that can be used right away or, if every node
+        is backing off, the one whose backoff expires first.
+    """
+    available = [conn for conn in connections if conn.get_backoff_timedelta() <= 0]
+    if available:
+        return available
+    return [min(connections, key=lambda conn: conn.get_backoff_timedelta())]
+
+
+class _RotatingPicker(AbstractPicker):
+    """! Base class for pickers that rotate through the connections. The
+    rotation counter may be advanced from several threads at once.
+    """
+
+    def __init__(self):
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _advance(self) -> int:
+        """! Returns the next value of the rotation counter."""
+        with self._lock:
+            current = self._next
+            self._next += 1
+            return current
+
+
+class RoundRobinPicker(_RotatingPicker):
     """! Picks a :class:`~resdb_driver.connection.Connection`
     instance from a list of connections.
     """
 
     def pick(self, connections: list[Connection]) -> Connection:
-        """! Picks a connection with the earliest backoff time.
-        As a result, the first connection is picked
-        for as long as it has no backoff time.
-        Otherwise, the connections are tried in a round robin fashion.
+        """! Picks the connections in a round robin fashion, skipping the
+        ones that are backing off. If all of them are, the connection with
+        the earliest backoff time is picked.
+
+        @param connections (:obj:list): List of :class:`~resdb_driver.connection.Connection` instances.
+        """
+        if len(connections) == 1:
+            return connections[0]
+
+        for _ in range(len(connections)):
+            conn = connections[self._advance() % len(connections)]
+            if conn.get_backoff_timedelta() <= 0:
+                return conn
+        return available_connections(connections)[0]
+
+
+class LeastOutstandingPicker(_RotatingPicker):
+    """! Picks the :class:`~resdb_driver.connection.Connection` with the
+    fewest requests in flight. Ties are broken in a round robin fashion so
+    that an idle federation still spreads its load.
+    """
+
+    def pick(self, connections: list[Connection]) -> Connection:
+        """! Picks the available connection with the fewest requests in flight.
+
+        @param connections (:obj:list): List of :class:`~resdb_driver.connection.Connection` instances.
+        """
+        if len(connections) == 1:
+            return connections[0]
+
+        candidates = available_connections(connections)
+        offset = self._advance() % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        return min(rotated, key=lambda conn: conn.in_flight)
+
+
+class EWMALatencyPicker(AbstractPicker):
+    """! Picks a :class:`~resdb_driver.connection.Connection` based on the
+    moving average of its response times, using the power of two choices:
+    two available connections are drawn at random and the one with the
+    lower expected latency, weighted by its requests in flight, wins.
+    Nodes that were never measured are preferred so that they get probed.
+    """
+
+    def __init__(self):
+        self._random = random.Random()
+
+    @staticmethod
+    def _cost(conn: Connection) -> float:
+        if conn.latency is None:
+            return 0
+        return conn.latency * (conn.in_flight + 1)
+
+    def pick(self, connections: list[Connection]) -> Connection:
+        """! Picks the cheaper of two random available connections.
 
         @param connections (:obj:list): List of :class:`~resdb_driver.connection.Connection` instances.
         """
         if len(connections) == 1:
             return connections[0]
 
-        return min(
-            *connections,
-            key=lambda conn: datetime.min
-            if conn.backoff_time is None
-            else conn.backoff_time
-        )
+        candidates = available_connections(connections)
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = self._random.sample(candidates, 2)
+        return first if self._cost(first) <= self._cost(second) else second
 
 
 class Pool:
@@ -65,6 +147,9 @@ class Pool:
     def __init__(self, connections: list[Connection], picker_class=RoundRobinPicker):
         """! Initializes a :class:`~resdb_driver.pool.Pool` instance.
         @param connections (list): List of :class:`~resdb_driver.connection.Connection` instances.
+        @param picker_class: The :class:`AbstractPicker` used to choose the
+                connection of each request. Defaults to
+                :class:`RoundRobinPicker`.
         """
         self.connections = connections
         self.picker = picker_class()
@@ -0,0 +1,319 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import asyncio
+import sqlite3
+import threading
+from typing import Optional
+
+import rapidjson
+
+from .feed import committed_transactions
+
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS transactions ("
+    " id TEXT PRIMARY KEY,"
+    " operation TEXT,"
+    " asset_id TEXT,"
+    " cid TEXT,"
+    " file_name TEXT,"
+    " block INTEGER,"
+    " position INTEGER,"
+    " body TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS transactions_asset_id ON transactions (asset_id)",
+    "CREATE INDEX IF NOT EXISTS transactions_cid ON transactions (cid)",
+    "CREATE INDEX IF NOT EXISTS transactions_file_name ON transactions (file_name)",
+    "CREATE TABLE IF NOT EXISTS outputs ("
+    " txid TEXT NOT NULL,"
+    " output_index INTEGER NOT NULL,"
+    " public_key TEXT NOT NULL,"
+    " spent_by TEXT,"
+    " PRIMARY KEY (txid, output_index, public_key))",
+    "CREATE INDEX IF NOT EXISTS outputs_public_key ON outputs (public_key)",
+    # Spends are kept on their own as well, a TRANSFER may be ingested
+    # before the transaction whose output it spends
+    "CREATE TABLE IF NOT EXISTS spends ("
+    " txid TEXT NOT NULL,"
+    " output_index INTEGER NOT NULL,"
+    " spent_by TEXT NOT NULL,"
+    " PRIMARY KEY (txid, output_index))",
+    "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)",
+)
+
+# Columns added since the first schema, with their type
+_ADDED_COLUMNS = {"transactions": (("position", "INTEGER"),)}
+
+# Ledger order: by block, then by position within it. Transactions that did
+# not come with their block (yet) follow, in the order they were ingested.
+_LEDGER_ORDER = "ORDER BY block IS NULL, block, position, rowid"
+
+
+def file_info(transaction: dict) -> Optional[dict]:
+    """! The ``file_info`` of a transaction of the file catalog.
+
+    A CREATE carries it in its asset, a TRANSFER made by
+    ``/transfer_ownership/`` carries the updated one in its metadata.
+
+    @return The ``file_info`` dict, or ``None`` if there is none.
+    """
+    for data in (
+        transaction.get("metadata"),
+        (transaction.get("asset") or {}).get("data"),
+    ):
+        if isinstance(data, dict) and isinstance(data.get("file_info"), dict):
+            return data["file_info"]
+    return None
+
+
+def asset_id(transaction: dict) -> Optional[str]:
+    """! The id of the asset a transaction creates or transfers."""
+    if transaction.get("operation") == "CREATE":
+        return transaction.get("id")
+    return (transaction.get("asset") or {}).get("id")
+
+
+class LocalReplica:
+    """! A local, indexed copy of the ledger, kept up to date by tailing the
+    blocks of a node with :meth:`Resdb.subscribe_blocks`.
+
+    Transactions are stored in a SQLite file and indexed by id, asset id,
+    CID and file name. Their outputs are indexed by owner public key and
+    marked as spent by the transfers consuming them, whichever of the two is
+    ingested first, so "list my files", "who owns this" and "history of
+    this asset" are answered without a request to the node. Every block is written in one SQLite transaction, together
+    with the height to resume from, so a restarted replica picks up where
+    it stopped.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """! Initializes a :class:`~resdb_driver.replica.LocalReplica`.
+
+        @param path (str): Path of the SQLite file. Defaults to an
+                in-memory database, which starts empty on every run.
+
+        @return An instance of the LocalReplica class
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {
+                row[1] for row in self._db.execute(f"PRAGMA table_info({table})")
+            }
+            for name, column_type in columns:
+                if name not in existing:
+                    self._db.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"
+                    )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def __contains__(self, txid: str) -> bool:
+        with self._lock:
+            return (
+                self._db.execute(
+                    "SELECT 1 FROM transactions WHERE id = ?", (txid,)
+                ).fetchone()
+                is not None
+            )
+
+    @property
+    def height(self) -> int:
+        """! Sequence number of the next block to ingest."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM state WHERE key = 'height'"
+            ).fetchone()
+        return row[0] if row else 1
+
+    def ingest_block(self, block: dict):
+        """! Adds the transactions committed by ``block``.
+
+        @param block (dict): A block as returned by
+                :meth:`BlocksEndpoint.get_range`.
+        """
+        with self._lock, self._db:
+            for position, transaction in enumerate(committed_transactions(block)):
+                self._insert(transaction, block.get("id"), position)
+            if isinstance(block.get("id"), int):
+                self._db.execute(
+                    "INSERT INTO state (key, value) VALUES ('height', ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (block["id"] + 1,),
+                )
+
+    def ingest_transaction(self, transaction: dict):
+        """! Adds a committed transaction that did not come with its block.
+
+        @param transaction (dict): The committed transaction.
+        """
+        with self._lock, self._db:
+            self._insert(transaction, None, None)
+
+    async def sync(self, resdb, **feed_options):
+        """! Keeps the replica up to date until cancelled.
+
+        Ingests the blocks from :attr:`height` on, then every new block
+        the nodes announce. Blocks are written from a worker thread, so the
+        event loop is not blocked while SQLite commits.
+
+        @param resdb (:class:`~resdb_driver.Resdb`): The driver to tail the
+                ledger with, sync or async.
+        @param **feed_options: Optional keyword arguments passed on to
+                :meth:`Resdb.subscribe_blocks`.
+        """
+        async for block in resdb.subscribe_blocks(
+            from_height=self.height, **feed_options
+        ):
+            await asyncio.to_thread(self.ingest_block, block)
+
+    def get(self, txid: str) -> Optional[dict]:
+        """! Looks up a transaction by id.
+
+        @return The transaction, or ``None`` if it was not ingested (yet).
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM transactions WHERE id = ?", (txid,)
+            ).fetchone()
+        return rapidjson.loads(row[0]) if row else None
+
+    def asset_history(self, asset_id: str) -> list:
+        """! The transactions of an asset, its CREATE first.
+
+        @return List of transactions, in ledger order.
+        """
+        return self._select(
+            f"SELECT body FROM transactions WHERE asset_id = ? {_LEDGER_ORDER}",
+            (asset_id,),
+        )
+
+    def owners(self, asset_id: str) -> list:
+        """! Public keys currently owning (part of) an asset."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT o.public_key FROM outputs o "
+                "JOIN transactions t ON t.id = o.txid "
+                "WHERE t.asset_id = ? AND o.spent_by IS NULL "
+                "ORDER BY o.public_key",
+                (asset_id,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def owned_by(self, public_key: str) -> list:
+        """! The transactions holding an unspent output of ``public_key``,
+        i.e. the latest transaction of every asset it owns.
+
+        @return List of transactions, in ledger order.
+        """
+        return self._select(
+            "SELECT body FROM transactions WHERE id IN ("
+            " SELECT txid FROM outputs WHERE public_key = ? AND spent_by IS NULL"
+            f") {_LEDGER_ORDER}",
+            (public_key,),
+        )
+
+    def find_by_cid(self, cid: str) -> list:
+        """! The transactions describing the file with the given CID."""
+        return self._select(
+            f"SELECT body FROM transactions WHERE cid = ? {_LEDGER_ORDER}", (cid,)
+        )
+
+    def find_by_file_name(self, file_name: str) -> list:
+        """! The transactions describing a file with the given name."""
+        return self._select(
+            f"SELECT body FROM transactions WHERE file_name = ? {_LEDGER_ORDER}",
+            (file_name,),
+        )
+
+    def close(self):
+        """! Closes the SQLite file."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _select(self, query: str, params: tuple) -> list:
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [rapidjson.loads(row[0]) for row in rows]
+
+    def _insert(
+        self, transaction: dict, block: Optional[int], position: Optional[int]
+    ):
+        """! Writes one transaction, committed at ``position`` of ``block``.
+        Must be called with the lock held."""
+        txid = transaction.get("id")
+        if not isinstance(txid, str):
+            return
+        info = file_info(transaction) or {}
+        inserted = self._db.execute(
+            "INSERT OR IGNORE INTO transactions "
+            "(id, operation, asset_id, cid, file_name, block, position, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                txid,
+                transaction.get("operation"),
+                asset_id(transaction),
+                info.get("cid"),
+                info.get("file_name"),
+                block,
+                position,
+                rapidjson.dumps(transaction),
+            ),
+        ).rowcount
+        if not inserted:
+            if block is not None:
+                # Ingested on its own first, it now gets its place in the ledger
+                self._db.execute(
+                    "UPDATE transactions SET block = ?, position = ? "
+                    "WHERE id = ? AND block IS NULL",
+                    (block, position, txid),
+                )
+            return
+        for index, output in enumerate(transaction.get("outputs") or ()):
+            self._db.executemany(
+                "INSERT OR IGNORE INTO outputs (txid, output_index, public_key, spent_by) "
+                "VALUES (?, ?, ?, (SELECT spent_by FROM spends "
+                "WHERE txid = ? AND output_index = ?))",
+                [
+                    (txid, index, key, txid, index)
+                    for key in output.get("public_keys") or ()
+                ],
+            )
+        for input_ in transaction.get("inputs") or ():
+            fulfills = input_.get("fulfills")
+            if fulfills:
+                spent = (fulfills.get("transaction_id"), fulfills.get("output_index"))
+                self._db.execute(
+                    "INSERT OR IGNORE INTO spends (txid, output_index, spent_by) "
+                    "VALUES (?, ?, ?)",
+                    spent + (txid,),
+                )
+                self._db.execute(
+                    "UPDATE outputs SET spent_by = ? "
+                    "WHERE txid = ? AND output_index = ?",
+                    (txid,) + spent,
+                )
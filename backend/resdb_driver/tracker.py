@@ -0,0 +1,229 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .exceptions import CommitTimeoutError
+
+
+DEFAULT_POLL_INTERVAL = 0.5  # seconds
+DEFAULT_COMMIT_TIMEOUT = 60  # seconds
+DEFAULT_TRACKER_WORKERS = 10
+
+
+def _committed(transaction, txid: str) -> bool:
+    """! Tells whether a ``retrieve`` response is the committed transaction."""
+    return isinstance(transaction, dict) and transaction.get("id") == txid
+
+
+def _resolve(future: Future, result=None, error: Exception = None):
+    """! Completes ``future`` unless it was cancelled in the meantime."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class CommitTracker:
+    """! Confirms that submitted transactions made it onto the ledger.
+
+    Transactions are tracked by id. A background thread polls
+    ``retrieve`` for every pending id and resolves the matching
+    :class:`concurrent.futures.Future` with the committed transaction as
+    soon as a node returns it, or with
+    :class:`~.exceptions.CommitTimeoutError` once ``timeout`` expires.
+    The thread only runs while something is being tracked.
+    """
+
+    def __init__(
+        self,
+        retrieve: Callable[[str], dict],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: float = DEFAULT_COMMIT_TIMEOUT,
+        workers: int = DEFAULT_TRACKER_WORKERS,
+    ):
+        """! Initializes a :class:`~resdb_driver.tracker.CommitTracker`.
+
+        @param retrieve (callable): Fetches a transaction by id from the
+                ledger, usually :meth:`TransactionsEndpoint.retrieve` with
+                ``use_cache=False``. It must not answer from a cache that
+                sent transactions are added to, or unconfirmed commits would
+                pass for committed ones.
+        @param poll_interval (float): Seconds between two polling rounds.
+        @param timeout (float): Seconds after which a transaction that was
+                not seen on the ledger is given up on. ``None`` waits forever.
+        @param workers (int): Number of threads used to submit transactions
+                and to poll for them.
+
+        @return An instance of the CommitTracker class
+        """
+        self._retrieve = retrieve
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="resdb-tracker"
+        )
+        self._pending = {}  # txid -> list of (future, deadline)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        """! Number of transactions waiting for confirmation."""
+        with self._lock:
+            return len(self._pending)
+
+    def submit(
+        self, send: Callable[[dict], object], transaction: dict, callback=None
+    ) -> Future:
+        """! Sends ``transaction`` in the background and tracks it.
+
+        @param send (callable): Submits a transaction to a node, usually
+                :meth:`TransactionsEndpoint.send_commit`.
+        @param transaction (dict): The fulfilled transaction.
+        @param callback (callable): Optional function called with the
+                future once it is resolved.
+
+        @return A future resolved with the committed transaction. It fails
+                with the submission error if the node rejects it.
+        """
+        future = self._new_future(callback)
+
+        def run():
+            try:
+                send(transaction)
+            except Exception as err:
+                _resolve(future, error=err)
+            else:
+                self._watch(transaction["id"], future)
+
+        self._executor.submit(run)
+        return future
+
+    def track(self, txid: str, callback=None) -> Future:
+        """! Tracks a transaction that was already submitted.
+
+        @param txid (str): Id of the transaction.
+        @param callback (callable): Optional function called with the
+                future once it is resolved.
+
+        @return A future resolved with the committed transaction.
+        """
+        future = self._new_future(callback)
+        self._watch(txid, future)
+        return future
+
+    @staticmethod
+    def _new_future(callback) -> Future:
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def _watch(self, txid: str, future: Future):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._lock:
+            self._pending.setdefault(txid, []).append((future, deadline))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="resdb-commit-tracker", daemon=True
+                )
+                self._thread.start()
+
+    def _poll(self, txid: str) -> Optional[dict]:
+        try:
+            transaction = self._retrieve(txid)
+        except Exception:
+            # Not there yet, or the node is unreachable: try again next round
+            return None
+        return transaction if _committed(transaction, txid) else None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                txids = list(self._pending)
+
+            found = dict(zip(txids, self._executor.map(self._poll, txids)))
+            now = time.monotonic()
+            resolved = []
+            with self._lock:
+                for txid in txids:
+                    waiters = self._pending.pop(txid, [])
+                    if found[txid] is not None:
+                        resolved.extend((future, found[txid], None) for future, _ in waiters)
+                        continue
+                    still_waiting = []
+                    for future, deadline in waiters:
+                        if future.cancelled():
+                            continue
+                        if deadline is not None and now >= deadline:
+                            resolved.append((future, None, CommitTimeoutError(txid)))
+                        else:
+                            still_waiting.append((future, deadline))
+                    if still_waiting:
+                        self._pending[txid] = still_waiting
+
+            # Callbacks run outside of the lock so they may track more ids
+            for future, transaction, error in resolved:
+                _resolve(future, transaction, error)
+
+            time.sleep(self.poll_interval)
+
+
+async def wait_committed(
+    retrieve,
+    txid: str,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    timeout: float = DEFAULT_COMMIT_TIMEOUT,
+) -> dict:
+    """! Polls ``retrieve`` until the transaction shows up on the ledger.
+    Asynchronous counterpart of :class:`CommitTracker`.
+
+    @param retrieve (coroutine function): Fetches a transaction by id from
+            the ledger, bypassing any cache, like
+            :meth:`AsyncTransactionsEndpoint.retrieve` with ``use_cache=False``.
+    @param txid (str): Id of the transaction.
+    @param poll_interval (float): Seconds between two polls.
+    @param timeout (float): Seconds after which to give up. ``None`` waits
+            forever.
+
+    @return The committed transaction.
+
+    @exception :class:`~.exceptions.CommitTimeoutError`: If the transaction
+            did not show up in time.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            transaction = await retrieve(txid)
+        except Exception:
+            transaction = None
+        if _committed(transaction, txid):
+            return transaction
+        if deadline is not None and time.monotonic() >= deadline:
+            raise CommitTimeoutError(txid)
+        await asyncio.sleep(poll_interval)
@@ -15,14 +15,18 @@
 # specific language governing permissions and limitations
 # under the License.
 
-from time import time
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import sleep, time
 from requests import request, Response
+from requests.adapters import DEFAULT_POOLSIZE
 
 from requests.exceptions import ConnectionError
 
-from .connection import Connection
+from .connection import ASYNC_CONNECTION_ERRORS, AsyncConnection, Connection
 from .exceptions import TimeoutError
-from .pool import Pool
+from .pool import Pool, RoundRobinPicker, available_connections
 
 
 NO_TIMEOUT_BACKOFF_CAP = 10  # seconds
@@ -31,22 +35,138 @@ NO_TIMEOUT_BACKOFF_CAP = 10  # seconds
 class Transport:
     """! Transport class."""
 
-    def __init__(self, *nodes: list, timeout: int = None):
+    connection_class = Connection
+
+    def __init__(
+        self,
+        *nodes: list,
+        timeout: int = None,
+        picker_class=RoundRobinPicker,
+        hedge_delay: float = None,
+        pool_maxsize: int = None,
+        pool_block: bool = False,
+        max_retries: int = 0,
+        idle_timeout: float = None,
+    ):
         """! Initializes an instance of
             :class:`~resdb_driver.transport.Transport`.
         @param nodes Each node is a dictionary with the keys `endpoint` and
                 `headers`
         @param timeout (int): Optional timeout in seconds.
+        @param picker_class: The :class:`~resdb_driver.pool.AbstractPicker`
+                deciding which node serves each request. Defaults to
+                :class:`~resdb_driver.pool.RoundRobinPicker`.
+        @param hedge_delay (float): Optional delay in seconds after which a
+                ``GET`` that has not been answered yet is sent to a second
+                node as well; the first answer wins. Hedging is disabled if
+                ``None`` or if there is a single node.
+        @param pool_maxsize (int): Maximal number of keep-alive connections
+                per node, see :class:`~resdb_driver.connection.Connection`.
+        @param pool_block (bool): Whether requests wait for a pooled
+                connection when all of them are busy.
+        @param max_retries (int): Connection attempts retried on the same
+                node before moving on to the next one.
+        @param idle_timeout (float): Seconds after which idle connections
+                are closed instead of reused.
         """
         self.nodes = nodes
         self.timeout = timeout
+        self.hedge_delay = hedge_delay
         self.connection_pool = Pool(
             [
-                Connection(node_url=node["endpoint"], headers=node["headers"])
+                self.connection_class(
+                    node_url=node["endpoint"],
+                    headers=node["headers"],
+                    pool_maxsize=pool_maxsize,
+                    pool_block=pool_block,
+                    max_retries=max_retries,
+                    idle_timeout=idle_timeout,
+                )
                 for node in nodes
-            ]
+            ],
+            picker_class=picker_class,
+        )
+        # One thread per pooled connection, so requests wait for a
+        # connection rather than for a thread
+        self._hedge_workers = (pool_maxsize or DEFAULT_POOLSIZE) * len(nodes)
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+
+    def pool_stats(self) -> dict:
+        """! Statistics of the HTTP connection pools, per node.
+
+        @return A dict mapping each node url to its
+            :class:`~resdb_driver.adapters.PoolStats` counters, e.g.
+            ``{'requests': 120, 'reused': 118, 'new_connections': 2,
+            'waits': 0, 'recycled': 0, 'reuse_rate': 0.98}``.
+        """
+        return {
+            connection.node_url: connection.pool_stats()
+            for connection in self.connection_pool.connections
+        }
+
+    def _should_hedge(self, method: str) -> bool:
+        # Only reads are idempotent enough to be sent twice
+        return (
+            method == "GET"
+            and self.hedge_delay is not None
+            and len(self.connection_pool.connections) > 1
         )
 
+    def _pick_backup(self, first: Connection):
+        """! Picks the node a hedged request is sent to, if any is available."""
+        candidates = [
+            conn
+            for conn in available_connections(self.connection_pool.connections)
+            if conn is not first and conn.get_backoff_timedelta() <= 0
+        ]
+        if not candidates:
+            return None
+        return self.connection_pool.picker.pick(candidates)
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """! The executor hedged requests run in, created by the first one."""
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self._hedge_workers,
+                    thread_name_prefix="resdb-hedge",
+                )
+            return self._hedge_executor
+
+    def _hedged_request(self, connection: Connection, **kwargs):
+        """! Sends a request to ``connection`` and, if it has not answered
+        within ``hedge_delay``, to a second node too.
+
+        @return The first successful response. If both requests fail, the
+            error of the first one is raised.
+        """
+        started = threading.Event()
+
+        def primary_request():
+            started.set()
+            return connection.request(**kwargs)
+
+        executor = self._get_hedge_executor()
+        primary = executor.submit(primary_request)
+        # The delay runs from when the request is sent, not from when it was
+        # queued, or a busy executor would hedge every request
+        started.wait()
+        done, _ = wait([primary], timeout=self.hedge_delay)
+        backup_connection = None if done else self._pick_backup(connection)
+        if backup_connection is None:
+            return primary.result()
+
+        backup = executor.submit(backup_connection.request, **kwargs)
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower request runs to completion in the background
+                    return future.result()
+        return primary.result()
+
     def forward_request(
         self,
         method: str,
@@ -62,8 +182,10 @@ class Transport:
            by catching the corresponding
            exceptions and retrying `forward_request`.
            Exponential backoff is implemented individually for each node.
-           Backoff delays are expressed as timestamps stored on the object and
+           Backoff delays are expressed as deadlines stored on the object and
            they are not reset in between multiple function calls.
+           Nodes that are backing off are skipped; the call only waits if
+           all of them are.
            Times out when `self.timeout` is expired, if not `None`.
 
         @param method (str): HTTP method name (e.g.: ``'GET'``).
@@ -82,17 +204,30 @@ class Transport:
         while timeout is None or timeout > 0:
             connection: Connection = self.connection_pool.get_connection()
 
+            # Only the case when every node is backing off
+            backoff = connection.get_backoff_timedelta()
+            if backoff > 0:
+                if timeout is not None and timeout <= backoff:
+                    break
+                sleep(backoff)
+                if timeout is not None:
+                    timeout -= backoff
+
+            request_kwargs = dict(
+                method=method,
+                path=path,
+                params=params,
+                json=json,
+                headers=headers,
+                timeout=timeout,
+                backoff_cap=backoff_cap,
+            )
             start = time()
             try:
-                response = connection.request(
-                    method=method,
-                    path=path,
-                    params=params,
-                    json=json,
-                    headers=headers,
-                    timeout=timeout,
-                    backoff_cap=backoff_cap,
-                )
+                if self._should_hedge(method):
+                    response = self._hedged_request(connection, **request_kwargs)
+                else:
+                    response = connection.request(**request_kwargs)
             except ConnectionError as err:
                 error_trace.append(err)
                 continue
@@ -104,3 +239,111 @@ class Transport:
                     timeout -= elapsed
 
         raise TimeoutError(error_trace)
+
+    def close(self):
+        """! Stops the hedging threads and closes the HTTP sessions of all
+        connections. Requests still running are not waited for."""
+        with self._hedge_lock:
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for connection in self.connection_pool.connections:
+            connection.close()
+
+
+class AsyncTransport(Transport):
+    """! Transport class that forwards requests without blocking the event loop."""
+
+    connection_class = AsyncConnection
+
+    async def _hedged_request(self, connection: AsyncConnection, **kwargs):
+        """! See :meth:`Transport._hedged_request`. The slower request is
+        cancelled once the other one succeeded.
+        """
+        primary = asyncio.ensure_future(connection.request(**kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        backup_connection = None if done else self._pick_backup(connection)
+        if backup_connection is None:
+            return await primary
+
+        backup = asyncio.ensure_future(backup_connection.request(**kwargs))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def forward_request(
+        self,
+        method: str,
+        path: str = None,
+        json: dict = None,
+        params: dict = None,
+        headers: dict = None,
+    ):
+        """! Makes HTTP requests to the configured nodes. Behaves like
+        :meth:`Transport.forward_request`, but must be awaited.
+
+        @param method (str): HTTP method name (e.g.: ``'GET'``).
+        @param path (str): Path to be appended to the base url of a node. E.g.:
+            ``'/transactions'``).
+        @param json (dict): Payload to be sent with the HTTP request.
+        @param params (dict): Dictionary of URL (query) parameters.
+        @param headers (dict): Optional headers to pass to the request.
+
+        @return The decoded response body
+        """
+        error_trace = []
+        timeout = self.timeout
+        backoff_cap = NO_TIMEOUT_BACKOFF_CAP if timeout is None else timeout / 2
+        while timeout is None or timeout > 0:
+            connection: AsyncConnection = self.connection_pool.get_connection()
+
+            # Only the case when every node is backing off
+            backoff = connection.get_backoff_timedelta()
+            if backoff > 0:
+                if timeout is not None and timeout <= backoff:
+                    break
+                await asyncio.sleep(backoff)
+                if timeout is not None:
+                    timeout -= backoff
+
+            request_kwargs = dict(
+                method=method,
+                path=path,
+                params=params,
+                json=json,
+                headers=headers,
+                timeout=timeout,
+                backoff_cap=backoff_cap,
+            )
+            start = time()
+            try:
+                if self._should_hedge(method):
+                    response = await self._hedged_request(connection, **request_kwargs)
+                else:
+                    response = await connection.request(**request_kwargs)
+            except ASYNC_CONNECTION_ERRORS as err:
+                error_trace.append(err)
+                continue
+            else:
+                return response.data
+            finally:
+                elapsed = time() - start
+                if timeout is not None:
+                    timeout -= elapsed
+
+        raise TimeoutError(error_trace)
+
+    async def close(self):
+        """! Closes the HTTP clients of all connections."""
+        for connection in self.connection_pool.connections:
+            await connection.close()
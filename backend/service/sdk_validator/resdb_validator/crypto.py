@@ -24,6 +24,8 @@ except ImportError:
     from sha3 import sha3_256
 
 from cryptoconditions import crypto
+from nacl.bindings import crypto_sign_open
+from nacl.exceptions import CryptoError
 
 
 CryptoKeypair = namedtuple("CryptoKeypair", ("private_key", "public_key"))
@@ -70,3 +72,28 @@ def public_key_from_ed25519_key(hex_public_key):
         bytes.fromhex(hex_public_key), encoding="bytes"
     )
     return public_key.encode(encoding="base58").decode("utf-8")
+
+
+def verify_batch(signatures):
+    """Verifies a batch of Ed25519 signatures.
+
+    libsodium has no Ed25519 batch verification, and building one from its
+    point operations would take a full scalar multiplication per term, more
+    than verifying each signature. So the signatures are checked one after
+    the other, straight through its bindings instead of building key and
+    fulfillment objects for each of them. Checking stops at the first
+    invalid signature.
+
+    Args:
+        signatures (iterable): ``(message, public_key, signature)``
+            triples, all of them bytes.
+
+    Returns:
+        bool: If every signature is valid.
+    """
+    try:
+        for message, public_key, signature in signatures:
+            crypto_sign_open(signature + message, public_key)
+    except (CryptoError, TypeError, ValueError):
+        return False
+    return True
@@ -8,20 +8,16 @@ MongoDB.
 
 """
 import logging
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from itertools import islice
 from uuid import uuid4
 
 import rapidjson
-
-try:
-    from hashlib import sha3_256
-except ImportError:
-    # NOTE: needed for Python < 3.6
-    from sha3 import sha3_256
-
 import requests
 
+from resdb_validator.merkle import UTXOMerkleTree, utxo_hash
 from resdb_validator.models import Transaction
+from resdb_validator.utxo import BlockIndex, UTXOStore
 from resdb_validator.exceptions import (
     SchemaValidationError,
     ValidationError,
@@ -40,12 +36,21 @@ class ResDB(object):
 
     backend = None
 
-    def __init__(self, connection=None):
+    def __init__(self, connection=None, utxo_store=None):
         """Initialize the ResDB instance
 
         Database connections and other configuration settings can be defined here.
         As of now the validator does not directly interact with any database.
+
+        Args:
+            utxo_store (:class:`~resdb_validator.utxo.UTXOStore`): Optional
+                in-memory UTXO set. When given, the utxoset is kept and
+                queried there instead of in the database. Spent outputs
+                are still looked up in the database.
         """
+        self._utxo_merkle_tree = None
+        self.utxo_store = utxo_store
+        self._block_index = BlockIndex()
 
     def post_transaction(self, transaction, mode):
         """Submit a valid transaction to the mempool."""
@@ -104,10 +109,9 @@ class ResDB(object):
         assets = []
         txn_metadatas = []
         for t in transactions:
-            transaction = (
-                t.tx_dict
-                if t.tx_dict
-                else rapidjson.loads(rapidjson.dumps(t.to_dict()))
+            # The tx_dict of a Transaction is frozen, store a copy
+            transaction = rapidjson.loads(
+                rapidjson.dumps(t.tx_dict if t.tx_dict else t.to_dict())
             )
             if transaction["operation"] == t.CREATE:
                 asset = transaction.pop("asset")
@@ -139,9 +143,12 @@ class ResDB(object):
         spent_outputs = [spent_output for spent_output in transaction.spent_outputs]
         if spent_outputs:
             self.delete_unspent_outputs(*spent_outputs)
-        self.store_unspent_outputs(
-            *[utxo._asdict() for utxo in transaction.unspent_outputs]
-        )
+        unspent_outputs = [utxo._asdict() for utxo in transaction.unspent_outputs]
+        if self.utxo_store is not None:
+            # The store indexes the utxos by owner
+            for utxo, output in zip(unspent_outputs, transaction.outputs):
+                utxo["public_keys"] = output.public_keys
+        self.store_unspent_outputs(*unspent_outputs)
 
     def store_unspent_outputs(self, *unspent_outputs):
         """Store the given ``unspent_outputs`` (utxos).
@@ -151,44 +158,48 @@ class ResDB(object):
                 length tuple or list of unspent outputs.
         """
         if unspent_outputs:
-            return backend.query.store_unspent_outputs(
-                self.connection, *unspent_outputs
+            if self.utxo_store is not None:
+                result = self.utxo_store.store(*unspent_outputs)
+            else:
+                result = backend.query.store_unspent_outputs(
+                    self.connection, *unspent_outputs
+                )
+            if self._utxo_merkle_tree is not None:
+                self._utxo_merkle_tree.update(
+                    added=[
+                        utxo_hash(utxo["transaction_id"], utxo["output_index"])
+                        for utxo in unspent_outputs
+                    ]
+                )
+            return result
+
+    @property
+    def utxo_merkle_tree(self):
+        """:class:`~resdb_validator.merkle.UTXOMerkleTree`: The utxoset as
+        a merkle tree. It is built from the stored utxoset on first use and
+        kept up to date by :meth:`store_unspent_outputs` and
+        :meth:`delete_unspent_outputs` from then on.
+        """
+        if self._utxo_merkle_tree is None:
+            self._utxo_merkle_tree = UTXOMerkleTree.from_utxos(
+                self.get_unspent_outputs()
             )
+        return self._utxo_merkle_tree
 
     def get_utxoset_merkle_root(self):
-        """Returns the merkle root of the utxoset. This implies that
-        the utxoset is first put into a merkle tree.
-
-        For now, the merkle tree and its root will be computed each
-        time. This obviously is not efficient and a better approach
-        that limits the repetition of the same computation when
-        unnecesary should be sought. For instance, future optimizations
-        could simply re-compute the branches of the tree that were
-        affected by a change.
+        """Returns the merkle root of the utxoset.
 
-        The transaction hash (id) and output index should be sufficient
-        to uniquely identify a utxo, and consequently only that
-        information from a utxo record is needed to compute the merkle
-        root. Hence, each node of the merkle tree should contain the
-        tuple (txid, output_index).
-
-        .. important:: The leaves of the tree will need to be sorted in
-            some kind of lexicographical order.
+        The transaction hash (id) and output index are sufficient to
+        uniquely identify a utxo, so the leaves of the tree are the hashes
+        of the (txid, output_index) tuples, in lexicographical order. The
+        tree is updated incrementally as outputs are stored and deleted,
+        see :class:`~resdb_validator.merkle.UTXOMerkleTree`, so reading
+        the root does not touch the utxoset.
 
         Returns:
             str: Merkle root in hexadecimal form.
         """
-        utxoset = backend.query.get_unspent_outputs(self.connection)
-        # TODO Once ready, use the already pre-computed utxo_hash field.
-        # See common/transactions.py for details.
-        hashes = [
-            sha3_256(
-                "{}{}".format(utxo["transaction_id"], utxo["output_index"]).encode()
-            ).digest()
-            for utxo in utxoset
-        ]
-        # TODO Notice the sorted call!
-        return merkleroot(sorted(hashes))
+        return self.utxo_merkle_tree.root
 
     def get_unspent_outputs(self):
         """Get the utxoset.
@@ -196,6 +207,8 @@ class ResDB(object):
         Returns:
             generator of unspent_outputs.
         """
+        if self.utxo_store is not None:
+            return self.utxo_store.get_unspent_outputs()
         cursor = backend.query.get_unspent_outputs(self.connection)
         return (record for record in cursor)
 
@@ -207,9 +220,20 @@ class ResDB(object):
                 length tuple or list of unspent outputs.
         """
         if unspent_outputs:
-            return backend.query.delete_unspent_outputs(
-                self.connection, *unspent_outputs
-            )
+            if self.utxo_store is not None:
+                result = self.utxo_store.delete(*unspent_outputs)
+            else:
+                result = backend.query.delete_unspent_outputs(
+                    self.connection, *unspent_outputs
+                )
+            if self._utxo_merkle_tree is not None:
+                self._utxo_merkle_tree.update(
+                    removed=[
+                        utxo_hash(utxo["transaction_id"], utxo["output_index"])
+                        for utxo in unspent_outputs
+                    ]
+                )
+            return result
 
     def is_committed(self, transaction_id):
         transaction = backend.query.get_transaction(self.connection, transaction_id)
@@ -238,13 +262,35 @@ class ResDB(object):
     def get_transactions(self, txn_ids):
         return backend.query.get_transactions(self.connection, txn_ids)
 
-    def get_transactions_filtered(self, asset_id, operation=None, last_tx=None):
-        """Get a list of transactions filtered on some criteria"""
-        txids = backend.query.get_txids_filtered(
-            self.connection, asset_id, operation, last_tx
+    def get_transactions_filtered(
+        self, asset_id, operation=None, last_tx=None, batch_size=1000
+    ):
+        """Get a list of transactions filtered on some criteria
+
+        The transactions are loaded ``batch_size`` at a time, with one query
+        each for the transactions, their assets and their metadata, and
+        yielded in the order of their ids.
+        """
+        txids = iter(
+            backend.query.get_txids_filtered(
+                self.connection, asset_id, operation, last_tx
+            )
         )
-        for txid in txids:
-            yield self.get_transaction(txid)
+        while True:
+            batch = list(islice(txids, batch_size))
+            if not batch:
+                return
+            transactions = backend.query.get_transactions(self.connection, batch)
+            transactions = list(transactions) if transactions else []
+            if transactions:
+                transactions = {
+                    transaction.id: transaction
+                    for transaction in Transaction.from_db(self, transactions)
+                }
+            else:
+                transactions = {}
+            for txid in batch:
+                yield transactions.get(txid)
 
     def get_outputs_filtered(self, owner, spent=None):
         """Get a list of output links filtered on some criteria
@@ -259,6 +305,10 @@ class ResDB(object):
             :obj:`list` of TransactionLink: list of ``txid`` s and ``output`` s
             pointing to another transaction's condition
         """
+        if spent is False and self.utxo_store is not None:
+            # The store only knows unspent outputs, spent ones are looked
+            # up in the database
+            return self.utxo_store.get_outputs_by_public_key(owner)
         outputs = self.fastquery.get_outputs_by_public_key(owner)
         if spent is None:
             return outputs
@@ -267,6 +317,23 @@ class ResDB(object):
         elif spent is False:
             return self.fastquery.filter_spent_outputs(outputs)
 
+    def index_current_transactions(self, current_transactions):
+        """Index the transactions of the block being validated.
+
+        See :class:`~resdb_validator.utxo.BlockIndex`: only the transactions
+        appended to ``current_transactions`` since the previous call are
+        indexed. Call :meth:`begin_block` before validating another block.
+
+        Returns:
+            :class:`~resdb_validator.utxo.BlockIndex`
+        """
+        return self._block_index.sync(current_transactions)
+
+    def begin_block(self):
+        """Starts the validation of a new block, forgetting the
+        transactions indexed for the previous one."""
+        self._block_index.reset()
+
     def get_spent(self, txid, output, current_transactions=[]):
         transactions = backend.query.get_spent(self.connection, txid, output)
         transactions = list(transactions) if transactions else []
@@ -276,15 +343,9 @@ class ResDB(object):
                 " with the chain".format(txid)
             )
 
-        current_spent_transactions = []
-        for ctxn in current_transactions:
-            for ctxn_input in ctxn.inputs:
-                if (
-                    ctxn_input.fulfills
-                    and ctxn_input.fulfills.txid == txid
-                    and ctxn_input.fulfills.output == output
-                ):
-                    current_spent_transactions.append(ctxn)
+        current_spent_transactions = self.index_current_transactions(
+            current_transactions
+        ).get_spenders(txid, output)
 
         transaction = None
         if len(transactions) + len(current_spent_transactions) > 1:
@@ -296,6 +357,57 @@ class ResDB(object):
 
         return transaction
 
+    def get_spending_transactions(self, links, current_transactions=[]):
+        """Look up the spending transactions of several outputs at once.
+
+        Does what :meth:`get_spent` does for every output in ``links``, with
+        one database query for all of them.
+
+        Args:
+            links (iterable): ``(txid, output_index)`` pairs.
+            current_transactions (list): The transactions of the block being
+                validated.
+
+        Returns:
+            dict: The spent outputs of ``links``, mapped to the transaction
+            spending them.
+
+        Raises:
+            DoubleSpend: If one of the outputs is spent more than once.
+        """
+        links = set(links)
+        if not links:
+            return {}
+
+        spenders = defaultdict(list)
+        transactions = backend.query.get_spending_transactions(
+            self.connection,
+            [
+                {"transaction_id": txid, "output_index": output}
+                for txid, output in links
+            ],
+        )
+        transactions = list(transactions) if transactions else []
+        if transactions:
+            for transaction in Transaction.from_db(self, transactions):
+                for input_ in transaction.inputs:
+                    link = input_.fulfills and (
+                        input_.fulfills.txid,
+                        input_.fulfills.output,
+                    )
+                    if link in links:
+                        spenders[link].append(transaction)
+
+        block_index = self.index_current_transactions(current_transactions)
+        spent = {}
+        for link in links:
+            transactions = spenders[link] + block_index.get_spenders(*link)
+            if len(transactions) > 1:
+                raise DoubleSpend('tx "{}" spends inputs twice'.format(link[0]))
+            elif transactions:
+                spent[link] = transactions[0]
+        return spent
+
     def store_block(self, block):
         """Create a new block."""
 
@@ -0,0 +1,234 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+import os
+import struct
+from bisect import bisect_left
+
+try:
+    from hashlib import sha3_256
+except ImportError:
+    from sha3 import sha3_256
+
+
+HASH_SIZE = 32
+DEFAULT_DEPTH = 16
+MAX_DEPTH = 24
+
+_FILE_MAGIC = b"UTXOMRK1"
+_FILE_HEADER = struct.Struct(">8sBQ")  # magic, depth, number of utxos
+_BUCKET_HEADER = struct.Struct(">I")  # number of utxos in the bucket
+
+
+def utxo_hash(transaction_id, output_index):
+    """Hashes the (txid, output_index) pair identifying an unspent output.
+
+    Returns:
+        bytes: The SHA3-256 digest used as the leaf of the Merkle tree.
+    """
+    return sha3_256("{}{}".format(transaction_id, output_index).encode()).digest()
+
+
+class UTXOMerkleTree:
+    """An incrementally updated Merkle tree over the UTXO set.
+
+    The leaves are the :func:`utxo_hash` of every unspent output. They are
+    spread over ``2 ** depth`` buckets by their leading bits and kept sorted
+    inside a bucket, so walking the buckets in order visits the leaves in
+    lexicographical order. The hash of a bucket is the SHA3-256 of its
+    sorted leaves (of the empty string for an empty bucket), and the buckets
+    are the bottom level of a complete binary tree whose inner nodes hash
+    the concatenation of their two children.
+
+    Adding or removing an output rehashes one bucket and the ``depth`` nodes
+    above it, and the root is always up to date. Pick ``depth`` so that a
+    bucket holds a few hundred outputs at most: 16 suits sets of up to
+    about 10 million outputs.
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH):
+        """Creates an empty tree.
+
+        Args:
+            depth (int): The tree has ``2 ** depth`` buckets.
+        """
+        if not 0 <= depth <= MAX_DEPTH:
+            raise ValueError("`depth` must be between 0 and {}".format(MAX_DEPTH))
+        self.depth = depth
+        self._size = 0
+        self._buckets = [bytearray() for _ in range(1 << depth)]
+        empty = sha3_256(b"").digest()
+        self._nodes = [empty] * (2 << depth)
+        self._rehash_all()
+
+    @classmethod
+    def from_utxos(cls, utxos, depth=DEFAULT_DEPTH):
+        """Builds a tree from existing unspent outputs.
+
+        Args:
+            utxos (iterable): Unspent outputs as dicts with a
+                ``transaction_id`` and an ``output_index``, as returned by
+                :meth:`ResDB.get_unspent_outputs`.
+            depth (int): The tree has ``2 ** depth`` buckets.
+        """
+        return cls.from_hashes(
+            (utxo_hash(utxo["transaction_id"], utxo["output_index"]) for utxo in utxos),
+            depth,
+        )
+
+    @classmethod
+    def from_hashes(cls, hashes, depth=DEFAULT_DEPTH):
+        """Builds a tree from the :func:`utxo_hash` of unspent outputs."""
+        tree = cls(depth)
+        hashes = sorted(set(hashes))
+        # Sorted leaves of a bucket are contiguous, find where each one starts
+        last = (1 << depth) - 1
+        start = 0
+        for index in range(last + 1):
+            if index < last:
+                next_prefix = ((index + 1) << (32 - depth)).to_bytes(4, "big")
+                end = bisect_left(hashes, next_prefix, start)
+            else:
+                end = len(hashes)
+            tree._buckets[index] = bytearray(b"".join(hashes[start:end]))
+            start = end
+        tree._size = len(hashes)
+        tree._rehash_all()
+        return tree
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, leaf):
+        bucket = self._buckets[self._bucket_index(leaf)]
+        position = self._find(bucket, leaf)
+        return bucket[position : position + HASH_SIZE] == leaf
+
+    @property
+    def root(self):
+        """str: The Merkle root in hexadecimal form."""
+        return self._nodes[1].hex()
+
+    def add(self, transaction_id, output_index):
+        """Adds an unspent output. Adding it twice has no effect."""
+        self.update(added=[utxo_hash(transaction_id, output_index)])
+
+    def remove(self, transaction_id, output_index):
+        """Removes a spent output. Unknown outputs are ignored."""
+        self.update(removed=[utxo_hash(transaction_id, output_index)])
+
+    def update(self, added=(), removed=()):
+        """Applies a batch of changes, rehashing every affected node once.
+
+        Args:
+            added (iterable): :func:`utxo_hash` of the outputs to add.
+            removed (iterable): :func:`utxo_hash` of the outputs to remove.
+        """
+        dirty = set()
+        for leaf in removed:
+            index = self._bucket_index(leaf)
+            bucket = self._buckets[index]
+            position = self._find(bucket, leaf)
+            if bucket[position : position + HASH_SIZE] == leaf:
+                del bucket[position : position + HASH_SIZE]
+                self._size -= 1
+                dirty.add(index)
+        for leaf in added:
+            if len(leaf) != HASH_SIZE:
+                raise ValueError("leaves must be {} byte hashes".format(HASH_SIZE))
+            index = self._bucket_index(leaf)
+            bucket = self._buckets[index]
+            position = self._find(bucket, leaf)
+            if bucket[position : position + HASH_SIZE] != leaf:
+                bucket[position:position] = leaf
+                self._size += 1
+                dirty.add(index)
+        self._rehash(dirty)
+
+    def save(self, path):
+        """Writes the tree to ``path``.
+
+        The file holds a header (magic ``UTXOMRK1``, the depth as one byte
+        and the number of outputs as a big-endian uint64), followed by every
+        bucket in order: its number of leaves as a big-endian uint32 and the
+        sorted leaves. Inner nodes are not stored, :meth:`load` recomputes
+        them. The file is replaced atomically.
+        """
+        tmp_path = "{}.tmp".format(path)
+        with open(tmp_path, "wb") as f:
+            f.write(_FILE_HEADER.pack(_FILE_MAGIC, self.depth, self._size))
+            for bucket in self._buckets:
+                f.write(_BUCKET_HEADER.pack(len(bucket) // HASH_SIZE))
+                f.write(bucket)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a tree written by :meth:`save`."""
+        with open(path, "rb") as f:
+            try:
+                magic, depth, size = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+                if magic != _FILE_MAGIC:
+                    raise ValueError("{} is not a UTXO Merkle tree file".format(path))
+                tree = cls(depth)
+                for index in range(1 << depth):
+                    (count,) = _BUCKET_HEADER.unpack(f.read(_BUCKET_HEADER.size))
+                    tree._buckets[index] = bytearray(f.read(count * HASH_SIZE))
+            except struct.error:
+                raise ValueError("{} is truncated".format(path))
+        if sum(len(bucket) for bucket in tree._buckets) != size * HASH_SIZE:
+            raise ValueError("{} is truncated".format(path))
+        tree._size = size
+        tree._rehash_all()
+        return tree
+
+    def _bucket_index(self, leaf):
+        return int.from_bytes(leaf[:4], "big") >> (32 - self.depth)
+
+    @staticmethod
+    def _find(bucket, leaf):
+        """Offset of ``leaf`` in the sorted ``bucket``, or of where it goes."""
+        low, high = 0, len(bucket) // HASH_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * HASH_SIZE
+            if bucket[offset : offset + HASH_SIZE] < leaf:
+                low = middle + 1
+            else:
+                high = middle
+        return low * HASH_SIZE
+
+    def _rehash(self, buckets):
+        nodes = self._nodes
+        first_leaf = 1 << self.depth
+        level = set()
+        for index in buckets:
+            nodes[first_leaf + index] = sha3_256(self._buckets[index]).digest()
+            level.add((first_leaf + index) // 2)
+        while level and 0 not in level:
+            for node in level:
+                nodes[node] = sha3_256(nodes[2 * node] + nodes[2 * node + 1]).digest()
+            level = {node // 2 for node in level if node > 1}
+
+    def _rehash_all(self):
+        nodes = self._nodes
+        first_leaf = 1 << self.depth
+        for index, bucket in enumerate(self._buckets):
+            nodes[first_leaf + index] = sha3_256(bucket).digest()
+        for node in range(first_leaf - 1, 0, -1):
+            nodes[node] = sha3_256(nodes[2 * node] + nodes[2 * node + 1]).digest()
@@ -43,7 +43,13 @@ class Transaction(Transaction):
         input_conditions = []
 
         if self.operation == Transaction.CREATE:
-            duplicates = any(txn for txn in current_transactions if txn.id == self.id)
+            if resdb is not None:
+                block_index = resdb.index_current_transactions(current_transactions)
+                duplicates = self.id in block_index.transactions
+            else:
+                duplicates = any(
+                    txn for txn in current_transactions if txn.id == self.id
+                )
             if resdb and resdb.is_committed(self.id) or duplicates:
                 raise DuplicateTransaction(
                     "transaction `{}` already exists".format(self.id)
@@ -27,7 +27,6 @@ Attributes:
 from collections import namedtuple
 from copy import deepcopy
 from functools import reduce, lru_cache
-import rapidjson
 
 import base58
 from cryptoconditions import Fulfillment, ThresholdSha256, Ed25519Sha256
@@ -43,7 +42,11 @@ try:
 except ImportError:
     from sha3 import sha3_256
 
-from service.sdk_validator.resdb_validator.crypto import PrivateKey, hash_data
+from service.sdk_validator.resdb_validator.crypto import (
+    PrivateKey,
+    hash_data,
+    verify_batch,
+)
 from service.sdk_validator.resdb_validator.exceptions import (
     KeypairMismatchException,
     InputDoesNotExist,
@@ -107,6 +110,9 @@ class Input(object):
         self.fulfillment = fulfillment
         self.fulfills = fulfills
         self.owners_before = owners_before
+        # (fulfillment, uri, state) if the fulfillment was parsed from a URI,
+        # see `_fulfillment_state`
+        self._parsed_from = None
 
     def __eq__(self, other):
         # TODO: If `other !== Fulfillment` return `False`
@@ -127,24 +133,53 @@ class Input(object):
         Returns:
             dict: The Input as an alternative serialization format.
         """
-        try:
-            fulfillment = self.fulfillment.serialize_uri()
-        except (TypeError, AttributeError, ASN1EncodeError, ASN1DecodeError):
-            fulfillment = _fulfillment_to_details(self.fulfillment)
-
-        try:
-            # NOTE: `self.fulfills` can be `None` and that's fine
-            fulfills = self.fulfills.to_dict()
-        except AttributeError:
-            fulfills = None
+        fulfillment = self._fulfillment_uri()
+        if fulfillment is None:
+            try:
+                fulfillment = self.fulfillment.serialize_uri()
+            except (TypeError, AttributeError, ASN1EncodeError, ASN1DecodeError):
+                fulfillment = _fulfillment_to_details(self.fulfillment)
 
         input_ = {
             "owners_before": self.owners_before,
-            "fulfills": fulfills,
+            "fulfills": self._fulfills_dict(),
             "fulfillment": fulfillment,
         }
         return input_
 
+    def _unsigned_dict(self):
+        """Like :meth:`to_dict`, but with the fulfillment set to `None`, the
+        way the Input appears in the message that gets signed.
+
+        Returns:
+            dict: The Input without its fulfillment.
+        """
+        return {
+            "owners_before": self.owners_before,
+            "fulfills": self._fulfills_dict(),
+            "fulfillment": None,
+        }
+
+    def _fulfillment_uri(self):
+        """The URI the fulfillment was parsed from, or `None` if it was not
+        parsed from one or was replaced or changed since.
+        """
+        if self._parsed_from is None:
+            return None
+        fulfillment, uri, state = self._parsed_from
+        if fulfillment is not self.fulfillment:
+            return None
+        if _fulfillment_state(fulfillment) != state:
+            return None
+        return uri
+
+    def _fulfills_dict(self):
+        try:
+            # NOTE: `self.fulfills` can be `None` and that's fine
+            return self.fulfills.to_dict()
+        except AttributeError:
+            return None
+
     @classmethod
     def generate(cls, public_keys):
         # TODO: write docstring
@@ -171,9 +206,13 @@ class Input(object):
             InvalidSignature: If an Input's URI couldn't be parsed.
         """
         fulfillment = data["fulfillment"]
+        parsed_from = None
         if not isinstance(fulfillment, (Fulfillment, type(None))):
             try:
-                fulfillment = Fulfillment.from_uri(data["fulfillment"])
+                fulfillment = _fulfillment_from_uri(data["fulfillment"])
+                state = _fulfillment_state(fulfillment)
+                if state is not None:
+                    parsed_from = (fulfillment, data["fulfillment"], state)
             except ASN1DecodeError:
                 # TODO Remove as it is legacy code, and simply fall back on
                 # ASN1DecodeError
@@ -183,7 +222,35 @@ class Input(object):
                 #       `Input.to_dict`
                 fulfillment = _fulfillment_from_details(data["fulfillment"])
         fulfills = TransactionLink.from_dict(data["fulfills"])
-        return cls(fulfillment, data["owners_before"], fulfills)
+        input_ = cls(fulfillment, data["owners_before"], fulfills)
+        input_._parsed_from = parsed_from
+        return input_
+
+
+def _fulfillment_state(fulfillment):
+    """What the URI of an Ed25519 fulfillment encodes.
+
+    Tells whether the fulfillment changed since it was parsed. `None` for
+    other fulfillments, whose URI is not remembered.
+    """
+    if isinstance(fulfillment, Ed25519Sha256):
+        return (fulfillment.public_key, fulfillment.signature)
+    return None
+
+
+def _fulfillment_from_uri(uri):
+    """Parses a fulfillment URI.
+
+    Decoding is cached by URI, but every call returns its own copy of the
+    fulfillment, which callers may sign or otherwise modify.
+    """
+    return deepcopy(_parse_fulfillment_uri(uri))
+
+
+@lru_cache(maxsize=16384)
+def _parse_fulfillment_uri(uri):
+    # Shared by every caller, must never be handed out
+    return Fulfillment.from_uri(uri)
 
 
 def _fulfillment_to_details(fulfillment):
@@ -500,6 +567,82 @@ class Output(object):
         return cls(fulfillment, data["public_keys"], amount)
 
 
+class _FrozenDict(dict):
+    """A dict that cannot be changed in place. Copies of it can."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(
+            "transaction parts cannot be changed in place, assign a new value"
+        )
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return _thaw(self)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class _FrozenList(list):
+    """A list that cannot be changed in place. Copies of it can."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _FrozenDict._immutable
+    append = extend = insert = pop = remove = clear = _FrozenDict._immutable
+    sort = reverse = _FrozenDict._immutable
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return _thaw(self)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _freeze(value):
+    """A copy of a JSON value that cannot be changed in place."""
+    if isinstance(value, dict):
+        return _FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return _FrozenList(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """A copy of a frozen JSON value that can be changed."""
+    if isinstance(value, dict):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class _SerializedPart(object):
+    """A Transaction attribute whose canonical serialization is cached.
+
+    The value is frozen when it is assigned, so the cache can only go
+    stale by assigning a new value, which drops it.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, tx, owner=None):
+        if tx is None:
+            return self
+        return tx.__dict__[self.name]
+
+    def __set__(self, tx, value):
+        tx.__dict__[self.name] = _freeze(value)
+        tx.__dict__.setdefault("_serialized_parts", {}).pop(self.name, None)
+
+
 class Transaction(object):
     """A Transaction is used to create and transfer assets.
 
@@ -528,6 +671,13 @@ class Transaction(object):
     ALLOWED_OPERATIONS = (CREATE, TRANSFER)
     VERSION = "2.0"
 
+    # NOTE: These are serialized once and the result is reused for signing,
+    #       validating and hashing. They are frozen, assign a new value to
+    #       change them. Inputs and outputs are small and serialized anew.
+    asset = _SerializedPart()
+    metadata = _SerializedPart()
+    tx_dict = _SerializedPart()
+
     def __init__(
         self,
         operation,
@@ -635,7 +785,8 @@ class Transaction(object):
 
     @property
     def serialized(self):
-        return Transaction._to_str(self.to_dict())
+        inputs = Transaction._to_str([input_.to_dict() for input_ in self.inputs])
+        return self._serialize_body(inputs, self._id)
 
     def _hash(self):
         self._id = hash_data(self.serialized)
@@ -888,9 +1039,7 @@ class Transaction(object):
             for private_key in private_keys
         }
 
-        tx_dict = self.to_dict()
-        tx_dict = Transaction._remove_signatures(tx_dict)
-        tx_serialized = Transaction._to_str(tx_dict)
+        tx_serialized = self._signing_message(self._id)
         for i, input_ in enumerate(self.inputs):
             self.inputs[i] = self._sign_input(input_, tx_serialized, key_pairs)
 
@@ -935,10 +1084,14 @@ class Transaction(object):
             key_pairs (dict): The keys to sign the Transaction with.
         """
         # NOTE: To eliminate the dangers of accidentally signing a condition by
-        #       reference, we remove the reference of input_ here
+        #       reference, we sign a fresh fulfillment in a new Input here
         #       intentionally. If the user of this class knows how to use it,
         #       this should never happen, but then again, never say never.
-        input_ = deepcopy(input_)
+        input_ = Input(
+            Ed25519Sha256(public_key=input_.fulfillment.public_key),
+            list(input_.owners_before),
+            fulfills=input_.fulfills,
+        )
         public_key = input_.owners_before[0]
         message = sha3_256(message.encode())
         if input_.fulfills:
@@ -969,7 +1122,11 @@ class Transaction(object):
             message (str): The message to be signed
             key_pairs (dict): The keys to sign the Transaction with.
         """
-        input_ = deepcopy(input_)
+        input_ = Input(
+            deepcopy(input_.fulfillment),
+            list(input_.owners_before),
+            fulfills=input_.fulfills,
+        )
         message = sha3_256(message.encode())
         if input_.fulfills:
             message.update(
@@ -1024,16 +1181,48 @@ class Transaction(object):
             Returns:
                 bool: If all Inputs are valid.
         """
+        return self._inputs_valid(self._output_condition_uris(outputs))
+
+    @classmethod
+    def batch_inputs_valid(cls, transactions, outputs=None):
+        """Validates the Inputs of several Transactions, collecting their
+        Ed25519 signatures first and verifying every one of them once.
+
+        The signatures of a Transaction are no longer checked after its
+        first invalid one.
+
+        Args:
+            transactions (:obj:`list` of :class:`~resdb_validator.
+                transaction.Transaction`): The Transactions to validate.
+            outputs (:obj:`list`, optional): For every Transaction, the
+                Outputs to check its Inputs against, as passed to
+                :meth:`inputs_valid`. Can be omitted if all are `CREATE`
+                Transactions.
+
+        Returns:
+            :obj:`list` of :obj:`bool`: For every Transaction, if all its
+            Inputs are valid.
+        """
+        if outputs is None:
+            outputs = [None] * len(transactions)
+        collected = [
+            tx._signatures_to_verify(tx._output_condition_uris(tx_outputs))
+            for tx, tx_outputs in zip(transactions, outputs)
+        ]
+        return [
+            signatures is not None and verify_batch(signatures)
+            for signatures in collected
+        ]
+
+    def _output_condition_uris(self, outputs):
         if self.operation == self.CREATE:
             # NOTE: Since in the case of a `CREATE`-transaction we do not have
             #       to check for outputs, we're just submitting dummy
             #       values to the actual method. This simplifies it's logic
             #       greatly, as we do not have to check against `None` values.
-            return self._inputs_valid(["dummyvalue" for _ in self.inputs])
+            return ["dummyvalue" for _ in self.inputs]
         elif self.operation == self.TRANSFER:
-            return self._inputs_valid(
-                [output.fulfillment.condition_uri for output in outputs]
-            )
+            return [output.fulfillment.condition_uri for output in outputs]
         else:
             allowed_ops = ", ".join(self.__class__.ALLOWED_OPERATIONS)
             raise TypeError("`operation` must be one of {}".format(allowed_ops))
@@ -1052,24 +1241,56 @@ class Transaction(object):
         Returns:
             bool: If all Outputs are valid.
         """
+        signatures = self._signatures_to_verify(output_condition_uris)
+        return signatures is not None and verify_batch(signatures)
+
+    def _signatures_to_verify(self, output_condition_uris):
+        """Collects the Ed25519 signatures of the Inputs so they can be
+        verified as a batch. Any other Input is validated right away.
+
+        Args:
+            output_condition_uris (:obj:`list` of :obj:`str`): A list of
+                Outputs to check the Inputs against.
 
+        Returns:
+            :obj:`list`: ``(message, public_key, signature)`` triples, or
+            `None` if an Input is already known to be invalid.
+        """
         if len(self.inputs) != len(output_condition_uris):
             raise ValueError(
                 "Inputs and " "output_condition_uris must have the same count"
             )
 
-        tx_dict = self.tx_dict if self.tx_dict else self.to_dict()
-        tx_dict = Transaction._remove_signatures(tx_dict)
-        tx_dict["id"] = None
-        tx_serialized = Transaction._to_str(tx_dict)
-
-        def validate(i, output_condition_uri=None):
-            """Validate input against output condition URI"""
-            return self._input_valid(
-                self.inputs[i], self.operation, tx_serialized, output_condition_uri
-            )
+        if self.tx_dict:
+            tx_serialized = self._serialized_part("tx_dict")
+        else:
+            tx_serialized = self._signing_message(None)
 
-        return all(validate(i, cond) for i, cond in enumerate(output_condition_uris))
+        # NOTE: Every Input signs the same message, only followed by what it
+        #       fulfills, so the message is hashed once and the state copied.
+        tx_hash = sha3_256(tx_serialized.encode())
+        signatures = []
+        for input_, output_condition_uri in zip(self.inputs, output_condition_uris):
+            ccffill = input_.fulfillment
+            if not isinstance(ccffill, Ed25519Sha256) or ccffill.signature is None:
+                if not self._input_valid(
+                    input_, self.operation, tx_serialized, output_condition_uri
+                ):
+                    return None
+                continue
+
+            if (
+                self.operation != self.CREATE
+                and output_condition_uri != ccffill.condition_uri
+            ):
+                return None
+            message = tx_hash.copy()
+            if input_.fulfills:
+                message.update(
+                    "{}{}".format(input_.fulfills.txid, input_.fulfills.output).encode()
+                )
+            signatures.append((message.digest(), ccffill.public_key, ccffill.signature))
+        return signatures
 
     @lru_cache(maxsize=16384)
     def _input_valid(self, input_, operation, message, output_condition_uri=None):
@@ -1091,10 +1312,20 @@ class Transaction(object):
             bool: If the Input is valid.
         """
         ccffill = input_.fulfillment
-        try:
-            parsed_ffill = Fulfillment.from_uri(ccffill.serialize_uri())
-        except (TypeError, ValueError, ParsingError, ASN1DecodeError, ASN1EncodeError):
-            return False
+        if input_._fulfillment_uri() is not None:
+            # NOTE: Parsing it from its URI already proved it is complete
+            parsed_ffill = ccffill
+        else:
+            try:
+                parsed_ffill = _fulfillment_from_uri(ccffill.serialize_uri())
+            except (
+                TypeError,
+                ValueError,
+                ParsingError,
+                ASN1DecodeError,
+                ASN1EncodeError,
+            ):
+                return False
 
         if operation == self.CREATE:
             # NOTE: In the case of a `CREATE` transaction, the
@@ -1132,12 +1363,74 @@ class Transaction(object):
             "inputs": [input_.to_dict() for input_ in self.inputs],
             "outputs": [output.to_dict() for output in self.outputs],
             "operation": str(self.operation),
-            "metadata": self.metadata,
-            "asset": self.asset,
+            "metadata": _thaw(self.metadata),
+            "asset": _thaw(self.asset),
             "version": self.version,
             "id": self._id,
         }
 
+    def _signing_message(self, tx_id):
+        """Serializes the Transaction with all fulfillments set to `None`.
+
+        This is the message the inputs are signed with.
+
+        Args:
+            tx_id (str): The id to serialize, `None` when validating.
+
+        Returns:
+            str
+        """
+        inputs = [input_._unsigned_dict() for input_ in self.inputs]
+        return self._serialize_body(Transaction._to_str(inputs), tx_id)
+
+    def _serialized_part(self, name):
+        """Canonical serialization of `asset` or `metadata`, computed on
+        first use.
+
+        For `tx_dict` it is the signing message of the dict the Transaction
+        was received as.
+        """
+        parts = self._serialized_parts
+        if name not in parts:
+            if name == "tx_dict":
+                value = Transaction._remove_signatures(self.tx_dict)
+                value["id"] = None
+            else:
+                value = getattr(self, name)
+            parts[name] = Transaction._to_str(value)
+        return parts[name]
+
+    def _serialize_body(self, inputs, tx_id):
+        """Joins the serialized parts in sorted key order, which yields the
+        same string as serializing :meth:`to_dict`.
+
+        Args:
+            inputs (str): The serialized inputs.
+            tx_id (str): The id to serialize.
+
+        Returns:
+            str
+        """
+        return "".join(
+            (
+                '{"asset":',
+                self._serialized_part("asset"),
+                ',"id":',
+                Transaction._to_str(tx_id),
+                ',"inputs":',
+                inputs,
+                ',"metadata":',
+                self._serialized_part("metadata"),
+                ',"operation":',
+                Transaction._to_str(str(self.operation)),
+                ',"outputs":',
+                Transaction._to_str([output.to_dict() for output in self.outputs]),
+                ',"version":',
+                Transaction._to_str(self.version),
+                "}",
+            )
+        )
+
     @staticmethod
     # TODO: Remove `_dict` prefix of variable.
     def _remove_signatures(tx_dict):
@@ -1150,15 +1443,16 @@ class Transaction(object):
             dict
 
         """
-        # NOTE: We remove the reference since we need `tx_dict` only for the
-        #       transaction's hash
-        tx_dict = deepcopy(tx_dict)
-        for input_ in tx_dict["inputs"]:
-            # NOTE: Not all Cryptoconditions return a `signature` key (e.g.
-            #       ThresholdSha256), so setting it to `None` in any
-            #       case could yield incorrect signatures. This is why we only
-            #       set it to `None` if it's set in the dict.
-            input_["fulfillment"] = None
+        # NOTE: Only the inputs are changed, so we copy those and share the
+        #       rest (e.g. a large asset) with the original `tx_dict`.
+        tx_dict = dict(tx_dict)
+        # NOTE: Not all Cryptoconditions return a `signature` key (e.g.
+        #       ThresholdSha256), so setting it to `None` in any
+        #       case could yield incorrect signatures. This is why we only
+        #       set it to `None` if it's set in the dict.
+        tx_dict["inputs"] = [
+            dict(input_, fulfillment=None) for input_ in tx_dict["inputs"]
+        ]
         return tx_dict
 
     @staticmethod
@@ -1176,10 +1470,8 @@ class Transaction(object):
     def _to_str(value):
         return serialize(value)
 
-    # TODO: This method shouldn't call `_remove_signatures`
     def __str__(self):
-        tx = Transaction._remove_signatures(self.to_dict())
-        return Transaction._to_str(tx)
+        return self._signing_message(self._id)
 
     @classmethod
     def get_asset_id(cls, transactions):
@@ -1228,9 +1520,8 @@ class Transaction(object):
         Args:
             tx_body (dict): The Transaction to be transformed.
         """
-        # NOTE: Remove reference to avoid side effects
-        # tx_body = deepcopy(tx_body)
-        tx_body = rapidjson.loads(rapidjson.dumps(tx_body))
+        # NOTE: Only `id` is changed, so a shallow copy avoids side effects
+        tx_body = dict(tx_body)
 
         try:
             proposed_tx_id = tx_body["id"]
@@ -1355,28 +1646,41 @@ class Transaction(object):
         # store the inputs so that we can check if the asset ids match
         input_txs = []
         input_conditions = []
+        # Fetch every input transaction and its spent status in one go
+        # rather than with two queries per input
+        input_txids = list(dict.fromkeys(i.fulfills.txid for i in self.inputs))
+        stored_txs = resdb.get_transactions(input_txids)
+        stored_txs = list(stored_txs) if stored_txs else []
+        if stored_txs:
+            stored_txs = {tx.id: tx for tx in Transaction.from_db(resdb, stored_txs)}
+        else:
+            stored_txs = {}
+        block_index = resdb.index_current_transactions(current_transactions)
+
         for input_ in self.inputs:
             input_txid = input_.fulfills.txid
-            input_tx = resdb.get_transaction(input_txid)
+            input_tx = stored_txs.get(input_txid)
 
             if input_tx is None:
-                for ctxn in current_transactions:
-                    if ctxn.id == input_txid:
-                        input_tx = ctxn
+                input_tx = block_index.transactions.get(input_txid)
 
             if input_tx is None:
                 raise InputDoesNotExist("input `{}` doesn't exist".format(input_txid))
 
-            spent = resdb.get_spent(
-                input_txid, input_.fulfills.output, current_transactions
-            )
-            if spent:
-                raise DoubleSpend("input `{}` was already spent".format(input_txid))
-
             output = input_tx.outputs[input_.fulfills.output]
             input_conditions.append(output)
             input_txs.append(input_tx)
 
+        spent = resdb.get_spending_transactions(
+            [(i.fulfills.txid, i.fulfills.output) for i in self.inputs],
+            current_transactions,
+        )
+        for input_ in self.inputs:
+            if (input_.fulfills.txid, input_.fulfills.output) in spent:
+                raise DoubleSpend(
+                    "input `{}` was already spent".format(input_.fulfills.txid)
+                )
+
         # Validate that all inputs are distinct
         links = [i.fulfills.to_uri() for i in self.inputs]
         if len(links) != len(set(links)):
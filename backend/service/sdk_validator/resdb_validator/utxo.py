@@ -0,0 +1,191 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+from collections import defaultdict
+
+from .transaction import TransactionLink
+
+
+class BlockIndex:
+    """Indexes the transactions of the block being validated.
+
+    Blocks are validated one transaction at a time, each one checked
+    against the transactions accepted before it. Instead of scanning them
+    for every input, :meth:`sync` indexes them by id and by the outputs
+    they spend. The index follows one list of transactions and only
+    indexes the ones appended since the last call, so validating a whole
+    block indexes every transaction once.
+
+    Call :meth:`reset` before validating the next block. Passing another
+    list starts a new index as well, but a list reused for the next block
+    must not be changed other than by appending before :meth:`reset`.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forgets the indexed transactions, e.g. when a new block starts."""
+        self._source = None
+        self._indexed = 0
+        self._last = None
+        self.transactions = {}
+        self.spenders = defaultdict(list)
+
+    def sync(self, current_transactions):
+        """Brings the index up to date with ``current_transactions``.
+
+        Args:
+            current_transactions (list): The transactions of the block
+                validated so far.
+
+        Returns:
+            :class:`BlockIndex`: The index itself.
+
+        Raises:
+            ValueError: If the transactions indexed so far are no longer
+                the first ones of ``current_transactions``, i.e. the list
+                was reused without calling :meth:`reset`.
+        """
+        if current_transactions is not self._source:
+            self.reset()
+            self._source = current_transactions
+        elif self._indexed and (
+            len(current_transactions) < self._indexed
+            or current_transactions[self._indexed - 1] is not self._last
+        ):
+            raise ValueError(
+                "the transactions of the block changed since they were "
+                "indexed, reset the index before validating another block"
+            )
+        for transaction in current_transactions[self._indexed :]:
+            self.transactions[transaction.id] = transaction
+            for input_ in transaction.inputs:
+                if input_.fulfills:
+                    link = (input_.fulfills.txid, input_.fulfills.output)
+                    self.spenders[link].append(transaction)
+        self._indexed = len(current_transactions)
+        if current_transactions:
+            self._last = current_transactions[-1]
+        return self
+
+    def get_spenders(self, txid, output):
+        """list: The indexed transactions spending the given output."""
+        return self.spenders.get((txid, output), [])
+
+
+class UTXOStore:
+    """An in-memory UTXO set indexed by output and by owner.
+
+    It offers the ``get_outputs_by_public_key``, ``filter_spent_outputs``
+    and ``filter_unspent_outputs`` queries of ``FastQuery`` so that
+    :class:`~resdb_validator.lib.ResDB` can answer them without a
+    database. Every lookup is a dict or set access.
+
+    Only unspent outputs are kept, so the store stays the size of the UTXO
+    set: spent outputs, and owners left without any, are forgotten.
+    """
+
+    def __init__(self, unspent_outputs=()):
+        """Creates a store.
+
+        Args:
+            unspent_outputs (iterable): Initial utxos, see :meth:`store`.
+        """
+        self._unspent = {}
+        self._owned = defaultdict(set)
+        self.store(*unspent_outputs)
+
+    def __len__(self):
+        return len(self._unspent)
+
+    def __contains__(self, link):
+        return link in self._unspent
+
+    def store(self, *unspent_outputs):
+        """Adds the given utxos to the set and indexes them by owner.
+
+        Args:
+            *unspent_outputs (:obj:`tuple` of :obj:`dict`): Utxos with at
+                least a ``transaction_id``, an ``output_index`` and the
+                ``public_keys`` owning the output.
+
+        Raises:
+            ValueError: If a utxo has no ``public_keys``, it could not be
+                found by owner.
+        """
+        for utxo in unspent_outputs:
+            if utxo.get("public_keys") is None:
+                raise ValueError(
+                    "utxo {}:{} has no `public_keys`".format(
+                        utxo["transaction_id"], utxo["output_index"]
+                    )
+                )
+        for utxo in unspent_outputs:
+            link = (utxo["transaction_id"], utxo["output_index"])
+            self._unspent[link] = utxo
+            for public_key in utxo["public_keys"]:
+                self._owned[public_key].add(link)
+
+    def delete(self, *unspent_outputs):
+        """Removes the given utxos from the set. Unknown ones are ignored."""
+        for utxo in unspent_outputs:
+            link = (utxo["transaction_id"], utxo["output_index"])
+            stored = self._unspent.pop(link, None)
+            if stored is None:
+                continue
+            for public_key in stored["public_keys"]:
+                owned = self._owned.get(public_key)
+                if owned is not None:
+                    owned.discard(link)
+                    if not owned:
+                        del self._owned[public_key]
+
+    def get_unspent_outputs(self):
+        """Returns an iterator over the stored utxos."""
+        return iter(self._unspent.values())
+
+    def get_outputs_by_public_key(self, public_key):
+        """Get outputs for a public key.
+
+        Returns:
+            :obj:`list` of TransactionLink: The unspent outputs owned by
+            ``public_key``.
+        """
+        return [
+            TransactionLink(txid, output)
+            for txid, output in sorted(self._owned.get(public_key, ()))
+        ]
+
+    def filter_spent_outputs(self, outputs):
+        """Remove outputs that have been spent.
+
+        Args:
+            outputs (:obj:`list` of TransactionLink): Outputs to filter.
+        """
+        return [link for link in outputs if (link.txid, link.output) in self._unspent]
+
+    def filter_unspent_outputs(self, outputs):
+        """Remove outputs that have not been spent.
+
+        Args:
+            outputs (:obj:`list` of TransactionLink): Outputs to filter.
+        """
+        return [
+            link for link in outputs if (link.txid, link.output) not in self._unspent
+        ]
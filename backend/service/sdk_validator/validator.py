@@ -17,6 +17,11 @@
 
 
 #%%
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 from service.sdk_validator.resdb_validator.models import Transaction
 from service.sdk_validator.resdb_validator.exceptions import InvalidSignature
 
@@ -32,6 +37,113 @@ def is_valid_tx(tx_dict: dict) -> Transaction:
         return (1, None)
 
 
+def is_valid_tx_batch(tx_dicts: list) -> list:
+    """Validates a block of transactions like `is_valid_tx`, verifying the
+    signatures of all CREATE transactions in one batch.
+
+    Args:
+        tx_dicts (list): The transactions to validate.
+
+    Returns:
+        list: One `(code, tx_dict)` tuple per transaction, in order.
+    """
+    tx_objs = [Transaction.from_dict(tx_dict) for tx_dict in tx_dicts]
+    creates = [i for i, tx in enumerate(tx_objs) if tx.operation == Transaction.CREATE]
+    results = [None] * len(tx_objs)
+    valid = Transaction.batch_inputs_valid([tx_objs[i] for i in creates])
+    for i, tx_valid in zip(creates, valid):
+        results[i] = (0, tx_objs[i].tx_dict) if tx_valid else (1, None)
+    for i, tx_dict in enumerate(tx_dicts):
+        if results[i] is None:
+            results[i] = is_valid_tx(tx_dict)
+    return results
+
+
+# Errors the C++ verificator already treats as an invalid transaction
+MALFORMED_TX_ERRORS = (KeyError, AttributeError, ValueError)
+CHUNKS_PER_WORKER = 4
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _validate_chunk(tx_dicts: list) -> list:
+    """Validates a chunk of transactions in a worker process. Only the
+    result codes are sent back, not the transactions."""
+    try:
+        return [code for code, _ in is_valid_tx_batch(tx_dicts)]
+    except MALFORMED_TX_ERRORS:
+        codes = []
+        for tx_dict in tx_dicts:
+            try:
+                codes.append(is_valid_tx(tx_dict)[0])
+            except MALFORMED_TX_ERRORS:
+                codes.append(1)
+        return codes
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Stops the worker processes started by `validate_many`."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _pool_workers = None
+
+
+def validate_many(tx_dicts: list, workers: int = None, chunk_size: int = None) -> list:
+    """Validates transactions in parallel on a pool of worker processes.
+
+    The pool is started on first use and kept for later calls, so those run
+    on warm workers that have the validator imported already. Each worker
+    gets the transactions in chunks and validates a chunk with
+    `is_valid_tx_batch`.
+
+    Args:
+        tx_dicts (list): The transactions to validate.
+        workers (int): Number of worker processes, the number of CPUs by
+            default. With 1 the transactions are validated in this process.
+        chunk_size (int): Number of transactions sent to a worker at once.
+            By default every worker gets about `CHUNKS_PER_WORKER` chunks.
+
+    Returns:
+        list: One `(code, tx_dict)` tuple per transaction, in order.
+        Transactions that cannot be parsed count as invalid.
+    """
+    tx_dicts = list(tx_dicts)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(tx_dicts) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [
+        tx_dicts[start : start + chunk_size]
+        for start in range(0, len(tx_dicts), chunk_size)
+    ]
+
+    if workers == 1 or len(chunks) <= 1:
+        codes = [code for chunk in chunks for code in _validate_chunk(chunk)]
+    else:
+        pool = _get_pool(workers)
+        codes = [code for chunk in pool.map(_validate_chunk, chunks) for code in chunk]
+
+    return [
+        (0, tx_dict) if code == 0 else (1, None)
+        for code, tx_dict in zip(codes, tx_dicts)
+    ]
+
+
 # %%
 
 if __name__ == "__main__":
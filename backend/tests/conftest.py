@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "service", "sdk_validator"))
+
+from resdb_driver.exceptions import NotFoundError  # noqa: E402
+
+
+class StubLedger:
+    """In-memory stand-in for the crow /v1/transactions API of a node.
+
+    Commits are accepted but only become visible to GETs once
+    :meth:`confirm` is called, like a transaction waiting for consensus.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.accepted = {}
+        self.committed = {}
+
+    def confirm(self, txid):
+        with self.lock:
+            self.committed[txid] = self.accepted[txid]
+
+    def handle(self, method, path, json=None, params=None, headers=None):
+        with self.lock:
+            self.calls.append((method, path))
+            if method == "POST":
+                self.accepted[json["id"]] = json
+                return "id: {}".format(json["id"])
+            txid = path.rsplit("/", 1)[-1]
+            if txid not in self.committed:
+                raise NotFoundError(404, "get value fail", None, path)
+            return dict(self.committed[txid])
+
+    def gets(self):
+        with self.lock:
+            return [path for method, path in self.calls if method == "GET"]
+
+
+def stub_transport(ledger):
+    """A transport class answering every request from ``ledger``."""
+
+    class StubTransport:
+        def __init__(self, *nodes, timeout=None, **options):
+            self.nodes = nodes
+
+        def forward_request(self, method, path=None, json=None, params=None, headers=None):
+            return ledger.handle(method, path, json, params, headers)
+
+    return StubTransport
+
+
+def async_stub_transport(ledger):
+    """Asynchronous counterpart of :func:`stub_transport`."""
+
+    class AsyncStubTransport:
+        def __init__(self, *nodes, timeout=None, **options):
+            self.nodes = nodes
+
+        async def forward_request(self, method, path=None, json=None, params=None, headers=None):
+            return ledger.handle(method, path, json, params, headers)
+
+        async def close(self):
+            pass
+
+    return AsyncStubTransport
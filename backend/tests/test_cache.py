@@ -0,0 +1,60 @@
+from resdb_driver.cache import TransactionCache
+
+
+def tx(txid, **fields):
+    return dict(fields, id=txid)
+
+
+def test_least_recently_used_transactions_are_evicted():
+    cache = TransactionCache(maxsize=2)
+    cache.put(tx("a"))
+    cache.put(tx("b"))
+    assert cache.get("a") == tx("a")  # b is now the least recently used
+    cache.put(tx("c"))
+    assert len(cache) == 2
+    assert "b" not in cache
+    assert cache.get("a") == tx("a") and cache.get("c") == tx("c")
+
+
+def test_lookups_return_copies():
+    cache = TransactionCache()
+    transaction = tx("a", outputs=[{"amount": "1"}])
+    cache.put(transaction)
+    transaction["outputs"].append({"amount": "2"})
+    fetched = cache.get("a")
+    fetched["outputs"].clear()
+    assert cache.get("a") == tx("a", outputs=[{"amount": "1"}])
+
+
+def test_anything_without_an_id_is_ignored():
+    cache = TransactionCache()
+    cache.put_many([None, {"id": 1}, {"status": "ok"}, tx("a")])
+    cache.put("not a transaction")
+    assert len(cache) == 1 and "a" in cache
+
+
+def test_disk_tier_outlives_the_memory_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = TransactionCache(maxsize=1, path=path)
+    cache.put_many([tx("a"), tx("b")])
+    assert len(cache) == 1
+    # Evicted from memory, still on disk, and brought back into memory
+    assert cache.get("a") == tx("a")
+    assert len(cache) == 1 and cache.get("b") == tx("b")
+    cache.clear()
+    assert len(cache) == 0 and "a" in cache
+    cache.close()
+
+    # Shared with, and surviving into, another cache on the same file
+    other = TransactionCache(path=path)
+    assert other.get("a") == tx("a") and other.get("b") == tx("b")
+    assert other.get("missing") is None
+    other.close()
+
+
+def test_disk_tier_keeps_the_first_copy_of_a_transaction(tmp_path):
+    cache = TransactionCache(path=str(tmp_path / "cache.db"))
+    cache.put(tx("a", metadata="first"))
+    cache.put(tx("a", metadata="second"))
+    cache.clear()
+    assert cache.get("a") == tx("a", metadata="first")
@@ -0,0 +1,99 @@
+import base64
+import hashlib
+import os
+import threading
+
+from cid_cache import CIDCache
+
+HELLO_CID = "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o"  # "hello world\n"
+
+
+def write(path, size, fill=b"x"):
+    with open(path, "wb") as f:
+        f.write(fill * size)
+
+
+def raw_cid(content):
+    """The CIDv1 of `content` stored as a single raw block."""
+    cid = b"\x01\x55\x12\x20" + hashlib.sha256(content).digest()
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+def add(cache, content):
+    temp = cache.temp_path()
+    with open(temp, "wb") as f:
+        f.write(content)
+    return cache.commit(raw_cid(content), temp)
+
+
+def test_index_is_rebuilt_from_the_directory(tmp_path):
+    write(tmp_path / "old", 4)
+    write(tmp_path / "new", 4)
+    os.utime(tmp_path / "old", (1, 1))
+    write(tmp_path / "left.part", 4)
+
+    cache = CIDCache(str(tmp_path), max_bytes=6)
+    assert cache.size == 4
+    assert cache.pin("old") is None
+    assert cache.pin("new") == str(tmp_path / "new")
+    assert sorted(os.listdir(tmp_path)) == ["new"]
+
+
+def test_size_matches_the_index_under_concurrent_commits(tmp_path):
+    cache = CIDCache(str(tmp_path), max_bytes=1 << 20)
+
+    def commit(prefix):
+        for i in range(50):
+            add(cache, f"{prefix}{i:09}".encode())
+
+    threads = [threading.Thread(target=commit, args=(name,)) for name in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.size == 4 * 50 * 10
+    cache._load()
+    assert cache.size == 4 * 50 * 10
+
+
+def test_pinned_objects_are_not_evicted(tmp_path):
+    cache = CIDCache(str(tmp_path), max_bytes=8)
+    first = add(cache, b"aaaa")
+    assert cache.pin(raw_cid(b"aaaa")) == first
+    add(cache, b"bbbb")
+    add(cache, b"cccc")
+    # The least recently used object is still being read
+    assert os.path.exists(first)
+    assert cache.pin(raw_cid(b"bbbb")) is None
+    cache.unpin(raw_cid(b"aaaa"))
+    add(cache, b"dddd")
+    assert not os.path.exists(first)
+    assert cache.size == 8
+
+
+def test_unpinning_evicts_what_the_pins_kept(tmp_path):
+    cache = CIDCache(str(tmp_path), max_bytes=4)
+    first = add(cache, b"aaaa")
+    cache.pin(raw_cid(b"aaaa"))
+    temp = cache.temp_path()
+    write(temp, 4, b"b")
+    cache.commit(raw_cid(b"bbbb"), temp, pin=True)
+    assert cache.size == 8
+    cache.unpin(raw_cid(b"aaaa"))
+    assert not os.path.exists(first)
+    assert cache.size == 4
+
+
+def test_only_content_matching_its_cid_is_cached(tmp_path):
+    cache = CIDCache(str(tmp_path), max_bytes=1 << 20)
+    temp = cache.temp_path()
+    write(temp, 1, b"hello world\n")
+    assert cache.commit(HELLO_CID, temp) == cache.path(HELLO_CID)
+
+    temp = cache.temp_path()
+    write(temp, 1, b"bad gateway\n")
+    assert cache.commit(raw_cid(b"hello world\n"), temp) is None
+    assert os.path.exists(temp)
+    # CIDs whose content cannot be recomputed here are not trusted either
+    assert cache.commit("bafy" + "a" * 55, temp) is None
+    assert cache.pin(raw_cid(b"hello world\n")) is None
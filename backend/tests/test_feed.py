@@ -0,0 +1,154 @@
+import asyncio
+import threading
+
+import rapidjson
+
+from resdb_driver.cache import TransactionCache
+from resdb_driver.exceptions import TransportError
+from resdb_driver.feed import BlockFeed
+
+DROP = object()
+
+
+class FakeNode:
+    """A chain of blocks and the block update websockets announcing it."""
+
+    def __init__(self, height):
+        self.blocks = []
+        self.sockets = []
+        self.fail_next_range = False
+        self.grow(height)
+
+    def grow(self, height):
+        self.blocks.extend(
+            {"id": seq, "transactions": []}
+            for seq in range(len(self.blocks) + 1, height + 1)
+        )
+
+    def announce(self, message="new block"):
+        self.sockets[-1].put_nowait(message)
+
+    def get_range(self, min_seq, max_seq):
+        if self.fail_next_range:
+            self.fail_next_range = False
+            raise TransportError(503, "unavailable", None, "/v1/blocks")
+        # Like the node, pages may start before the requested block
+        return [block for block in self.blocks if min_seq - 1 <= block["id"] <= max_seq]
+
+    def connect(self, url):
+        node = self
+
+        class Socket:
+            async def __aenter__(self):
+                self.messages = asyncio.Queue()
+                node.sockets.append(self.messages)
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                message = await self.messages.get()
+                if message is DROP:
+                    raise ConnectionResetError("connection dropped")
+                return message
+
+        return Socket()
+
+
+async def take(blocks, count):
+    return [(await blocks.__anext__())["id"] for _ in range(count)]
+
+
+async def until(condition):
+    while not condition():
+        await asyncio.sleep(0.005)
+
+
+def test_feed_resumes_after_a_dropped_websocket():
+    async def run():
+        node = FakeNode(height=5)
+        feed = BlockFeed(
+            node.get_range,
+            ["http://a", "http://b"],
+            page_size=3,
+            reconnect_delay=0.01,
+            connect=node.connect,
+        )
+        seen = []
+
+        async def consume():
+            async for block in feed:
+                seen.append(block["id"])
+
+        consumer = asyncio.ensure_future(consume())
+        await until(lambda: len(seen) == 5)
+
+        node.grow(7)
+        node.announce()
+        await until(lambda: len(seen) == 7)
+
+        # Blocks committed while the feed is disconnected are caught up on
+        node.announce(DROP)
+        node.grow(11)
+        await until(lambda: len(node.sockets) == 2 and len(seen) == 11)
+
+        # So are those whose catch-up request failed
+        node.grow(13)
+        node.fail_next_range = True
+        node.announce()
+        await until(lambda: len(node.sockets) == 3 and len(seen) == 13)
+
+        node.grow(14)
+        node.announce()
+        await until(lambda: len(seen) == 14)
+        consumer.cancel()
+        return seen, feed.height
+
+    seen, height = asyncio.run(asyncio.wait_for(run(), 10))
+    assert seen == list(range(1, 15))
+    assert height == 15
+
+
+def test_feed_starts_at_the_requested_height():
+    async def run():
+        node = FakeNode(height=4)
+        feed = BlockFeed(node.get_range, ["http://a"], from_height=3, connect=node.connect)
+        blocks = feed.__aiter__()
+        seen = await take(blocks, 2)
+        await blocks.aclose()
+        return seen
+
+    assert asyncio.run(asyncio.wait_for(run(), 10)) == [3, 4]
+
+
+def test_feed_caches_each_block_in_one_write_off_the_event_loop(tmp_path):
+    class RecordingCache(TransactionCache):
+        writes = []
+
+        def put_many(self, transactions):
+            transactions = list(transactions)
+            self.writes.append((threading.current_thread(), [tx["id"] for tx in transactions]))
+            super().put_many(transactions)
+
+    async def run():
+        node = FakeNode(height=2)
+        node.blocks[1]["transactions"] = [
+            {"cmd": "SET", "key": txid, "value": rapidjson.dumps({"id": txid})}
+            for txid in ("tx-1", "tx-2")
+        ]
+        cache = RecordingCache(path=str(tmp_path / "cache.db"))
+        feed = BlockFeed(node.get_range, ["http://a"], connect=node.connect, tx_cache=cache)
+        blocks = feed.__aiter__()
+        await take(blocks, 2)
+        await blocks.aclose()
+        return cache
+
+    cache = asyncio.run(asyncio.wait_for(run(), 10))
+    assert [txids for _, txids in cache.writes] == [["tx-1", "tx-2"]]
+    assert threading.main_thread() not in [thread for thread, _ in cache.writes]
+    cache.clear()
+    assert cache.get("tx-2") == {"id": "tx-2"}
@@ -0,0 +1,80 @@
+import types
+
+from resdb_driver.crypto import generate_keypair
+from resdb_driver.offchain import fulfill_transaction, prepare_transaction
+from resdb_validator import lib
+
+
+class StubQuery:
+    """The backend queries of get_transactions_filtered, answered from dicts
+    stored the way the backend splits them."""
+
+    def __init__(self, transactions):
+        self.transactions, self.assets, self.metadata = {}, {}, {}
+        for transaction in transactions:
+            transaction = dict(transaction)
+            self.assets[transaction["id"]] = dict(transaction.pop("asset"), id=transaction["id"])
+            self.metadata[transaction["id"]] = {
+                "id": transaction["id"],
+                "metadata": transaction.pop("metadata"),
+            }
+            self.transactions[transaction["id"]] = transaction
+        self.txids = list(self.transactions)
+        self.calls = []
+
+    def get_txids_filtered(self, connection, asset_id, operation, last_tx):
+        self.calls.append("txids")
+        return iter(self.txids)
+
+    def get_transactions(self, connection, txids):
+        self.calls.append(("transactions", len(txids)))
+        return [dict(self.transactions[txid]) for txid in txids if txid in self.transactions]
+
+    def get_assets(self, connection, txids):
+        self.calls.append(("assets", len(txids)))
+        return [dict(self.assets[txid]) for txid in txids if txid in self.assets]
+
+    def get_metadata(self, connection, txids):
+        self.calls.append(("metadata", len(txids)))
+        return [dict(self.metadata[txid]) for txid in txids if txid in self.metadata]
+
+
+def test_filtered_transactions_are_loaded_a_batch_at_a_time(monkeypatch):
+    alice = generate_keypair()
+    creates = [
+        fulfill_transaction(
+            prepare_transaction(
+                operation="CREATE",
+                signers=alice.public_key,
+                recipients=[([alice.public_key], 1)],
+                asset={"data": {"i": i}},
+                metadata={"n": i},
+            ),
+            private_keys=alice.private_key,
+        )
+        for i in range(5)
+    ]
+    query = StubQuery(creates)
+    # Listed by the index but missing from the transactions
+    query.txids.insert(3, "missing")
+    monkeypatch.setattr(lib, "backend", types.SimpleNamespace(query=query), raising=False)
+    resdb = lib.ResDB()
+    resdb.connection = None
+
+    found = resdb.get_transactions_filtered("asset", batch_size=4)
+    assert query.calls == []  # nothing is loaded before it is iterated
+    found = list(found)
+
+    assert [tx and tx.id for tx in found] == [tx["id"] for tx in creates[:3]] + [None] + [
+        tx["id"] for tx in creates[3:]
+    ]
+    assert [tx.to_dict() for tx in found if tx] == creates
+    assert query.calls == [
+        "txids",
+        ("transactions", 4),
+        ("assets", 3),
+        ("metadata", 3),
+        ("transactions", 2),
+        ("assets", 2),
+        ("metadata", 2),
+    ]
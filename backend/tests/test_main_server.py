@@ -0,0 +1,200 @@
+import importlib
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    monkeypatch.setenv("PINATA_API_KEY", "key")
+    monkeypatch.setenv("PINATA_API_SECRET", "secret")
+    monkeypatch.setenv("LOCAL_REPLICA_PATH", str(tmp_path / "replica.db"))
+    monkeypatch.setenv("CID_CACHE_DIR", str(tmp_path / "cid_cache"))
+    sys.modules.pop("main_server", None)
+    module = importlib.import_module("main_server")
+    yield module
+    sys.modules.pop("main_server", None)
+
+
+def test_catalog_is_unavailable_once_the_replica_sync_fails(server, monkeypatch):
+    async def broken_sync(resdb, **options):
+        raise ValueError("corrupt block")
+
+    monkeypatch.setattr(server.replica, "sync", broken_sync)
+    with TestClient(server.app) as client:
+        deadline = time.monotonic() + 5
+        while server.replica_error is None:
+            assert time.monotonic() < deadline, "timed out"
+            time.sleep(0.01)
+        assert isinstance(server.replica_error, ValueError)
+        assert client.get("/files/", params={"cid": "cid"}).status_code == 503
+        assert client.get("/asset_history/", params={"asset_id": "asset"}).status_code == 503
+
+
+def test_retrieve_file_forwards_the_range_header(server, monkeypatch):
+    async def get_transaction(tx_id):
+        return {"asset": {"data": {"file_info": {"cid": "cid-1", "file_name": "a.txt"}}}}
+
+    received = []
+
+    async def body():
+        yield b"ell"
+
+    def gateway(request):
+        received.append(request.headers.get("Range"))
+        return httpx.Response(206, content=body(), headers={"content-range": "bytes 1-3/5"})
+
+    monkeypatch.setattr(server, "_get_transaction", get_transaction)
+    with TestClient(server.app) as client:
+        monkeypatch.setattr(server, "http_client", httpx.AsyncClient(transport=httpx.MockTransport(gateway)))
+        response = client.get("/retrieve_file/", params={"tx_id": "tx-1"}, headers={"Range": "bytes=1-3"})
+    assert received == ["bytes=1-3"]
+    assert response.status_code == 206
+    assert response.content == b"ell"
+    assert response.headers["content-range"] == "bytes 1-3/5"
+
+
+def test_only_verified_gateway_responses_are_cached(server, monkeypatch):
+    cid = "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o"  # "hello world\n"
+
+    async def get_transaction(tx_id):
+        return {"asset": {"data": {"file_info": {"cid": cid, "file_name": "a.txt"}}}}
+
+    served = [b"corrupted!!\n", b"hello world\n"]
+
+    def gateway(request):
+        content = served.pop(0)
+
+        async def body():
+            yield content
+
+        return httpx.Response(200, content=body(), headers={"content-length": str(len(content))})
+
+    monkeypatch.setattr(server, "_get_transaction", get_transaction)
+    with TestClient(server.app) as client:
+        monkeypatch.setattr(server, "http_client", httpx.AsyncClient(transport=httpx.MockTransport(gateway)))
+        assert client.get("/retrieve_file/", params={"tx_id": "tx-1"}).content == b"corrupted!!\n"
+        assert server.cid_cache.size == 0
+        assert client.get("/retrieve_file/", params={"tx_id": "tx-1"}).content == b"hello world\n"
+        # Served from the cache from now on, and unpinned once sent
+        response = client.get("/retrieve_file/", params={"tx_id": "tx-1"}, headers={"Range": "bytes=6-"})
+    assert response.status_code == 206
+    assert response.content == b"world\n"
+    assert served == []
+    assert server.cid_cache._pins == {}
+
+
+def test_transfer_ownership_signs_off_the_event_loop(server, monkeypatch):
+    from resdb_driver.crypto import generate_keypair
+    from resdb_driver.offchain import fulfill_transaction, prepare_transaction
+    from resdb_driver.transaction import Transaction
+
+    alice, bob = generate_keypair(), generate_keypair()
+    create = fulfill_transaction(
+        prepare_transaction(
+            operation="CREATE",
+            signers=alice.public_key,
+            recipients=[([alice.public_key], 1)],
+            asset={"data": {"file_info": {"cid": "cid-1", "owner_name": "alice"}}},
+        ),
+        private_keys=alice.private_key,
+    )
+
+    async def get_transaction(tx_id):
+        assert tx_id == create["id"]
+        return create
+
+    fulfilled_on = []
+    fulfill = server.db.transactions.fulfill
+
+    def recording_fulfill(*args, **kwargs):
+        fulfilled_on.append(threading.current_thread())
+        return fulfill(*args, **kwargs)
+
+    committed = []
+
+    async def send_commit(transaction):
+        committed.append(transaction)
+
+    monkeypatch.setattr(server, "_get_transaction", get_transaction)
+    monkeypatch.setattr(server.db.transactions, "fulfill", recording_fulfill)
+    monkeypatch.setattr(server.db.transactions, "send_commit", send_commit)
+    with TestClient(server.app) as client:
+        response = client.post(
+            "/transfer_ownership/",
+            json={
+                "asset_tx_id": create["id"],
+                "new_owner_public_key": bob.public_key,
+                "new_owner_name": "bob",
+                "current_owner_private_key": alice.private_key,
+            },
+        )
+    assert response.status_code == 200
+    (transfer,) = committed
+    assert response.json() == {"new_tx_id": transfer["id"]}
+    assert transfer["outputs"][0]["public_keys"] == [bob.public_key]
+    assert Transaction.from_dict(transfer).inputs_valid(
+        [Transaction.from_dict(create).outputs[0]]
+    )
+    # The event loop runs in the TestClient's portal thread, the threadpool
+    # in worker threads
+    assert fulfilled_on and fulfilled_on[0].name.startswith("AnyIO worker thread")
+
+
+def test_upload_batch_reports_failures_per_file(server, monkeypatch):
+    from fastapi import HTTPException
+
+    from resdb_driver.crypto import generate_keypair
+
+    alice = generate_keypair()
+
+    async def pin_file_to_ipfs(file, file_name):
+        content = await file.read()
+        if file_name == "unpinnable.txt":
+            raise HTTPException(status_code=500, detail="Pinata is down")
+        return f"cid-{content.decode()}", len(content)
+
+    sent = []
+
+    async def send_commit_many(transactions, concurrency):
+        sent.extend(transactions)
+        return [
+            ValueError("rejected by the node")
+            if tx["asset"]["data"]["file_info"]["file_name"] == "rejected.txt"
+            else {"id": tx["id"]}
+            for tx in transactions
+        ]
+
+    monkeypatch.setattr(server, "pin_file_to_ipfs", pin_file_to_ipfs)
+    monkeypatch.setattr(server.db.transactions, "send_commit_many", send_commit_many)
+    with TestClient(server.app) as client:
+        response = client.post(
+            "/upload_batch/",
+            files=[
+                ("files", ("a.txt", b"a")),
+                ("files", ("unpinnable.txt", b"b")),
+                ("files", ("rejected.txt", b"c")),
+                ("files", ("d.txt", b"d")),
+            ],
+            data={
+                "owner_name": "alice",
+                "owner_public_key": alice.public_key,
+                "owner_private_key": alice.private_key,
+            },
+        )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["message"] == "2 of 4 files committed"
+    committed, unpinnable, rejected, last = body["results"]
+    assert unpinnable == {"file_name": "unpinnable.txt", "status": "failed", "error": "Pinata is down"}
+    assert rejected == {"file_name": "rejected.txt", "status": "failed", "error": "rejected by the node"}
+    # Files that failed to pin are never sent to ResilientDB
+    assert len(sent) == 3
+    for result, content in ((committed, "a"), (last, "d")):
+        assert result["status"] == "committed"
+        assert result["file_metadata"]["data"]["file_info"]["cid"] == f"cid-{content}"
+        assert result["file_hash"] in [tx["id"] for tx in sent]
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from resdb_validator.merkle import UTXOMerkleTree, utxo_hash
+
+
+def random_leaves(rng, count):
+    return [rng.randbytes(32) for _ in range(count)]
+
+
+@pytest.mark.parametrize("depth", [0, 3, 8])
+def test_incremental_updates_match_a_rebuild(depth):
+    rng = random.Random(depth)
+    live = set()
+    tree = UTXOMerkleTree(depth)
+    for _ in range(20):
+        added = random_leaves(rng, 50)
+        # Spend some live leaves, and some that were never added
+        removed = rng.sample(sorted(live), min(len(live), 30)) + random_leaves(rng, 3)
+        # Adding a leaf twice has no effect
+        tree.update(added=added + added[:5], removed=removed)
+        live.difference_update(removed)
+        live.update(added)
+
+        rebuilt = UTXOMerkleTree.from_hashes(live, depth)
+        assert tree.root == rebuilt.root
+        assert len(tree) == len(rebuilt) == len(live)
+    assert all(leaf in tree for leaf in live)
+
+
+def test_single_outputs_match_a_rebuild():
+    tree = UTXOMerkleTree(4)
+    empty_root = tree.root
+    utxos = [{"transaction_id": "tx{}".format(i), "output_index": i % 3} for i in range(40)]
+    for utxo in utxos:
+        tree.add(utxo["transaction_id"], utxo["output_index"])
+    assert tree.root == UTXOMerkleTree.from_utxos(utxos, 4).root
+
+    for utxo in utxos[::2]:
+        tree.remove(utxo["transaction_id"], utxo["output_index"])
+    assert tree.root == UTXOMerkleTree.from_utxos(utxos[1::2], 4).root
+    assert utxo_hash("tx0", 0) not in tree and utxo_hash("tx1", 1) in tree
+
+    for utxo in utxos[1::2]:
+        tree.remove(utxo["transaction_id"], utxo["output_index"])
+    assert tree.root == empty_root and len(tree) == 0
+
+
+def test_save_and_load_round_trip(tmp_path):
+    rng = random.Random(1)
+    tree = UTXOMerkleTree.from_hashes(random_leaves(rng, 500), depth=6)
+    path = str(tmp_path / "utxo.merkle")
+    tree.save(path)
+
+    loaded = UTXOMerkleTree.load(path)
+    assert (loaded.depth, len(loaded), loaded.root) == (6, 500, tree.root)
+    # The loaded tree keeps being updated incrementally
+    added = random_leaves(rng, 10)
+    tree.update(added=added)
+    loaded.update(added=added)
+    assert loaded.root == tree.root
+
+    UTXOMerkleTree(0).save(path)
+    assert UTXOMerkleTree.load(path).root == UTXOMerkleTree(0).root
+
+
+def test_load_rejects_damaged_files(tmp_path):
+    path = tmp_path / "utxo.merkle"
+    UTXOMerkleTree.from_hashes(random_leaves(random.Random(2), 20), depth=2).save(str(path))
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        UTXOMerkleTree.load(str(path))
+    path.write_bytes(data[:10])
+    with pytest.raises(ValueError):
+        UTXOMerkleTree.load(str(path))
+    path.write_bytes(b"NOTMERKL" + data[8:])
+    with pytest.raises(ValueError):
+        UTXOMerkleTree.load(str(path))
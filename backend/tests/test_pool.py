@@ -0,0 +1,100 @@
+import threading
+from collections import Counter
+
+from resdb_driver.pool import (
+    EWMALatencyPicker,
+    LeastOutstandingPicker,
+    Pool,
+    RoundRobinPicker,
+    available_connections,
+)
+
+
+class FakeConnection:
+    def __init__(self, name, backoff=0, in_flight=0, latency=None):
+        self.name = name
+        self.backoff = backoff
+        self.in_flight = in_flight
+        self.latency = latency
+
+    def get_backoff_timedelta(self):
+        return self.backoff
+
+    def __repr__(self):
+        return self.name
+
+
+def names(picker, connections, count):
+    return [picker.pick(connections).name for _ in range(count)]
+
+
+def test_round_robin_skips_nodes_backing_off():
+    a, b, c = FakeConnection("a"), FakeConnection("b", backoff=5), FakeConnection("c")
+    picker = RoundRobinPicker()
+    assert names(picker, [a, b, c], 4) == ["a", "c", "a", "c"]
+
+
+def test_every_node_backing_off_picks_the_earliest_to_recover():
+    a, b, c = (FakeConnection(name, backoff=delay) for name, delay in zip("abc", (3, 1, 2)))
+    assert available_connections([a, b, c]) == [b]
+    for picker_class in (RoundRobinPicker, LeastOutstandingPicker, EWMALatencyPicker):
+        assert picker_class().pick([a, b, c]) is b
+
+
+def test_round_robin_is_even_across_threads():
+    connections = [FakeConnection(name) for name in "abcd"]
+    pool = Pool(connections)
+    picked = Counter()
+    lock = threading.Lock()
+
+    def pick():
+        local = Counter(pool.get_connection().name for _ in range(1000))
+        with lock:
+            picked.update(local)
+
+    threads = [threading.Thread(target=pick) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert picked == {name: 2000 for name in "abcd"}
+
+
+def test_least_outstanding_picks_the_idlest_node():
+    a, b, c = FakeConnection("a", in_flight=3), FakeConnection("b", in_flight=1), FakeConnection("c", in_flight=2)
+    picker = LeastOutstandingPicker()
+    assert set(names(picker, [a, b, c], 5)) == {"b"}
+    b.backoff = 1
+    assert set(names(picker, [a, b, c], 5)) == {"c"}
+
+
+def test_least_outstanding_rotates_between_ties():
+    connections = [FakeConnection(name) for name in "abc"]
+    assert sorted(names(LeastOutstandingPicker(), connections, 6)) == list("aabbcc")
+
+
+def test_ewma_prefers_unmeasured_then_cheaper_nodes():
+    fast = FakeConnection("fast", latency=0.01)
+    slow = FakeConnection("slow", latency=0.5)
+    picker = EWMALatencyPicker()
+    assert set(names(picker, [fast, slow], 20)) == {"fast"}
+
+    # Latency is weighted by the requests in flight
+    fast.in_flight = 99
+    assert set(names(picker, [fast, slow], 20)) == {"slow"}
+
+    new = FakeConnection("new")
+    assert set(names(picker, [new, slow], 20)) == {"new"}
+
+
+def test_ewma_never_picks_the_most_expensive_of_several_nodes():
+    connections = [FakeConnection(name, latency=latency) for name, latency in zip("abc", (0.1, 0.2, 0.3))]
+    picked = Counter(names(EWMALatencyPicker(), connections, 300))
+    assert picked["c"] == 0
+    assert picked["a"] > picked["b"] > 0
+
+
+def test_single_connection_is_always_picked():
+    only = FakeConnection("only", backoff=10)
+    for picker_class in (RoundRobinPicker, LeastOutstandingPicker, EWMALatencyPicker):
+        assert picker_class().pick([only]) is only
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from resdb_driver import AsyncResdb, Resdb, TransactionCache
+
+
+class FakeChain:
+    """Answers the range requests of the driver from a chain of blocks."""
+
+    def __init__(self, height):
+        self.blocks = [{"id": seq, "transactions": []} for seq in range(1, height + 1)]
+        self.transactions = [{"id": "tx-{}".format(i)} for i in range(5)]
+        self.paths = []
+
+    def forward_request(self, method, path, headers=None, **kwargs):
+        self.paths.append(path)
+        first, last = path.rsplit("/", 2)[-2:]
+        if "/blocks/" in path:
+            return [block for block in self.blocks if int(first) <= block["id"] <= int(last)]
+        # Node responses may carry anything, only transactions are cached
+        return [tx for tx in self.transactions if first <= tx["id"] <= last] + ["junk"]
+
+    async def async_forward_request(self, method, path, headers=None, **kwargs):
+        return self.forward_request(method, path, headers=headers, **kwargs)
+
+
+def driver(chain, driver_class=Resdb):
+    db = driver_class("http://node", tx_cache=TransactionCache())
+    forward_request = chain.async_forward_request if driver_class is AsyncResdb else chain.forward_request
+    db.transport.forward_request = forward_request
+    return db
+
+
+def collect(blocks):
+    if hasattr(blocks, "__aiter__"):
+
+        async def run():
+            return [block async for block in blocks]
+
+        return asyncio.run(run())
+    return list(blocks)
+
+
+@pytest.mark.parametrize("driver_class", [Resdb, AsyncResdb])
+def test_bounded_range_is_fetched_a_page_at_a_time(driver_class):
+    chain = FakeChain(height=20)
+    blocks = driver(chain, driver_class).blocks.iter_range(3, 12, page_size=4)
+    assert chain.paths == []  # nothing is fetched before iterating
+    assert [block["id"] for block in collect(blocks)] == list(range(3, 13))
+    assert [path.split("/blocks/")[1] for path in chain.paths] == ["3/6", "7/10", "11/12"]
+
+
+@pytest.mark.parametrize("driver_class", [Resdb, AsyncResdb])
+def test_open_range_stops_at_the_end_of_the_chain(driver_class):
+    chain = FakeChain(height=10)
+    blocks = driver(chain, driver_class).blocks.iter_range(5, page_size=3)
+    assert [block["id"] for block in collect(blocks)] == list(range(5, 11))
+    # The page past the end comes back empty
+    assert [path.split("/blocks/")[1] for path in chain.paths] == ["5/7", "8/10", "11/13"]
+
+
+@pytest.mark.parametrize("driver_class", [Resdb, AsyncResdb])
+def test_empty_page_inside_a_bounded_range_does_not_stop_it(driver_class):
+    chain = FakeChain(height=10)
+    del chain.blocks[3:6]  # blocks 4 to 6 are missing
+    blocks = driver(chain, driver_class).blocks.iter_range(1, 10, page_size=3)
+    assert [block["id"] for block in collect(blocks)] == [1, 2, 3, 7, 8, 9, 10]
+
+
+def test_page_size_must_be_positive():
+    with pytest.raises(ValueError):
+        next(driver(FakeChain(height=1)).blocks.iter_range(1, page_size=0))
+
+
+@pytest.mark.parametrize("driver_class", [Resdb, AsyncResdb])
+def test_retrieve_range_caches_the_transactions_it_got(driver_class):
+    chain = FakeChain(height=0)
+    db = driver(chain, driver_class)
+    transactions = db.transactions.retrieve_range("tx-1", "tx-3")
+    if driver_class is AsyncResdb:
+        transactions = asyncio.run(transactions)
+    assert transactions == [{"id": "tx-1"}, {"id": "tx-2"}, {"id": "tx-3"}, "junk"]
+    assert chain.paths == ["/v1/transactions/tx-1/tx-3"]
+    assert len(db.tx_cache) == 3
+    assert db.tx_cache.get("tx-2") == {"id": "tx-2"}
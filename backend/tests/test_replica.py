@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import threading
+
+import rapidjson
+
+from resdb_driver.replica import LocalReplica
+
+ALICE, BOB = "alice-key", "bob-key"
+
+CREATE = {
+    "id": "create-1",
+    "operation": "CREATE",
+    "asset": {"data": {"file_info": {"cid": "cid-1", "file_name": "a.txt"}}},
+    "inputs": [{"fulfills": None, "owners_before": [ALICE]}],
+    "outputs": [{"public_keys": [ALICE], "amount": "1"}],
+}
+TRANSFER = {
+    "id": "transfer-1",
+    "operation": "TRANSFER",
+    "asset": {"id": "create-1"},
+    "inputs": [
+        {
+            "fulfills": {"transaction_id": "create-1", "output_index": 0},
+            "owners_before": [ALICE],
+        }
+    ],
+    "outputs": [{"public_keys": [BOB], "amount": "1"}],
+}
+
+
+def block(seq, *transactions):
+    return {
+        "id": seq,
+        "transactions": [
+            {"cmd": "SET", "key": tx["id"], "value": rapidjson.dumps(tx)}
+            for tx in transactions
+        ],
+    }
+
+
+def assert_transferred_to_bob(replica):
+    assert replica.owners("create-1") == [BOB]
+    assert replica.owned_by(BOB) == [TRANSFER]
+    assert replica.owned_by(ALICE) == []
+    assert [tx["id"] for tx in replica.asset_history("create-1")] == [
+        "create-1",
+        "transfer-1",
+    ]
+
+
+def test_transfer_moves_ownership():
+    replica = LocalReplica()
+    replica.ingest_block(block(1, CREATE))
+    assert replica.owners("create-1") == [ALICE]
+    assert replica.owned_by(ALICE) == [CREATE]
+
+    replica.ingest_block(block(2, TRANSFER))
+    assert_transferred_to_bob(replica)
+    assert replica.height == 3
+
+
+def test_transfer_ingested_before_its_create():
+    replica = LocalReplica()
+    replica.ingest_transaction(TRANSFER)
+    replica.ingest_block(block(1, CREATE))
+    assert replica.owners("create-1") == [BOB]
+    assert replica.owned_by(ALICE) == []
+    assert replica.owned_by(BOB) == [TRANSFER]
+
+
+def test_spends_survive_a_restart(tmp_path):
+    path = str(tmp_path / "replica.db")
+    replica = LocalReplica(path)
+    replica.ingest_transaction(TRANSFER)
+    replica.close()
+
+    replica = LocalReplica(path)
+    replica.ingest_block(block(1, CREATE))
+    assert replica.owned_by(ALICE) == []
+    assert replica.owners("create-1") == [BOB]
+
+
+def test_lookups_are_in_ledger_order():
+    second_copy = dict(CREATE, id="create-2")
+    replica = LocalReplica()
+    # Ingested before the blocks committing them, and in reverse order
+    replica.ingest_transaction(TRANSFER)
+    replica.ingest_transaction(second_copy)
+    assert [tx["id"] for tx in replica.find_by_cid("cid-1")] == ["create-2"]
+
+    replica.ingest_block(block(1, CREATE, second_copy))
+    replica.ingest_block(block(2, TRANSFER))
+    assert [tx["id"] for tx in replica.find_by_cid("cid-1")] == ["create-1", "create-2"]
+    assert [tx["id"] for tx in replica.asset_history("create-1")] == [
+        "create-1",
+        "transfer-1",
+    ]
+
+
+def test_replica_created_before_positions_is_migrated(tmp_path):
+    path = str(tmp_path / "replica.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE transactions (id TEXT PRIMARY KEY, operation TEXT,"
+        " asset_id TEXT, cid TEXT, file_name TEXT, block INTEGER, body TEXT NOT NULL)"
+    )
+    db.commit()
+    db.close()
+
+    replica = LocalReplica(path)
+    replica.ingest_block(block(1, CREATE))
+    replica.ingest_block(block(2, TRANSFER))
+    assert_transferred_to_bob(replica)
+
+
+def test_sync_writes_blocks_off_the_event_loop():
+    ingested_on = []
+
+    class Replica(LocalReplica):
+        def ingest_block(self, block):
+            ingested_on.append(threading.current_thread())
+            super().ingest_block(block)
+
+    class Resdb:
+        async def subscribe_blocks(self, from_height):
+            assert from_height == 1
+            yield block(1, CREATE)
+            yield block(2, TRANSFER)
+
+    replica = Replica()
+    asyncio.run(replica.sync(Resdb()))
+    assert_transferred_to_bob(replica)
+    assert len(ingested_on) == 2
+    assert threading.main_thread() not in ingested_on
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from conftest import StubLedger, async_stub_transport, stub_transport
+from resdb_driver import AsyncResdb, Resdb, TransactionCache
+
+TX = {"id": "tx-1", "operation": "CREATE"}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_cached_but_unconfirmed_commit_stays_pending():
+    ledger = StubLedger()
+    db = Resdb("http://node", transport_class=stub_transport(ledger), tx_cache=TransactionCache())
+    db.tracker.poll_interval = 0.01
+
+    future = db.transactions.send_sync(dict(TX))
+    assert "tx-1" in db.tx_cache
+    wait_for(lambda: len(ledger.gets()) >= 3)
+    assert not future.done()
+
+    ledger.confirm("tx-1")
+    assert future.result(timeout=5) == TX
+    assert ledger.gets()[-1] == "/v1/transactions/tx-1"
+
+
+def test_send_async_confirms_through_the_ledger():
+    ledger = StubLedger()
+    db = Resdb("http://node", transport_class=stub_transport(ledger), tx_cache=TransactionCache())
+    db.tracker.poll_interval = 0.01
+
+    future = db.transactions.send_async(dict(TX))
+    wait_for(lambda: ledger.gets())
+    assert not future.done()
+    ledger.confirm("tx-1")
+    assert future.result(timeout=5) == TX
+
+
+def test_async_commit_is_only_confirmed_by_the_ledger():
+    ledger = StubLedger()
+
+    async def run():
+        db = AsyncResdb(
+            "http://node", transport_class=async_stub_transport(ledger), tx_cache=TransactionCache()
+        )
+        task = db.transactions.send_async(dict(TX))
+        while len(ledger.gets()) < 3:
+            await asyncio.sleep(0.01)
+        assert not task.done()
+        ledger.confirm("tx-1")
+        return await asyncio.wait_for(task, 5)
+
+    assert asyncio.run(asyncio.wait_for(run(), 10)) == TX
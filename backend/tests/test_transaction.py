@@ -0,0 +1,128 @@
+import pytest
+
+from resdb_driver.crypto import generate_keypair
+from resdb_driver.offchain import fulfill_transaction, prepare_transaction
+from resdb_driver.transaction import Input, Transaction
+from resdb_validator import transaction as validator_transaction
+from resdb_validator.models import Transaction as ValidatorTransaction
+
+
+@pytest.fixture
+def signed_create():
+    alice = generate_keypair()
+    return fulfill_transaction(
+        prepare_transaction(
+            operation="CREATE",
+            signers=alice.public_key,
+            recipients=[([alice.public_key], 1)],
+            asset={"data": {"file": "a.txt"}},
+        ),
+        private_keys=alice.private_key,
+    )
+
+
+@pytest.mark.parametrize("input_class", [Input, validator_transaction.Input])
+def test_inputs_parsed_from_one_uri_do_not_share_a_fulfillment(input_class, signed_create):
+    data = signed_create["inputs"][0]
+    first = input_class.from_dict(data)
+    second = input_class.from_dict(data)
+    assert first.fulfillment is not second.fulfillment
+
+    # Signing one of them, e.g. re-signing a parsed transaction, leaves
+    # the other one and later parses alone
+    first.fulfillment.signature = b"\x00" * 64
+    assert second.fulfillment.serialize_uri() == data["fulfillment"]
+    assert input_class.from_dict(data).fulfillment.serialize_uri() == data["fulfillment"]
+
+
+def test_parsed_transaction_still_validates(signed_create):
+    assert Transaction.from_dict(signed_create).inputs_valid()
+
+
+def test_parts_cannot_change_behind_the_cached_serialization(signed_create):
+    transaction = Transaction.from_dict(signed_create)
+    assert transaction.inputs_valid()
+
+    with pytest.raises(TypeError):
+        transaction.asset["data"]["file"] = "evil.txt"
+    assert transaction.inputs_valid()
+    assert transaction.to_dict()["asset"] == signed_create["asset"]
+
+    # Assigning a new value is noticed
+    transaction.asset = {"data": {"file": "evil.txt"}}
+    assert not transaction.inputs_valid()
+
+
+def test_inputs_changed_in_place_invalidate_the_signature(signed_create):
+    transaction = Transaction.from_dict(signed_create)
+    assert transaction.inputs_valid()
+    transaction.inputs[0].owners_before.append("someone-else")
+    assert not transaction.inputs_valid()
+
+
+def test_validator_checks_the_dict_it_received(signed_create):
+    transaction = ValidatorTransaction.from_dict(signed_create)
+    assert transaction.inputs_valid()
+    with pytest.raises(TypeError):
+        transaction.tx_dict["asset"]["data"]["file"] = "evil.txt"
+    with pytest.raises(TypeError):
+        transaction.asset["data"]["file"] = "evil.txt"
+    assert transaction.inputs_valid()
+
+    tampered = transaction.to_dict()
+    tampered["asset"]["data"]["file"] = "evil.txt"
+    tampered = ValidatorTransaction.from_dict(tampered)
+    assert not tampered.inputs_valid()
+
+
+def test_to_dict_returns_a_copy_that_can_be_changed(signed_create):
+    transaction = Transaction.from_dict(signed_create)
+    tx_dict = transaction.to_dict()
+    tx_dict["asset"]["data"]["file"] = "b.txt"
+    assert transaction.asset["data"]["file"] == "a.txt"
+    assert transaction.inputs_valid()
+    assert not Transaction.from_dict(tx_dict).inputs_valid()
+
+
+@pytest.mark.parametrize("input_class", [Input, validator_transaction.Input])
+def test_fulfillment_changed_after_parsing_is_serialized_again(input_class, signed_create):
+    data = signed_create["inputs"][0]
+    input_ = input_class.from_dict(data)
+    assert input_.to_dict()["fulfillment"] == data["fulfillment"]
+
+    input_.fulfillment.signature = b"\x01" * 64
+    assert input_.to_dict()["fulfillment"] == input_.fulfillment.serialize_uri()
+    assert input_.to_dict()["fulfillment"] != data["fulfillment"]
+
+
+def test_fulfillment_changed_after_parsing_is_validated_again(signed_create):
+    transaction = Transaction.from_dict(signed_create)
+    transaction.inputs[0].fulfillment.signature = b"\x01" * 64
+    assert not transaction.inputs_valid()
+
+
+@pytest.mark.parametrize("transaction_class", [Transaction, ValidatorTransaction])
+def test_batch_verifies_every_signature_once(transaction_class, monkeypatch):
+    creates = []
+    for i in range(3):
+        alice = generate_keypair()
+        create = fulfill_transaction(
+            prepare_transaction(
+                operation="CREATE",
+                signers=alice.public_key,
+                recipients=[([alice.public_key], 1)],
+                asset={"data": {"i": i}},
+            ),
+            private_keys=alice.private_key,
+        )
+        creates.append(transaction_class.from_dict(create))
+    creates[1].inputs[0].fulfillment.signature = b"\x00" * 64
+
+    crypto = transaction_class.batch_inputs_valid.__globals__["verify_batch"].__globals__
+    sign_open = crypto["crypto_sign_open"]
+    opened = []
+    monkeypatch.setitem(
+        crypto, "crypto_sign_open", lambda *args: opened.append(1) or sign_open(*args)
+    )
+    assert transaction_class.batch_inputs_valid(creates) == [True, False, True]
+    assert len(opened) == 3
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+from resdb_driver.connection import AsyncConnection, Connection, HttpResponse
+from resdb_driver.transport import AsyncTransport, Transport
+
+NODES = [
+    {"endpoint": "http://slow", "headers": None},
+    {"endpoint": "http://fast", "headers": None},
+]
+
+
+class StubConnection(Connection):
+    """Answers after a per-node delay instead of making an HTTP request."""
+
+    delays = {"http://slow": 0.5, "http://fast": 0.0}
+
+    def _request(self, url, **kwargs):
+        time.sleep(self.delays[self.node_url])
+        return HttpResponse(200, {}, self.node_url)
+
+
+class StubTransport(Transport):
+    connection_class = StubConnection
+
+
+class AsyncStubConnection(AsyncConnection):
+    delays = StubConnection.delays
+    cancelled = None
+
+    async def _request(self, url, **kwargs):
+        try:
+            await asyncio.sleep(self.delays[self.node_url])
+        except asyncio.CancelledError:
+            AsyncStubConnection.cancelled = self.node_url
+            raise
+        return HttpResponse(200, {}, self.node_url)
+
+
+class AsyncStubTransport(AsyncTransport):
+    connection_class = AsyncStubConnection
+
+
+def slow_first(transport):
+    slow = transport.connection_pool.connections[0]
+    transport.connection_pool.get_connection = lambda: slow
+
+
+def test_slow_request_is_hedged_to_another_node():
+    transport = StubTransport(*NODES, hedge_delay=0.05)
+    slow_first(transport)
+    start = time.monotonic()
+    assert transport.forward_request("GET", "/v1/blocks") == "http://fast"
+    assert time.monotonic() - start < 0.4
+
+
+def test_fast_request_is_not_hedged():
+    transport = StubTransport(*NODES, hedge_delay=0.05)
+    fast = transport.connection_pool.connections[1]
+    transport.connection_pool.get_connection = lambda: fast
+    calls = []
+    transport._pick_backup = lambda connection: calls.append(connection)
+    assert transport.forward_request("GET", "/v1/blocks") == "http://fast"
+    assert calls == []
+
+
+def test_hedge_executor_is_sized_from_the_connection_pools():
+    transport = StubTransport(*NODES, hedge_delay=0.05, pool_maxsize=16)
+    assert transport._hedge_executor is None
+    slow_first(transport)
+    transport.forward_request("GET", "/v1/blocks")
+    executor = transport._hedge_executor
+    assert executor._max_workers == 32
+    transport.close()
+    assert transport._hedge_executor is None
+    assert executor._shutdown
+
+
+def test_async_transport_has_no_hedge_threads():
+    async def run():
+        transport = AsyncStubTransport(*NODES, hedge_delay=0.05)
+        slow_first(transport)
+        await transport.forward_request("GET", "/v1/blocks")
+        await transport.close()
+        return transport
+
+    assert asyncio.run(asyncio.wait_for(run(), 10))._hedge_executor is None
+
+
+def test_queued_requests_are_not_hedged():
+    # More concurrent requests than hedge threads: the ones waiting for a
+    # thread must not count the wait towards the hedge delay
+    transport = StubTransport(*NODES, hedge_delay=0.2, pool_maxsize=1)
+    fast = transport.connection_pool.connections[1]
+    transport.connection_pool.get_connection = lambda: fast
+    StubConnection.delays = dict(StubConnection.delays, **{"http://fast": 0.1})
+    hedged = []
+    pick_backup = transport._pick_backup
+    transport._pick_backup = lambda connection: hedged.append(1) or pick_backup(connection)
+    try:
+        threads = [
+            threading.Thread(target=transport.forward_request, args=("GET", "/v1/blocks"))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        StubConnection.delays = dict(StubConnection.delays, **{"http://fast": 0.0})
+    assert hedged == []
+
+
+def test_losing_async_request_is_cancelled():
+    async def run():
+        transport = AsyncStubTransport(*NODES, hedge_delay=0.05)
+        slow_first(transport)
+        AsyncStubConnection.cancelled = None
+        data = await transport.forward_request("GET", "/v1/blocks")
+        await asyncio.sleep(0)
+        await transport.close()
+        return data, transport.connection_pool.connections
+
+    data, (slow, fast) = asyncio.run(asyncio.wait_for(run(), 10))
+    assert data == "http://fast"
+    assert AsyncStubConnection.cancelled == "http://slow"
+    # The cancelled request is neither in flight nor a latency sample
+    assert slow.in_flight == 0 and slow.latency is None
+    assert slow.get_backoff_timedelta() == 0
+    assert fast.in_flight == 0 and fast.latency is not None
+
+
+def test_async_connection_shares_the_connection_state():
+    connection = AsyncConnection(node_url="http://node", pool_maxsize=4)
+    assert connection.in_flight == 0 and connection.latency is None
+    assert connection.backoff_time is None
+    assert not hasattr(connection, "adapter")
+    asyncio.run(connection.close())
@@ -0,0 +1,64 @@
+import pytest
+
+from resdb_validator.transaction import TransactionLink
+from resdb_validator.utxo import BlockIndex, UTXOStore
+
+
+def utxo(txid, index, *public_keys):
+    return {"transaction_id": txid, "output_index": index, "public_keys": list(public_keys)}
+
+
+def test_seeded_utxos_are_found_by_owner():
+    store = UTXOStore([utxo("a", 0, "alice"), utxo("b", 0, "alice", "bob")])
+    store.store(utxo("c", 1, "bob"))
+    assert store.get_outputs_by_public_key("alice") == [
+        TransactionLink("a", 0),
+        TransactionLink("b", 0),
+    ]
+    assert store.get_outputs_by_public_key("bob") == [
+        TransactionLink("b", 0),
+        TransactionLink("c", 1),
+    ]
+
+
+def test_spent_outputs_and_their_owners_are_forgotten():
+    store = UTXOStore([utxo("a", 0, "alice"), utxo("b", 0, "alice", "bob")])
+    store.delete(utxo("a", 0), utxo("x", 0))
+    assert store.get_outputs_by_public_key("alice") == [TransactionLink("b", 0)]
+    store.delete(utxo("b", 0))
+    assert store.get_outputs_by_public_key("alice") == []
+    assert store._owned == {}
+    assert len(store) == 0
+
+
+def test_utxos_without_owners_are_rejected():
+    with pytest.raises(ValueError):
+        UTXOStore([{"transaction_id": "a", "output_index": 0}])
+    store = UTXOStore()
+    with pytest.raises(ValueError):
+        store.store(utxo("a", 0, "alice"), {"transaction_id": "b", "output_index": 0})
+    assert len(store) == 0
+
+
+class Spend:
+    def __init__(self, txid, *spent):
+        self.id = txid
+        self.inputs = [
+            type("Input", (), {"fulfills": TransactionLink(*link)})() for link in spent
+        ]
+
+
+def test_block_index_follows_appends_until_reset():
+    index = BlockIndex()
+    block = [Spend("t1", ("a", 0))]
+    assert index.sync(block).get_spenders("a", 0) == block
+    block.append(Spend("t2", ("b", 0)))
+    assert [tx.id for tx in index.sync(block).get_spenders("b", 0)] == ["t2"]
+
+    # The next block reuses the list
+    block[:] = [Spend("t3", ("c", 0)), Spend("t4", ("d", 0))]
+    with pytest.raises(ValueError):
+        index.sync(block)
+    index.reset()
+    assert index.sync(block).get_spenders("a", 0) == []
+    assert set(index.transactions) == {"t3", "t4"}
@@ -0,0 +1,38 @@
+import pytest
+
+from resdb_driver.crypto import generate_keypair
+from resdb_driver.offchain import fulfill_transaction, prepare_transaction
+from service.sdk_validator import validator
+
+
+def signed_create(i):
+    alice = generate_keypair()
+    return fulfill_transaction(
+        prepare_transaction(
+            operation="CREATE",
+            signers=alice.public_key,
+            recipients=[([alice.public_key], 1)],
+            asset={"data": {"i": i}},
+        ),
+        private_keys=alice.private_key,
+    )
+
+
+@pytest.fixture
+def transactions():
+    valid = [signed_create(i) for i in range(5)]
+    forged = signed_create(5)
+    forged["inputs"][0]["fulfillment"] = valid[0]["inputs"][0]["fulfillment"]
+    malformed = {"operation": "CREATE", "asset": {"data": {}}}
+    return valid[:2] + [malformed] + valid[2:4] + [forged] + valid[4:]
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, None), (1, 3), (2, 2)])
+def test_malformed_transaction_only_fails_itself(transactions, workers, chunk_size):
+    try:
+        results = validator.validate_many(transactions, workers=workers, chunk_size=chunk_size)
+    finally:
+        validator.shutdown_pool()
+    assert [code for code, _ in results] == [0, 0, 1, 0, 0, 1, 0]
+    for (code, tx_dict), sent in zip(results, transactions):
+        assert tx_dict == (sent if code == 0 else None)